@@ -0,0 +1,311 @@
+import itertools
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from latency_histogram import LatencyStats
+from request_timing import TIMING_COLUMNS
+
+RESULT_FILES = ["locust_results.parquet", "locust_results.csv"]
+DEFAULT_BATCH_SIZE = 100_000
+CSV_DTYPES = {
+    "language": "category",
+    "status_code": "int32",
+    "latency_ms": "float64",
+    "error": "bool",
+    "timestamp": "str",
+    "corrected_latency_ms": "float64",
+    "input_chars": "int32",
+    "start_ts": "float64",
+    "end_ts": "float64",
+    **dict.fromkeys(TIMING_COLUMNS, "float64"),
+    "endpoint": "category",
+    "throttled": "bool",
+    "api_key_id": "int32",
+    # Nullable, so rows written without a value are read as missing rather than failing the read
+    "new_connection": "boolean",
+}
+AGGREGATE_COLUMNS = [
+    "language", "status_code", "latency_ms", "timestamp", "corrected_latency_ms", "input_chars", "start_ts", "end_ts",
+    *TIMING_COLUMNS, "endpoint", "new_connection",
+]
+# Every batch is grouped once by these columns (the first is required) plus status code
+GROUP_COLUMNS = ["language", "endpoint", "new_connection"]
+# Per-window histograms are only split by the leading ones that steady-state metrics need
+WINDOW_GROUP_COLUMNS = GROUP_COLUMNS[:2]
+INPUT_SIZE_BINS = [0, 25, 50, 100, 200, 500, 1000, 2000, 5000, np.inf]
+INPUT_SIZE_LABELS = [
+    f"{low}-{high - 1}" if high != np.inf else f"{low}+"
+    for low, high in zip(INPUT_SIZE_BINS, INPUT_SIZE_BINS[1:])
+]
+
+
+def find_results_file(candidates=RESULT_FILES):
+    """Return the most recently written result file, or None."""
+    existing = [path for path in candidates if os.path.exists(path)]
+    return max(existing, key=os.path.getmtime) if existing else None
+
+
+def parquet_dataset(path):
+    """A Parquet result file, or a ResultSink directory of part files (unfinished parts are skipped)."""
+    import pyarrow.dataset as ds
+
+    return ds.dataset(path, format="parquet")
+
+
+def result_columns(path):
+    if path.endswith(".parquet"):
+        return parquet_dataset(path).schema.names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def null_columns(path):
+    """Columns without a single value in a Parquet result (such as the PHASE_TIMING ones), from its footers."""
+    if not path.endswith(".parquet"):
+        return set()
+    import pyarrow.parquet as pq
+
+    empty = None
+    for fragment in parquet_dataset(path).get_fragments():
+        # fragment.metadata keeps each footer (about 0.5 MB for a part file) for the life of the process
+        metadata = pq.read_metadata(fragment.path, filesystem=fragment.filesystem)
+        for index in range(metadata.num_row_groups):
+            row_group = metadata.row_group(index)
+            nulls = set()
+            for position in range(row_group.num_columns):
+                column = row_group.column(position)
+                statistics = column.statistics
+                if statistics is not None and statistics.has_null_count and statistics.null_count == row_group.num_rows:
+                    nulls.add(column.path_in_schema)
+            empty = nulls if empty is None else empty & nulls
+    return empty or set()
+
+
+def count_rows(path):
+    if path.endswith(".parquet"):
+        return parquet_dataset(path).count_rows()
+    return sum(len(batch) for batch in iter_batches(path, ["status_code"]))
+
+
+def iter_batches(path, columns, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield DataFrames of only `columns`, batch_size rows at a time (Parquet or CSV)."""
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Dictionary-encode the string columns that are grouped on, so grouping works on small integer codes
+        dictionary_columns = [column for column in columns if CSV_DTYPES.get(column) == "category"]
+        # Part files hold a few thousand rows each; combine them so per-batch overhead stays small
+        pending, rows = [], 0
+        # One file at a time: scanning the dataset keeps every footer it has read until the scan ends
+        for fragment in parquet_dataset(path).get_fragments():
+            part = pq.ParquetFile(fragment.path, filesystem=fragment.filesystem, read_dictionary=dictionary_columns)
+            for batch in part.iter_batches(batch_size=batch_size, columns=columns):
+                pending.append(batch)
+                rows += batch.num_rows
+                if rows >= batch_size:
+                    yield pa.Table.from_batches(pending).to_pandas()
+                    pending, rows = [], 0
+        if rows:
+            yield pa.Table.from_batches(pending).to_pandas()
+    else:
+        dtypes = {column: CSV_DTYPES[column] for column in columns if column in CSV_DTYPES}
+        yield from pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=batch_size)
+
+
+def _column_codes(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype(np.int64), column.cat.categories.tolist()
+    codes, uniques = pd.factorize(column)
+    return codes.astype(np.int64), pd.Index(uniques).tolist()
+
+
+def row_groups(batch, columns=GROUP_COLUMNS):
+    """Map each row to a group id using integer codes, not string compares.
+
+    Returns (keys, group ids, valid): keys[i] is ((value in each of `columns`), status
+    code). Rows without a value in the first column get no group; a missing value
+    in any other column (or a column the batch lacks) is keyed None.
+    """
+    group_ids = np.zeros(len(batch), dtype=np.int64)
+    valid = np.ones(len(batch), dtype=bool)
+    values = []
+    for position, column in enumerate(columns):
+        if column in batch.columns:
+            codes, uniques = _column_codes(batch[column])
+        else:
+            codes, uniques = np.full(len(batch), -1, dtype=np.int64), []
+        if position == 0:
+            valid &= codes >= 0
+        else:
+            codes, uniques = codes + 1, [None] + uniques
+        group_ids = group_ids * len(uniques) + codes
+        values.append(uniques)
+    group_ids = group_ids[valid]
+    # Status codes are small non-negative ints: a lookup table avoids sorting the column
+    status_codes = batch["status_code"].to_numpy()[valid].astype(np.int64)
+    statuses = np.flatnonzero(np.bincount(status_codes))
+    lookup = np.zeros(statuses[-1] + 1 if statuses.size else 1, dtype=np.int64)
+    lookup[statuses] = np.arange(statuses.size)
+    group_ids = group_ids * len(statuses) + lookup[status_codes]
+    keys = [(group, int(status)) for group in itertools.product(*values) for status in statuses]
+    # Only the combinations that occur, so the key list stays short however many columns are combined
+    present = np.flatnonzero(np.bincount(group_ids, minlength=len(keys)))
+    lookup = np.zeros(len(keys), dtype=np.int64)
+    lookup[present] = np.arange(present.size)
+    return [keys[index] for index in present], lookup[group_ids], valid
+
+
+def stats_by(grouped, column=None):
+    """Collapse stats keyed by (GROUP_COLUMNS values, status code) to (language, status code).
+
+    With a column, keys are ((column value, language), status code) instead, and
+    rows with no value in that column are left out.
+    """
+    if column is None:
+        return grouped.regroup(lambda group, status: (group[0], status))
+    index = GROUP_COLUMNS.index(column)
+    return grouped.regroup(lambda group, status: ((group[index], group[0]), status) if group[index] is not None else None)
+
+
+class RunAggregates:
+    """Everything analyze_results.py reports, accumulated batch by batch in bounded memory.
+
+    Each batch is grouped once, by GROUP_COLUMNS and status code, and that grouping
+    feeds every histogram: latencies, corrected latencies, phase timings and the
+    per-window histograms of an optional WindowedStats. Quantiles never need a full
+    column in RAM; input sizes keep per-bucket histograms plus the running sums for
+    a least-squares latency-per-character fit.
+    """
+
+    def __init__(self, windows=None):
+        self.grouped = LatencyStats()
+        self.corrected_grouped = None
+        self.timings = {}
+        self.windows = windows
+        self.size_stats = None
+        self.size_sums = np.zeros(5)  # n, sum x, sum y, sum xx, sum xy
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.first_start = None
+        self.last_end = None
+
+    @property
+    def stats(self):
+        return stats_by(self.grouped)
+
+    @property
+    def corrected(self):
+        return stats_by(self.corrected_grouped) if self.corrected_grouped is not None else None
+
+    @property
+    def duration(self):
+        if self.first_start is not None:
+            return self.last_end - self.first_start
+        if self.first_timestamp is None:
+            return 0.0
+        return (pd.Timestamp(self.last_timestamp) - pd.Timestamp(self.first_timestamp)).total_seconds()
+
+    def add_batch(self, batch):
+        if "language" in batch.columns:
+            keys, group_ids, valid = row_groups(batch)
+            latencies = batch["latency_ms"].to_numpy()[valid]
+            self.grouped.record_groups(keys, group_ids, latencies)
+            corrected = batch["corrected_latency_ms"].to_numpy()[valid] if "corrected_latency_ms" in batch.columns else None
+            # Only open-loop runs record corrected latencies; closed-loop rows leave them empty
+            if corrected is not None and not np.isnan(corrected).all():
+                self.corrected_grouped = self.corrected_grouped or LatencyStats()
+                self.corrected_grouped.record_groups(keys, group_ids, corrected)
+            if "overhead_ms" in batch.columns:
+                self._add_timings(batch, keys, group_ids, valid)
+            if self.windows is not None and "start_ts" in batch.columns:
+                start_ts = batch["start_ts"].to_numpy()[valid]
+                end_ts = batch["end_ts"].to_numpy()[valid] if "end_ts" in batch.columns else start_ts
+                self.windows.add_groups(start_ts, end_ts, keys, group_ids, latencies)
+        if "input_chars" in batch.columns:
+            self._add_sizes(batch)
+
+        # "%Y-%m-%d %H:%M:%S" strings sort chronologically, so no per-row parsing is needed
+        timestamps = batch["timestamp"].dropna() if "timestamp" in batch.columns else ()
+        if len(timestamps):
+            first, last = timestamps.min(), timestamps.max()
+            self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+            self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+        # Sub-millisecond request start/end times, when the result file has them
+        if "start_ts" in batch.columns and batch["start_ts"].notna().any():
+            first, last = float(batch["start_ts"].min()), float(batch["end_ts"].max())
+            self.first_start = first if self.first_start is None else min(self.first_start, first)
+            self.last_end = last if self.last_end is None else max(self.last_end, last)
+
+    def _add_timings(self, batch, keys, group_ids, valid):
+        # Successful requests made with PHASE_TIMING=1
+        timed = ((batch["status_code"] == 200) & batch["overhead_ms"].notna()).to_numpy()[valid]
+        if not timed.any():
+            return
+        for column in TIMING_COLUMNS:
+            if column in batch.columns:
+                self.timings.setdefault(column, LatencyStats()).record_groups(
+                    keys, group_ids[timed], batch[column].to_numpy()[valid][timed]
+                )
+
+    def timing_breakdown(self):
+        """Mean and p95 of each client-side timing phase per language, or None without PHASE_TIMING data."""
+        if not self.timings:
+            return None
+        timings = {column: stats_by(stats) for column, stats in self.timings.items()}
+        columns = [column for column in TIMING_COLUMNS if column in timings]
+        languages = sorted({language for stats in timings.values() for language in stats.languages()})
+        rows = []
+        for language in languages + ["Aggregated"]:
+            histograms = {
+                column: stats.overall() if language == "Aggregated" else stats.language(language)
+                for column, stats in timings.items()
+            }
+            row = {"Language": language, "Requests": histograms[columns[0]].count}
+            for column in columns:
+                name = column[:-3].upper() if column[:-3] in ("dns", "tls", "ttfb") else column[:-3].capitalize()
+                row[f"{name} Mean (ms)"] = histograms[column].mean
+                row[f"{name} p95 (ms)"] = histograms[column].quantile(0.95)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def _add_sizes(self, batch):
+        ok = batch[(batch["status_code"] == 200) & (batch["input_chars"] > 0)]
+        if ok.empty:
+            return
+        self.size_stats = self.size_stats or LatencyStats()
+        x = ok["input_chars"].to_numpy(dtype=float)
+        y = ok["latency_ms"].to_numpy(dtype=float)
+        buckets = np.searchsorted(INPUT_SIZE_BINS, x, side="right") - 1
+        self.size_stats.record_groups([(label, 200) for label in INPUT_SIZE_LABELS], buckets, y)
+        self.size_sums += [x.size, x.sum(), y.sum(), (x * x).sum(), (x * y).sum()]
+
+    def cost_model(self):
+        n, sx, sy, sxx, sxy = self.size_sums
+        denominator = n * sxx - sx * sx
+        if n < 2 or math.isclose(denominator, 0):
+            return None
+        per_char = (n * sxy - sx * sy) / denominator
+        base = (sy - per_char * sx) / n
+        return {
+            "Base Latency (ms)": float(base),
+            "Latency per Char (ms)": float(per_char),
+            "Chars per Second per Connection": float(1000 / per_char) if per_char > 0 else 0.0,
+        }
+
+
+def aggregate_results(path, columns=None, batch_size=DEFAULT_BATCH_SIZE, windows=None):
+    """Aggregate a result file in one pass; a WindowedStats passed as windows gets its per-window histograms filled too."""
+    available = result_columns(path)
+    missing = [column for column in ["status_code", "latency_ms"] if column not in available]
+    if missing:
+        raise ValueError(f"missing columns: {missing}")
+    # Columns with no values are skipped rather than read as a batch of nulls
+    skipped = null_columns(path)
+    columns = [column for column in (columns or AGGREGATE_COLUMNS) if column in available and column not in skipped]
+    aggregates = RunAggregates(windows)
+    for batch in iter_batches(path, columns, batch_size):
+        aggregates.add_batch(batch)
+    return aggregates
@@ -1,131 +1,433 @@
 import sys
 import io
+import os
+import json
+import functools
+import hashlib
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
-
-# Set UTF-8 encoding for stdout to prevent encoding errors
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
-# Load test results
-try:
-    results_df = pd.read_csv("locust_results.csv")
-except FileNotFoundError:
-    print("Error: 'locust_results.csv' not found. Run locustfile.py first.")
-    sys.exit(1)
-
-if results_df.empty:
-    print("Error: 'locust_results.csv' is empty. Ensure Locust test generated valid data.")
-    sys.exit(1)
-
-required_columns = ["language", "latency_ms", "error", "timestamp"]
-missing_columns = [col for col in required_columns if col not in results_df.columns]
-if missing_columns:
-    print(f"Error: 'locust_results.csv' missing columns: {missing_columns}")
-    sys.exit(1)
-
-# Calculate per-language metrics
-language_metrics = results_df.groupby("language").agg({
-    "latency_ms": [
-        "mean",
-        lambda x: x.quantile(0.95) if not x.dropna().empty else 0,
-        lambda x: x.quantile(0.75) if not x.dropna().empty else 0,
-        lambda x: x.quantile(0.50) if not x.dropna().empty else 0
-    ],
-    "error": "mean"
-}).reset_index()
-language_metrics.columns = [
-    "Language", "Avg Latency (ms)", "p95 Latency (ms)",
-    "p75 Latency (ms)", "p50 Latency (ms)", "Error Rate"
+from latency_histogram import THROTTLED_STATUS, LatencyHistogram, LatencyStats
+from analysis_engine import INPUT_SIZE_LABELS, aggregate_results, find_results_file, stats_by
+from scenario import load_scenario
+from windowed_metrics import DEFAULT_WINDOW, WindowedStats, detect_phases
+
+HISTOGRAM_FILE = "latency_histograms.json"
+# Length in seconds of the windows in windowed_metrics.csv and latency_over_time.png
+ANALYSIS_WINDOW = float(os.getenv("ANALYSIS_WINDOW", DEFAULT_WINDOW))
+# Scenario of the run, for target traffic shares and per-endpoint SLOs in endpoint_metrics.csv
+SCENARIO_PATH = os.getenv("SCENARIO_PATH")
+# Written by sweep.py
+SWEEP_FILE = "sweep_results.csv"
+# cached_analysis() hashes this much of the start and end of each input file
+FINGERPRINT_BYTES = 64 * 1024
+
+QUANTILES = [0.95, 0.75, 0.50, 0.99, 0.999]
+LANGUAGE_COLUMNS = [
+    "Language", "Avg Latency (ms)", "p95 Latency (ms)", "p75 Latency (ms)",
+    "p50 Latency (ms)", "p99 Latency (ms)", "p99.9 Latency (ms)", "Error Rate", "Throttled (%)"
+]
+ENDPOINT_COLUMNS = [
+    "Endpoint", "Language", "Requests", "Share (%)", "Target Share (%)", "RPS", "Avg Latency (ms)",
+    "p50 Latency (ms)", "p95 Latency (ms)", "p99 Latency (ms)", "Error Rate (%)", "Throttled (%)", "SLO Breaches"
 ]
-language_metrics["Error Rate"] *= 100
-language_metrics = language_metrics.fillna(0)
-
-# Aggregate metrics
-try:
-    time_diff = (
-        pd.to_datetime(results_df["timestamp"], errors="coerce").max() -
-        pd.to_datetime(results_df["timestamp"], errors="coerce").min()
-    ).total_seconds()
+# Cold Start Cost is the p50 latency of requests that opened a connection over those that reused one
+CONNECTION_COLUMNS = [
+    "Language", "Requests", "New Connections (%)", "New Conn p50 Latency (ms)", "New Conn p95 Latency (ms)",
+    "Reused Conn p50 Latency (ms)", "Reused Conn p95 Latency (ms)", "Cold Start Cost (ms)"
+]
+
+def build_metrics(stats, corrected, duration):
+    rows = []
+    for language in stats.languages():
+        histogram = stats.language(language)
+        rows.append([language, histogram.mean] + [histogram.quantile(q) for q in QUANTILES] +
+                    [stats.error_count(language) / histogram.count * 100,
+                     stats.throttled_count(language) / histogram.count * 100])
+    language_metrics = pd.DataFrame(rows, columns=LANGUAGE_COLUMNS)
+    if corrected is not None and corrected.histograms:
+        language_metrics["Corrected p95 Latency (ms)"] = [
+            corrected.language(language).quantile(0.95) for language in language_metrics["Language"]
+        ]
+
+    overall = stats.overall()
     aggregate_metrics = {
-        "p95 Latency (ms)": results_df["latency_ms"].quantile(0.95),
-        "p75 Latency (ms)": results_df["latency_ms"].quantile(0.75),
-        "p50 Latency (ms)": results_df["latency_ms"].quantile(0.50),
-        "Avg Response Time (ms)": results_df["latency_ms"].mean(),
-        "RPS": len(results_df) / time_diff if time_diff > 0 else 0,
-        "Error Rate (%)": results_df["error"].mean() * 100
+        "p95 Latency (ms)": overall.quantile(0.95),
+        "p75 Latency (ms)": overall.quantile(0.75),
+        "p50 Latency (ms)": overall.quantile(0.50),
+        "p99 Latency (ms)": overall.quantile(0.99),
+        "p99.9 Latency (ms)": overall.quantile(0.999),
+        "Avg Response Time (ms)": overall.mean,
+        "RPS": overall.count / duration if duration > 0 else 0,
+        "Error Rate (%)": stats.error_count() / overall.count * 100 if overall.count else 0,
+        "Throttled (%)": stats.throttled_count() / overall.count * 100 if overall.count else 0
     }
-except Exception as e:
-    print(f"Error computing aggregate metrics: {e}")
-    sys.exit(1)
-
-# Plot 1: Latency by Language
-plt.figure(figsize=(12, 6))
-sns.barplot(data=language_metrics, x="Language", y="p95 Latency (ms)", color="red", label="p95", alpha=0.8)
-sns.barplot(data=language_metrics, x="Language", y="p75 Latency (ms)", color="blue", label="p75", alpha=0.5)
-sns.barplot(data=language_metrics, x="Language", y="p50 Latency (ms)", color="green", label="p50", alpha=0.3)
-plt.title("Latency Metrics by Language")
-plt.xlabel("Language")
-plt.ylabel("Latency (ms)")
-plt.legend()
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.savefig("latency_by_language.png")
-plt.close()
-
-# Plot 2: Sweep Config Performance
-sweep_configs = [
-    {"concurrency": 1},
-    {"concurrency": 5},
-    {"concurrency": 10},
-    {"concurrency": 25}
-]
-config_metrics = []
-for i, config in enumerate(sweep_configs):
+    if corrected is not None and corrected.histograms:
+        aggregate_metrics["Corrected p95 Latency (ms)"] = corrected.overall().quantile(0.95)
+        aggregate_metrics["Corrected p99 Latency (ms)"] = corrected.overall().quantile(0.99)
+    return language_metrics, aggregate_metrics
+
+def group_histogram(stats, group, language="All", status_code=None):
+    # stats is keyed by ((group, language), status code), see analysis_engine.stats_by
+    merged = LatencyHistogram(stats.relative_accuracy)
+    for ((name, lang), status), histogram in stats.histograms.items():
+        if name == group and language in ("All", lang) and status_code in (None, status):
+            merged.merge(histogram)
+    return merged
+
+def build_endpoint_metrics(stats, duration, scenario=None):
+    total = stats.overall().count
+    target_shares = scenario.target_shares() if scenario is not None else {}
+    rows = []
+    for endpoint in sorted({name for (name, _), _ in stats.histograms}):
+        languages = sorted({lang for (name, lang), _ in stats.histograms if name == endpoint})
+        slo_endpoint = scenario.endpoints.get(endpoint) if scenario is not None else None
+        for language in ["All"] + languages:
+            histogram = group_histogram(stats, endpoint, language)
+            throttled = group_histogram(stats, endpoint, language, THROTTLED_STATUS).count
+            failed = histogram.count - group_histogram(stats, endpoint, language, 200).count - throttled
+            error_rate = failed / histogram.count * 100
+            p50, p95, p99 = (histogram.quantile(q) for q in (0.50, 0.95, 0.99))
+            breaches = slo_endpoint.slo_breaches(p50, p95, p99, error_rate) if slo_endpoint is not None else []
+            target_share = target_shares.get(endpoint) if language == "All" else None
+            rows.append([
+                endpoint, language, histogram.count, histogram.count / total * 100,
+                target_share * 100 if target_share is not None else np.nan,
+                histogram.count / duration if duration > 0 else 0, histogram.mean, p50, p95, p99, error_rate,
+                throttled / histogram.count * 100, ", ".join(breaches)
+            ])
+    return pd.DataFrame(rows, columns=ENDPOINT_COLUMNS)
+
+def build_connection_metrics(stats):
+    # Successful requests only: a failure may never have got as far as connecting
+    rows = []
+    for language in ["All"] + sorted({lang for (_, lang), _ in stats.histograms}):
+        new = group_histogram(stats, True, language, 200)
+        reused = group_histogram(stats, False, language, 200)
+        total = new.count + reused.count
+        if not total:
+            continue
+        new_p50 = new.quantile(0.50) if new.count else np.nan
+        reused_p50 = reused.quantile(0.50) if reused.count else np.nan
+        rows.append([
+            language, total, new.count / total * 100,
+            new_p50, new.quantile(0.95) if new.count else np.nan,
+            reused_p50, reused.quantile(0.95) if reused.count else np.nan,
+            new_p50 - reused_p50
+        ])
+    return pd.DataFrame(rows, columns=CONNECTION_COLUMNS)
+
+def size_metrics_from(aggregates):
+    if aggregates.size_stats is None:
+        return None
+    rows = []
+    for label in INPUT_SIZE_LABELS:
+        histogram = aggregates.size_stats.language(label)
+        if histogram.count:
+            rows.append([label, histogram.count, histogram.mean, histogram.quantile(0.50), histogram.quantile(0.95)])
+    return pd.DataFrame(rows, columns=["Input Chars", "Requests", "Avg Latency (ms)", "p50 Latency (ms)", "p95 Latency (ms)"])
+
+
+class Analysis:
+    """Every table analyze() computes for one run, plus the notes it made along the way."""
+
+    def __init__(self, results_file=None, window=ANALYSIS_WINDOW):
+        self.results_file = results_file
+        self.window = window
+        self.language_metrics = None
+        self.aggregate_metrics = None
+        self.size_metrics = None
+        self.timing_breakdown = None
+        self.windowed = None
+        self.phases = None
+        self.endpoint_metrics = None
+        self.connection_metrics = None
+        self.sweep = None
+        self.messages = []
+
+    def log(self, message):
+        self.messages.append(message)
+
+def analyze(results_file=None, histogram_file=HISTOGRAM_FILE, window=ANALYSIS_WINDOW, scenario_path=SCENARIO_PATH,
+            sweep_file=SWEEP_FILE):
+    """Compute all metrics for the latest run without writing or plotting anything.
+
+    Raises ValueError when there are no results to analyze.
+    """
+    results_file = results_file or find_results_file()
+    analysis = Analysis(results_file, window)
+    log = analysis.log
+    if results_file is None and not os.path.exists(histogram_file):
+        raise ValueError("no locust_results.csv/.parquet found. Run locustfile.py first.")
+
+    aggregates = None
+    if results_file is not None:
+        # One chunked pass fills every histogram below, including the per-window ones, so the
+        # whole-run, windowed and steady-state metrics all come from the same rows
+        try:
+            aggregates = aggregate_results(results_file, windows=WindowedStats(window))
+        except ValueError as e:
+            raise ValueError(f"could not read '{results_file}': {e}") from None
+
+    if aggregates is None:
+        # Without raw results only the whole-run tables can be built, from the run's own histograms
+        log(f"No raw results, using latency histograms from {histogram_file}")
+        with open(histogram_file) as f:
+            histogram_data = json.load(f)
+        run_duration = (histogram_data.get("stopped_at") or 0) - (histogram_data.get("started_at") or 0)
+        language_metrics, aggregate_metrics = build_metrics(
+            LatencyStats.from_dict(histogram_data),
+            LatencyStats.from_dict(histogram_data["corrected"]) if "corrected" in histogram_data else None,
+            run_duration
+        )
+    else:
+        if not aggregates.stats.histograms:
+            raise ValueError(f"'{results_file}' is empty. Ensure Locust test generated valid data.")
+        log(f"Aggregated {aggregates.stats.overall().count} results from {results_file}")
+        run_duration = aggregates.duration
+        language_metrics, aggregate_metrics = build_metrics(aggregates.stats, aggregates.corrected, run_duration)
+
+    # Latency versus input size, from successful requests
+    analysis.size_metrics = size_metrics_from(aggregates) if aggregates is not None else None
+    cost_model = aggregates.cost_model() if aggregates is not None else None
+    if cost_model is not None:
+        aggregate_metrics.update(cost_model)
+        log(f"Cost model: {cost_model['Base Latency (ms)']:.2f} ms + "
+            f"{cost_model['Latency per Char (ms)']:.4f} ms/char")
+
+    # Where each request's time went, when the run was made with PHASE_TIMING=1
+    timing_breakdown = analysis.timing_breakdown = aggregates.timing_breakdown() if aggregates is not None else None
+    if timing_breakdown is not None:
+        overall_timing = timing_breakdown.iloc[-1]
+        log("Mean request phases (ms): " + ", ".join(
+            f"{column.split(' Mean')[0]} {overall_timing[column]:.3f}" for column in timing_breakdown.columns if " Mean" in column
+        ))
+        log("Phase times are wall-clock and include time the greenlet waited for the gevent hub "
+            "while other users ran, so they overstate the network under heavy client load")
+
+    # Latency over time in fixed windows, with ramp-up/warm-up/degradation detection
+    windowed = aggregates.windows.finish() if aggregates is not None else None
+    steady_range = None
+    if windowed is not None and not windowed.empty:
+        if aggregates.windows.window != window:
+            # Long runs merge adjacent windows so the per-window histograms stay bounded
+            log(f"Run too long for {window:g}s windows, using {aggregates.windows.window:g}s")
+            window = analysis.window = aggregates.windows.window
+        phases, phase_summary = detect_phases(windowed, window)
+        windowed["Phase"] = phases.reindex(windowed["Window Start"]).to_numpy()
+        analysis.windowed, analysis.phases = windowed, phases
+        steady_range = phase_summary.pop("steady_range")
+        aggregate_metrics.update(phase_summary)
+        log(f"Phases: ramp-up {phase_summary['Ramp-up (s)']:g}s, warm-up {phase_summary['Warm-up (s)']:g}s, "
+            f"steady {phase_summary['Steady Start (s)']:g}-{phase_summary['Steady End (s)']:g}s, "
+            f"p95 drift {phase_summary['p95 Drift (ms/min)']:.2f} ms/min")
+        if phase_summary["Degradation Start (s)"] is not None:
+            log(f"Warning: latency degraded from {phase_summary['Degradation Start (s)']:g}s into the run")
+
+        # Steady-state numbers leave out spawn ramp, warm-up and any degradation
+        steady = stats_by(aggregates.windows.stats_between(*steady_range))
+        steady_span = aggregates.windows.span_between(*steady_range)
+        if steady.histograms:
+            steady_overall = steady.overall()
+            aggregate_metrics.update({
+                "Steady p50 Latency (ms)": steady_overall.quantile(0.50),
+                "Steady p95 Latency (ms)": steady_overall.quantile(0.95),
+                "Steady p99 Latency (ms)": steady_overall.quantile(0.99),
+                # Over the time the steady requests actually ran, not the window-rounded range
+                "Steady RPS": steady_overall.count / steady_span if steady_span > 0 else 0,
+                "Steady Error Rate (%)": steady.error_count() / steady_overall.count * 100,
+            })
+            language_metrics["Steady p95 Latency (ms)"] = [
+                steady.language(language).quantile(0.95) for language in language_metrics["Language"]
+            ]
+
+    # Per-endpoint and per-language metrics, checked against the scenario's traffic shares and SLOs
+    endpoints = stats_by(aggregates.grouped, "endpoint") if aggregates is not None else None
+    if endpoints is not None and endpoints.histograms:
+        scenario = load_scenario(scenario_path) if scenario_path else None
+        endpoint_metrics = build_endpoint_metrics(endpoints, run_duration, scenario)
+        if steady_range is not None:
+            # Steady state is where interference between endpoints shows, without ramp-up noise
+            steady_endpoints = stats_by(aggregates.windows.stats_between(*steady_range), "endpoint")
+            endpoint_metrics["Steady p95 Latency (ms)"] = [
+                group_histogram(steady_endpoints, endpoint, language).quantile(0.95)
+                for endpoint, language in zip(endpoint_metrics["Endpoint"], endpoint_metrics["Language"])
+            ]
+        analysis.endpoint_metrics = endpoint_metrics
+        for _, row in endpoint_metrics[endpoint_metrics["Language"] == "All"].iterrows():
+            target = f" (target {row['Target Share (%)']:.1f}%)" if not np.isnan(row["Target Share (%)"]) else ""
+            log(f"{row['Endpoint']}: {row['Share (%)']:.1f}% of requests{target}, p95 {row['p95 Latency (ms)']:.2f} ms, "
+                f"errors {row['Error Rate (%)']:.2f}%")
+            if row["SLO Breaches"]:
+                log(f"Warning: {row['Endpoint']} breaches its SLO on {row['SLO Breaches']}")
+
+    # Cold start versus steady state: requests that opened a connection against those that reused one
+    connections = stats_by(aggregates.grouped, "new_connection") if aggregates is not None else None
+    if connections is not None and connections.histograms:
+        connection_metrics = build_connection_metrics(connections)
+        if not connection_metrics.empty:
+            analysis.connection_metrics = connection_metrics
+            overall_connections = connection_metrics.iloc[0]
+            aggregate_metrics["New Connections (%)"] = overall_connections["New Connections (%)"]
+            aggregate_metrics["Cold Start Cost (ms)"] = overall_connections["Cold Start Cost (ms)"]
+            log(f"Connections: {overall_connections['New Connections (%)']:.1f}% of requests opened one, "
+                f"p50 {overall_connections['New Conn p50 Latency (ms)']:.2f} ms new vs "
+                f"{overall_connections['Reused Conn p50 Latency (ms)']:.2f} ms reused")
+
+    # Concurrency sweep steps, aggregated over languages
     try:
-        config_df = pd.read_csv(f"locust_stats_config_{i}_stats.csv")
-        if not config_df.empty and "Name" in config_df.columns and "Aggregated" in config_df["Name"].values:
-            p95_value = config_df[config_df["Name"] == "Aggregated"]["95%"].iloc[0]
-            if pd.notna(p95_value):  # Ensure p95 value is not NaN
-                config_metrics.append({
-                    "Concurrency": config["concurrency"],
-                    "p95 Latency (ms)": p95_value
-                })
-            else:
-                print(f"Warning: No valid p95 latency in locust_stats_config_{i}_stats.csv.")
-        else:
-            print(f"Warning: locust_stats_config_{i}_stats.csv invalid or missing 'Aggregated' row.")
+        sweep_df = pd.read_csv(sweep_file)
+        analysis.sweep = sweep_df[sweep_df["Language"] == "Aggregated"].dropna(subset=["p95 Latency (ms)"])
+        if analysis.sweep.empty:
+            log(f"Warning: {sweep_file} has no aggregated sweep steps.")
+            analysis.sweep = None
     except FileNotFoundError:
-        print(f"Warning: locust_stats_config_{i}_stats.csv not found. Skipping.")
-
-# Generate p95_by_concurrency.png
-if config_metrics:
-    config_df = pd.DataFrame(config_metrics)
-    plt.figure(figsize=(10, 5))
-    plt.plot(config_df["Concurrency"], config_df["p95 Latency (ms)"], marker="o")
-    plt.title("p95 Latency Across Concurrency Levels")
-    plt.xlabel("Concurrency")
-    plt.ylabel("p95 Latency (ms)")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("p95_by_concurrency.png")
-    plt.close()
-else:
-    # Fallback: Use single-run data from locust_results.csv
-    print("Warning: No valid concurrency sweep data found. Generating p95_by_concurrency.png with single-run data.")
-    plt.figure(figsize=(10, 5))
-    plt.plot([1], [aggregate_metrics["p95 Latency (ms)"]], marker="o")
-    plt.title("p95 Latency Across Concurrency Levels (Single Run)")
-    plt.xlabel("Concurrency")
-    plt.ylabel("p95 Latency (ms)")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("p95_by_concurrency.png")
-    plt.close()
-
-# Save results
-language_metrics.to_csv("language_metrics.csv", index=False)
-pd.DataFrame([aggregate_metrics]).to_csv("aggregate_metrics.csv", index=False)
-print("Metrics saved to language_metrics.csv and aggregate_metrics.csv")
-print("Plots saved to latency_by_language.png and p95_by_concurrency.png")
\ No newline at end of file
+        log(f"Warning: {sweep_file} not found. Run sweep.py for a concurrency sweep.")
+
+    analysis.language_metrics = language_metrics
+    analysis.aggregate_metrics = aggregate_metrics
+    return analysis
+
+def file_fingerprint(path):
+    """(path, mtime, size, hash of the first and last FINGERPRINT_BYTES), or None if the file is missing.
+
+    A Parquet result directory is fingerprinted by its part files' names, mtimes and sizes.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    if os.path.isdir(path):
+        return path, tuple(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size) for entry in os.scandir(path)))
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if stat.st_size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, stat.st_size - FINGERPRINT_BYTES))
+            digest.update(f.read())
+    return path, stat.st_mtime_ns, stat.st_size, digest.hexdigest()
+
+@functools.lru_cache(maxsize=4)
+def _cached_analyze(fingerprint, results_file, histogram_file, window, scenario_path, sweep_file):
+    return analyze(results_file, histogram_file, window, scenario_path, sweep_file)
+
+def cached_analysis(histogram_file=HISTOGRAM_FILE, window=ANALYSIS_WINDOW, scenario_path=SCENARIO_PATH,
+                    sweep_file=SWEEP_FILE):
+    """analyze() memoized on the input files' fingerprints; repeat calls only stat and hash a few KiB.
+
+    The returned Analysis is shared between callers, so treat it as read-only.
+    """
+    results_file = find_results_file()
+    fingerprint = tuple(file_fingerprint(path) for path in (results_file, histogram_file, scenario_path, sweep_file))
+    return _cached_analyze(fingerprint, results_file, histogram_file, window, scenario_path, sweep_file)
+
+def write_outputs(analysis):
+    """Save the analysis as CSVs; returns the file names written."""
+    written = ["language_metrics.csv", "aggregate_metrics.csv"]
+    analysis.language_metrics.to_csv("language_metrics.csv", index=False)
+    pd.DataFrame([analysis.aggregate_metrics]).to_csv("aggregate_metrics.csv", index=False)
+    for table, filename in [
+        (analysis.size_metrics, "latency_by_input_size.csv"),
+        (analysis.timing_breakdown, "phase_timing.csv"),
+        (analysis.windowed, "windowed_metrics.csv"),
+        (analysis.endpoint_metrics, "endpoint_metrics.csv"),
+        (analysis.connection_metrics, "connection_metrics.csv"),
+    ]:
+        if table is not None:
+            table.to_csv(filename, index=False)
+            written.append(filename)
+    return written
+
+def write_plots(analysis):
+    """Render the PNG charts; matplotlib is only imported here. Returns the file names written."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    written = ["latency_by_language.png", "p95_by_concurrency.png"]
+    # Plot 1: Latency by Language, p50/p75/p95 side by side
+    language_metrics = analysis.language_metrics
+    positions = np.arange(len(language_metrics))
+    fig, ax = plt.subplots(figsize=(12, 6))
+    for offset, (column, color) in zip((-0.27, 0, 0.27), [
+        ("p50 Latency (ms)", "green"), ("p75 Latency (ms)", "blue"), ("p95 Latency (ms)", "red")
+    ]):
+        ax.bar(positions + offset, language_metrics[column], width=0.27, color=color, label=column.split()[0])
+    ax.set_xticks(positions, language_metrics["Language"], rotation=45)
+    ax.set_title("Latency Metrics by Language")
+    ax.set_xlabel("Language")
+    ax.set_ylabel("Latency (ms)")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig("latency_by_language.png")
+    plt.close(fig)
+
+    # Plot 2: latency percentiles and throughput over time, shaded by phase
+    if analysis.windowed is not None:
+        over_time = analysis.windowed[analysis.windowed["Language"] == "Aggregated"]
+        phases = analysis.phases
+        fig, ax = plt.subplots(figsize=(12, 5))
+        for column, color in [("p99 Latency (ms)", "red"), ("p95 Latency (ms)", "orange"), ("p50 Latency (ms)", "green")]:
+            ax.plot(over_time["Elapsed (s)"], over_time[column], color=color, label=column.split()[0])
+        phase_colors = {"ramp-up": "lightblue", "warm-up": "khaki", "degraded": "salmon", "ramp-down": "lightgray"}
+        elapsed = phases.index - phases.index[0]
+        for phase, color in phase_colors.items():
+            in_phase = elapsed[(phases == phase).to_numpy()]
+            if len(in_phase):
+                ax.axvspan(in_phase.min(), in_phase.max() + analysis.window, color=color, alpha=0.3, label=phase)
+        ax.set_xlabel("Elapsed (s)")
+        ax.set_ylabel("Latency (ms)")
+        ax.grid(True)
+        rps_ax = ax.twinx()
+        rps_ax.plot(over_time["Elapsed (s)"], over_time["RPS"], color="gray", linestyle="--", label="RPS")
+        rps_ax.set_ylabel("Throughput (RPS)")
+        handles, labels = ax.get_legend_handles_labels()
+        rps_handles, rps_labels = rps_ax.get_legend_handles_labels()
+        ax.legend(handles + rps_handles, labels + rps_labels, loc="upper left")
+        ax.set_title(f"Latency and Throughput Over Time ({analysis.window:g}s windows)")
+        fig.tight_layout()
+        fig.savefig("latency_over_time.png")
+        plt.close(fig)
+        written.append("latency_over_time.png")
+
+    # Plot 3: Sweep Performance, or the single run's p95 without a sweep
+    config_df = analysis.sweep
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if config_df is not None:
+        ax.plot(config_df["Concurrency"], config_df["p95 Latency (ms)"], marker="o", label="p95 latency")
+        knee = config_df[config_df["Knee"] | config_df["SLO Breached"]]
+        if not knee.empty:
+            ax.scatter(knee["Concurrency"], knee["p95 Latency (ms)"], color="red", zorder=3, label="Saturation / SLO breach")
+        rps_ax = ax.twinx()
+        rps_ax.plot(config_df["Concurrency"], config_df["RPS"], marker="s", color="gray", linestyle="--", label="RPS")
+        rps_ax.set_ylabel("Throughput (RPS)")
+        handles, labels = ax.get_legend_handles_labels()
+        rps_handles, rps_labels = rps_ax.get_legend_handles_labels()
+        ax.legend(handles + rps_handles, labels + rps_labels, loc="upper left")
+        ax.set_title("p95 Latency and Throughput Across Concurrency Levels")
+    else:
+        ax.plot([1], [analysis.aggregate_metrics["p95 Latency (ms)"]], marker="o")
+        ax.set_title("p95 Latency Across Concurrency Levels (Single Run)")
+    ax.set_xlabel("Concurrency")
+    ax.set_ylabel("p95 Latency (ms)")
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig("p95_by_concurrency.png")
+    plt.close(fig)
+    return written
+
+def main():
+    # Set UTF-8 encoding for stdout to prevent encoding errors
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    try:
+        analysis = analyze()
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for message in analysis.messages:
+        print(message)
+    if analysis.sweep is None:
+        print("Warning: No valid concurrency sweep data found. Generating p95_by_concurrency.png with single-run data.")
+    print(f"Metrics saved to {', '.join(write_outputs(analysis))}")
+    print(f"Plots saved to {', '.join(write_plots(analysis))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import random
+import time
+
+ARRIVAL_MODES = ("poisson", "fixed")
+
+
+class ArrivalSchedule:
+    """Hands out intended send times for a target request rate (open-loop load).
+
+    Send times depend only on the rate, never on how long earlier requests took.
+    Users claim slots in order; when every user is busy the next free user picks
+    up a slot that is already in the past, and the gap between the intended and
+    the actual send time is what corrects the latency for coordinated omission.
+    """
+
+    def __init__(self, rate, mode="poisson", seed=None):
+        if rate <= 0:
+            raise ValueError("Arrival rate must be positive")
+        if mode not in ARRIVAL_MODES:
+            raise ValueError(f"Unknown arrival mode '{mode}'. Choose from: {', '.join(ARRIVAL_MODES)}")
+        self.rate = rate
+        self.mode = mode
+        self._random = random.Random(seed)
+        # perf_counter, like the request start times the lag is measured against
+        self._next = time.perf_counter()
+
+    def next_send_time(self):
+        send_time = self._next
+        if self.mode == "poisson":
+            self._next += self._random.expovariate(self.rate)
+        else:
+            self._next += 1 / self.rate
+        return send_time
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from analysis_engine import aggregate_results
+from latency_histogram import LatencyStats
+from run_store import git_sha
+from windowed_metrics import WindowedStats
+
+BENCHMARK_FILE = "benchmark_results.csv"
+# Zero server-side latency, so every millisecond measured is our own overhead
+OVERHEAD_PROFILE = {"default": {"distribution": "constant", "ms": 0, "per_char_ms": 0}}
+HOT_PATH_SCRIPT = "import benchmark; print(benchmark.{function}({iterations}))"
+
+
+class CannedResponse:
+    status_code = 200
+    content = b'{"transliterated_text": "\\u0928\\u092e\\u0938\\u094d\\u0924\\u0947"}'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def success(self):
+        pass
+
+    def failure(self, message):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class CannedClient:
+    def post(self, path, data=None, headers=None, catch_response=False, **kwargs):
+        if "json" in kwargs:
+            # requests serializes json= bodies itself, so the original task pays for it here too
+            data = json.dumps(kwargs["json"], allow_nan=False).encode("utf-8")
+        return CannedResponse()
+
+
+def hot_path_rate(iterations):
+    """Requests per CPU second of locustfile's own per-request work, with no HTTP client or network."""
+    import locustfile
+    from result_sink import ForwardingSink
+
+    class HotPathUser(locustfile.TransliterationMixin):
+        client = CannedClient()
+
+    user = HotPathUser()
+    locustfile.result_sink = ForwardingSink(lambda batch: None)
+    started = time.process_time()
+    for _ in range(iterations):
+        lang_code, lang_name, text = locustfile.choose_payload()
+        user.transliterate_single_language(lang_code, lang_name, text)
+    locustfile.drain_samples()
+    locustfile.result_sink.close()
+    return iterations / (time.process_time() - started)
+
+
+def baseline_hot_path_rate(iterations):
+    """hot_path_rate for the original task code in benchmark_baseline.py."""
+    from benchmark_baseline import BaselineUser
+
+    user = BaselineUser(CannedClient())
+    started = time.process_time()
+    for _ in range(iterations):
+        user.transliterate_single_language_randomly()
+    return iterations / (time.process_time() - started)
+
+
+def run_hot_path(iterations, precompute=None):
+    """Hot path rate in a fresh interpreter, with PRECOMPUTE_REQUESTS on or off, or of the baseline code for None."""
+    env = {**os.environ, "SARVAM_API_KEY": "benchmark", "PRECOMPUTE_REQUESTS": "1" if precompute else "0"}
+    function = "baseline_hot_path_rate" if precompute is None else "hot_path_rate"
+    # A fresh interpreter per mode, since locustfile reads its settings at import
+    output = subprocess.run([sys.executable, "-c", HOT_PATH_SCRIPT.format(function=function, iterations=iterations)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return float(output.split()[-1])
+
+
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Mock server did not start on {host}:{port}")
+
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_benchmark(args, workdir, precompute=True):
+    profile_path = args.profile
+    if profile_path is None:
+        profile_path = os.path.join(workdir, "overhead_profile.json")
+        with open(profile_path, "w") as f:
+            json.dump(OVERHEAD_PROFILE, f)
+    mock = subprocess.Popen(
+        [sys.executable, "mock_server.py", "--port", str(args.port), "--workers", str(args.mock_workers),
+         "--profile", profile_path],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port("127.0.0.1", args.port)
+        results_path = os.path.join(workdir, "locust_results.parquet")
+        histogram_path = os.path.join(workdir, "latency_histograms.json")
+        env = {
+            **os.environ,
+            "SARVAM_API_KEY": os.getenv("SARVAM_API_KEY") or "benchmark",
+            "SARVAM_USER_CLASS": args.user_class,
+            "RESULT_SINK": "parquet",
+            "RESULT_PATH": results_path,
+            "HISTOGRAM_PATH": histogram_path,
+            "LIVE_METRICS_PATH": os.path.join(workdir, "live_metrics.jsonl"),
+            "RUN_INFO_PATH": os.path.join(workdir, "run_info.json"),
+            "RUN_STORE_PATH": "",
+            "PRECOMPUTE_REQUESTS": "1" if precompute else "0",
+        }
+        command = [
+            "locust", "-f", "locustfile.py", "--headless", "--only-summary",
+            "-u", str(args.users), "-r", str(args.spawn_rate or args.users), "-t", args.run_time,
+            "--host", f"http://127.0.0.1:{args.port}",
+        ]
+        if args.processes != 1:
+            command += ["--processes", str(args.processes)]
+        print(f"Running {args.users} {args.user_class} users for {args.run_time} against the mock server"
+              f"{'' if precompute else ' (PRECOMPUTE_REQUESTS=0)'}...")
+        cpu_before = children_cpu_seconds()
+        with open(os.path.join(workdir, "locust_output.log"), "w") as log:
+            subprocess.run(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+        generator_cpu = children_cpu_seconds() - cpu_before
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    if not os.path.exists(histogram_path):
+        raise RuntimeError(f"Locust produced no results, see {os.path.join(workdir, 'locust_output.log')}")
+    with open(histogram_path) as f:
+        histogram_data = json.load(f)
+    stats = LatencyStats.from_dict(histogram_data)
+    overall = stats.overall()
+    duration = histogram_data["stopped_at"] - histogram_data["started_at"]
+
+    analysis_started = time.perf_counter()
+    aggregate_results(results_path, windows=WindowedStats()).windows.finish()
+    analysis_time = time.perf_counter() - analysis_started
+
+    return {
+        "Timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "Git SHA": git_sha(),
+        "User Class": args.user_class,
+        "Users": args.users,
+        "Processes": args.processes,
+        "Precomputed Requests": precompute,
+        "Requests": overall.count,
+        "RPS": overall.count / duration if duration > 0 else 0,
+        "Error Rate (%)": stats.error_count() / overall.count * 100 if overall.count else 0,
+        "Generator CPU (s)": generator_cpu,
+        "CPU per Request (us)": generator_cpu / overall.count * 1e6 if overall.count else 0,
+        "Requests per CPU Second": overall.count / generator_cpu if generator_cpu else 0,
+        "p50 Latency (ms)": overall.quantile(0.50),
+        "p99 Latency (ms)": overall.quantile(0.99),
+        "Analysis Time (s)": analysis_time,
+        "Analysis Rows per Second": overall.count / analysis_time if analysis_time else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the load generator and analysis pipeline against mock_server.py.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--spawn-rate", type=float, help="Defaults to spawning all users at once")
+    parser.add_argument("--run-time", default="30s")
+    parser.add_argument("--processes", type=int, default=1, help="Locust --processes (-1 for one per CPU core)")
+    parser.add_argument("--user-class", default="SarvamTransliterationFastUser")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mock-workers", type=int, default=1)
+    parser.add_argument("--profile", help="Mock server profile (default: zero server latency)")
+    parser.add_argument("--output", default=BENCHMARK_FILE)
+    parser.add_argument("--compare", action="store_true",
+                        help="Run once with PRECOMPUTE_REQUESTS=0 and once with it on, and report the speedup")
+    parser.add_argument("--hot-path", type=int, metavar="N",
+                        help="Only time N calls of the locust task's own code (canned responses, no network): "
+                             "the original task, then the current one with PRECOMPUTE_REQUESTS off and on")
+    args = parser.parse_args()
+
+    if args.hot_path:
+        baseline = run_hot_path(args.hot_path)
+        print(f"Hot path requests per CPU second, original task: {baseline:.0f}")
+        for precompute in (False, True):
+            rate = run_hot_path(args.hot_path, precompute)
+            print(f"PRECOMPUTE_REQUESTS={int(precompute)}: {rate:.0f} ({rate / baseline:.2f}x the original)")
+        return
+
+    rows = []
+    for precompute in ([False, True] if args.compare else [True]):
+        with tempfile.TemporaryDirectory() as workdir:
+            rows.append(run_benchmark(args, workdir, precompute))
+        for name, value in rows[-1].items():
+            print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+    if args.compare and rows[0]["Requests per CPU Second"]:
+        speedup = rows[1]["Requests per CPU Second"] / rows[0]["Requests per CPU Second"]
+        print(f"Requests per CPU second: {rows[0]['Requests per CPU Second']:.0f} -> "
+              f"{rows[1]['Requests per CPU Second']:.0f} ({speedup:.2f}x)")
+    results = pd.DataFrame(rows)
+    if os.path.exists(args.output):
+        # Older files may lack newer columns
+        results = pd.concat([pd.read_csv(args.output), results], ignore_index=True)
+    results.to_csv(args.output, index=False)
+    print(f"Benchmark appended to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""The per-request code of the original locustfile.py (commit 74fe8c3), for benchmark.py --hot-path.
+
+transliterate_single_language is copied verbatim; only the HttpUser base class, the wait
+time and the task's time.sleep(1) are left out, since the benchmark supplies the client.
+"""
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+API_KEY = "benchmark"
+SAMPLE_TEXT = "Hello, how are you today?"
+LANGUAGES = {
+    "hi-IN": "Hindi",
+    "ta-IN": "Tamil",
+    "bn-IN": "Bengali",
+    "kn-IN": "Kannada",
+    "ml-IN": "Malayalam",
+    "mr-IN": "Marathi",
+    "od-IN": "Odia",
+    "pa-IN": "Punjabi",
+    "te-IN": "Telugu"
+}
+
+results = []
+VERBOSE = False
+
+
+class BaselineUser:
+    def __init__(self, client):
+        self.client = client
+
+    def transliterate_single_language_randomly(self):
+        lang_code, lang_name = random.choice(list(LANGUAGES.items()))
+        self.transliterate_single_language(lang_code, lang_name)
+
+    def transliterate_single_language(self, lang_code, lang_name):
+        payload = {
+            "input": SAMPLE_TEXT,
+            "source_language_code": "en-IN",
+            "target_language_code": lang_code,
+            "numerals_format": "international",
+            "spoken_form": False
+        }
+        headers = {
+            "Content-Type": "application/json",
+            "api-subscription-key": API_KEY
+        }
+
+        start_time = time.time()
+        try:
+            with self.client.post("/transliterate", json=payload, headers=headers, catch_response=True) as response:
+                elapsed_time = (time.time() - start_time) * 1000
+                timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+                if response.status_code == 200:
+                    data = response.json()
+                    transliterated_text = data.get('transliterated_text', 'N/A')
+                    if VERBOSE:
+                        logger.info(f"{lang_name}: '{SAMPLE_TEXT}' -> '{transliterated_text}'")
+                    response.success()
+                    result = {
+                        "language": lang_name,
+                        "status_code": response.status_code,
+                        "latency_ms": round(elapsed_time, 2),
+                        "output_text": transliterated_text,
+                        "error": False,
+                        "timestamp": timestamp
+                    }
+                else:
+                    response.failure(f"HTTP {response.status_code}")
+                    result = {
+                        "language": lang_name,
+                        "status_code": response.status_code,
+                        "latency_ms": round(elapsed_time, 2),
+                        "output_text": None,
+                        "error": True,
+                        "timestamp": timestamp
+                    }
+                results.append(result)
+        except Exception as e:
+            elapsed_time = (time.time() - start_time) * 1000
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            logger.error(f"Error in transliterate task for {lang_name}: {str(e)}")
+            results.append({
+                "language": lang_name,
+                "status_code": 0,
+                "latency_ms": round(elapsed_time, 2),
+                "output_text": None,
+                "error": True,
+                "timestamp": timestamp
+            })
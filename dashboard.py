@@ -5,6 +5,13 @@ import os
 import time
 import re
 from dotenv import load_dotenv
+from live_metrics import LiveMetricsReader
+import analyze_results
+
+LIVE_METRICS_FILE = "live_metrics.jsonl"
+LOCUST_LOG_FILE = "locust_output.log"
+# Keep about an hour of per-second snapshots for the live charts
+MAX_LIVE_SNAPSHOTS = 3600
 
 # Page configuration
 st.set_page_config(page_title="Sarvam API Load Test Dashboard", layout="wide")
@@ -25,6 +32,31 @@ with col4:
 def validate_run_time(run_time):
     return bool(re.match(r"^\d+[smh]$", run_time))
 
+# Charts are drawn from plain Vega-Lite specs: st.line_chart/st.bar_chart build and
+# validate an Altair chart on every rerun, which costs ~0.2 s per chart
+def line_chart(data, x, columns, y_title=None):
+    st.vega_lite_chart(data, {
+        "transform": [{"fold": columns, "as": ["Series", "Value"]}],
+        "mark": {"type": "line", "tooltip": True},
+        "encoding": {
+            "x": {"field": x, "type": "quantitative"},
+            "y": {"field": "Value", "type": "quantitative", "title": y_title},
+            "color": {"field": "Series", "type": "nominal", "sort": columns},
+        },
+    })
+
+def grouped_bar_chart(data, x, columns, y_title=None):
+    st.vega_lite_chart(data, {
+        "transform": [{"fold": columns, "as": ["Series", "Value"]}],
+        "mark": {"type": "bar", "tooltip": True},
+        "encoding": {
+            "x": {"field": x, "type": "nominal"},
+            "xOffset": {"field": "Series", "sort": columns},
+            "y": {"field": "Value", "type": "quantitative", "title": y_title},
+            "color": {"field": "Series", "type": "nominal", "sort": columns},
+        },
+    })
+
 # Check for required files
 required_files = ["locustfile.py", "analyze_results.py"]
 for file in required_files:
@@ -32,10 +64,14 @@ for file in required_files:
         st.error(f"{file} not found. Please ensure it exists in the same directory.")
         st.stop()
 
+@st.cache_data
+def locust_version():
+    # Starting locust takes about a second, far longer than rendering the page
+    return subprocess.run(["locust", "--version"], capture_output=True, text=True, check=True).stdout.strip()
+
 # Check Locust installation
 try:
-    result = subprocess.run(["locust", "--version"], capture_output=True, text=True, check=True)
-    st.info(f"Locust version: {result.stdout.strip()}")
+    st.info(f"Locust version: {locust_version()}")
 except subprocess.CalledProcessError:
     st.error("Locust is not installed or not found in PATH. Install it using 'pip install locust'.")
     st.stop()
@@ -53,8 +89,22 @@ if not api_key:
         st.error("No API key provided and SARVAM_API_KEY not found in .env file.")
         st.stop()
 
+# Live run state survives Streamlit reruns
+if "locust_process" not in st.session_state:
+    st.session_state.locust_process = None
+    st.session_state.live_reader = None
+    st.session_state.live_snapshots = []
+    st.session_state.finished_returncode = None
+    st.session_state.abort_reason = None
+
+abort_p95 = st.number_input(
+    "Abort if rolling p95 exceeds (ms, 0 = never)", min_value=0, value=0, step=100,
+    help="The test is stopped early when the 10-second rolling p95 goes above this value."
+)
+
 # Run Load Test button
-if st.button("Run Load Test"):
+running = st.session_state.locust_process is not None
+if st.button("Run Load Test", disabled=running):
     if not validate_run_time(run_time):
         st.error("Invalid Run Time format. Use '30s', '1m', or '1h'.")
         st.stop()
@@ -70,73 +120,145 @@ if st.button("Run Load Test"):
         f"--csv={csv_prefix}"
     ]
 
-    with st.spinner("Running Locust test..."):
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-            st.subheader("Locust Output")
-            st.code(result.stdout)
-            if result.stderr:
-                st.subheader("Locust Error Output")
-                st.code(result.stderr)
-
-            if result.returncode == 0:
-                st.success("Locust test completed successfully.")
-            elif "Type" in result.stdout and "# reqs" in result.stdout:
-                st.warning(f"Locust ran but exited with code {result.returncode}. Some requests were sent. Check error output above.")
-            else:
-                st.error(f"Locust failed with exit code {result.returncode}. No requests were sent.")
-                st.code(result.stderr)
-                st.stop()
-        except subprocess.TimeoutExpired:
-            st.error("Locust test timed out after 10 minutes.")
-            st.stop()
+    if os.path.exists(LIVE_METRICS_FILE):
+        os.remove(LIVE_METRICS_FILE)
+    # Locust runs in the background; its output goes to a log file shown when it exits
+    log_file = open(LOCUST_LOG_FILE, "w")
+    st.session_state.locust_process = subprocess.Popen(
+        cmd, stdout=log_file, stderr=subprocess.STDOUT, text=True,
+        env={**os.environ, "LIVE_METRICS_PATH": LIVE_METRICS_FILE}
+    )
+    log_file.close()
+    st.session_state.live_reader = LiveMetricsReader(LIVE_METRICS_FILE)
+    st.session_state.live_snapshots = []
+    st.session_state.finished_returncode = None
+    st.session_state.abort_reason = None
+    st.rerun()
+
+@st.fragment(run_every=1)
+def live_metrics_panel():
+    process = st.session_state.locust_process
+    if process is None:
+        return
+    st.session_state.live_snapshots.extend(st.session_state.live_reader.poll())
+    st.session_state.live_snapshots = st.session_state.live_snapshots[-MAX_LIVE_SNAPSHOTS:]
+    snapshots = st.session_state.live_snapshots
+
+    st.subheader("Live Metrics")
+    if snapshots:
+        latest = snapshots[-1]
+        col1, col2, col3, col4, col5, col6 = st.columns(6)
+        col1.metric("RPS", f"{latest['rps']:.1f}")
+        col2.metric("In-flight Requests", latest["inflight"])
+        col3.metric("Rolling p95 (ms)", f"{latest['p95']:.0f}")
+        col4.metric("Error Rate (%)", f"{latest['error_rate']:.2f}")
+        col5.metric("Throttled (%)", f"{latest.get('throttled_rate', 0):.2f}")
+        col6.metric("Generator CPU (%)", f"{latest.get('cpu_percent', 0):.0f}")
+        history = pd.DataFrame(snapshots).drop(columns="languages")
+        col1, col2 = st.columns(2)
+        with col1:
+            line_chart(history, "elapsed_s", ["rps", "inflight"])
+        with col2:
+            line_chart(history, "elapsed_s", ["p50", "p95"], "Latency (ms)")
+        st.dataframe(pd.DataFrame(latest["languages"]).T)
+    else:
+        st.info("Waiting for the first metrics from Locust...")
+
+    if process.poll() is None:
+        if abort_p95 and snapshots and snapshots[-1]["p95"] > abort_p95:
+            st.session_state.abort_reason = f"rolling p95 {snapshots[-1]['p95']:.0f} ms exceeded {abort_p95} ms"
+            process.terminate()
+        elif st.button("Stop Test"):
+            st.session_state.abort_reason = "stopped from the dashboard"
+            process.terminate()
+        return
+
+    # Locust exited: rerun the whole page to show its output and the analysis
+    st.session_state.locust_process = None
+    st.session_state.finished_returncode = process.returncode
+    st.rerun()
+
+live_metrics_panel()
+
+if st.session_state.finished_returncode is not None:
+    returncode = st.session_state.finished_returncode
+    st.session_state.finished_returncode = None
+    with open(LOCUST_LOG_FILE) as f:
+        locust_output = f.read()
+    st.subheader("Locust Output")
+    st.code(locust_output)
+
+    if st.session_state.abort_reason:
+        st.warning(f"Locust test ended early: {st.session_state.abort_reason}.")
+    elif returncode == 0:
+        st.success("Locust test completed successfully.")
+    elif "Type" in locust_output and "# reqs" in locust_output:
+        st.warning(f"Locust ran but exited with code {returncode}. Some requests were sent. Check output above.")
+    else:
+        st.error(f"Locust failed with exit code {returncode}. No requests were sent.")
+        st.stop()
 
     with st.spinner("Running analysis..."):
         try:
-            result = subprocess.run(["python", "analyze_results.py"], capture_output=True, text=True, check=True)
-            st.success("Analysis completed. Metrics and charts generated.")
-            st.code(result.stdout)
-        except subprocess.CalledProcessError as e:
-            st.error(f"Analysis failed:\n{e.stderr}")
+            analysis = analyze_results.cached_analysis()
+            # The CSVs are what upload_to_sheets.py reads
+            written = analyze_results.write_outputs(analysis)
+            st.success("Analysis completed. Metrics generated.")
+            st.code("\n".join(analysis.messages + [f"Metrics saved to {', '.join(written)}"]))
+        except ValueError as e:
+            st.error(f"Analysis failed: {e}")
             st.stop()
 
-# Display Metrics
+# Display Metrics; the analysis is cached on the result files, so reruns only re-render the charts
 st.header("Test Results")
 try:
-    if os.path.exists("language_metrics.csv"):
-        language_metrics = pd.read_csv("language_metrics.csv")
-        if language_metrics.empty:
-            st.warning("language_metrics.csv is empty.")
-        else:
-            st.subheader("Language-wise Metrics")
-            st.dataframe(language_metrics)
-    else:
-        st.warning("language_metrics.csv not found.")
-
-    if os.path.exists("aggregate_metrics.csv"):
-        aggregate_metrics = pd.read_csv("aggregate_metrics.csv")
-        if aggregate_metrics.empty:
-            st.warning("aggregate_metrics.csv is empty.")
-        else:
-            st.subheader("Aggregate Metrics")
-            st.dataframe(aggregate_metrics)
-    else:
-        st.warning("aggregate_metrics.csv not found.")
+    analysis = analyze_results.cached_analysis()
+except ValueError as e:
+    st.warning(f"No results to show: {e}")
+    analysis = None
+except Exception as e:
+    st.error(f"Error loading results: {e}")
+    analysis = None
+
+if analysis is not None:
+    st.subheader("Language-wise Metrics")
+    st.dataframe(analysis.language_metrics)
+    st.subheader("Aggregate Metrics")
+    st.dataframe(pd.DataFrame([analysis.aggregate_metrics]))
+
+    # Only computed for results with an endpoint column
+    if analysis.endpoint_metrics is not None:
+        st.subheader("Endpoint Metrics")
+        st.dataframe(analysis.endpoint_metrics)
+
+    if analysis.connection_metrics is not None:
+        st.subheader("Cold Start vs Reused Connections")
+        st.dataframe(analysis.connection_metrics)
 
     st.subheader("Latency by Language")
-    if os.path.exists("latency_by_language.png"):
-        st.image("latency_by_language.png", caption="Latency (p95, p75, p50) by Language")
-    else:
-        st.warning("latency_by_language.png not found.")
+    grouped_bar_chart(
+        analysis.language_metrics, "Language", ["p50 Latency (ms)", "p75 Latency (ms)", "p95 Latency (ms)"], "Latency (ms)"
+    )
+
+    if analysis.windowed is not None:
+        st.subheader("Latency and Throughput Over Time")
+        over_time = analysis.windowed[analysis.windowed["Language"] == "Aggregated"]
+        col1, col2 = st.columns(2)
+        with col1:
+            line_chart(over_time, "Elapsed (s)", ["p50 Latency (ms)", "p95 Latency (ms)", "p99 Latency (ms)"], "Latency (ms)")
+        with col2:
+            line_chart(over_time, "Elapsed (s)", ["RPS"], "Throughput (RPS)")
 
     st.subheader("p95 Latency by Concurrency")
-    if os.path.exists("p95_by_concurrency.png"):
-        st.image("p95_by_concurrency.png", caption="p95 Latency Across Concurrency Levels")
+    if analysis.sweep is not None:
+        col1, col2 = st.columns(2)
+        with col1:
+            line_chart(analysis.sweep, "Concurrency", ["p95 Latency (ms)"], "p95 Latency (ms)")
+        with col2:
+            line_chart(analysis.sweep, "Concurrency", ["RPS"], "Throughput (RPS)")
     else:
-        st.warning("p95_by_concurrency.png not found.")
-
-except Exception as e:
-    st.error(f"Error loading results: {e}")
+        st.info(f"No concurrency sweep found; run sweep.py for one. This run's p95 was "
+                f"{analysis.aggregate_metrics['p95 Latency (ms)']:.2f} ms.")
 
 # Upload to Google Sheets
 st.header("Upload to Google Sheets")
@@ -158,12 +280,12 @@ st.markdown("""
 1. Ensure Locust is installed (`pip install locust`) and `locustfile.py` is configured correctly.
 2. Enter your Sarvam API key in the text field above, or create a `.env` file with `SARVAM_API_KEY=your_api_key_here`.
 3. Enter concurrency, spawn rate, and run time (e.g., '30s', '1m', '1h').
-4. Click 'Run Load Test' to test the Transliteration API.
-5. Check the Locust output and error output for issues if no requests are sent.
+4. Click 'Run Load Test' to test the Transliteration API. Live RPS, in-flight requests, rolling p50/p95 and error rate update every second; use 'Stop Test' or the p95 abort threshold to end a run early.
+5. Check the Locust output for issues if no requests are sent.
 6. View metrics and plots in the 'Test Results' section.
 7. Click 'Upload Results to Google Sheets' to sync.
 8. In the Google Sheet:
    - Create Bar Chart: Latency Metrics by Language (p95, p75, p50)
    - Create Line Chart: p95 Latency Across Concurrency Levels
 9. Share Google Sheet with public viewer access.
-""")
\ No newline at end of file
+""")
\ No newline at end of file
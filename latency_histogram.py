@@ -0,0 +1,327 @@
+import math
+from array import array
+
+import numpy as np
+
+PERCENTILES = (0.50, 0.75, 0.95, 0.99, 0.999)
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_BUFFER_CAPACITY = 4096
+# Rate-limited responses are counted apart from failures
+THROTTLED_STATUS = 429
+# Latencies are tracked between 10 us and 1 h; anything outside is clamped to the edge buckets
+MIN_LATENCY_MS = 0.01
+MAX_LATENCY_MS = 3_600_000.0
+
+
+def percentile_label(q):
+    return f"p{q * 100:g}"
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with a fixed relative error bound.
+
+    Bucket i covers (gamma**(i-1), gamma**i] with gamma = (1 + a) / (1 - a), so any
+    quantile it reports is within a relative error of a (1% by default) of a sample
+    at that rank. The bucket range is fixed, which keeps memory bounded (~1000
+    buckets at 1%), and two histograms with the same accuracy merge by adding counts.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._min_index = self._index(MIN_LATENCY_MS)
+        self._max_index = self._index(MAX_LATENCY_MS)
+        self.counts = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value, count=1):
+        if value <= MIN_LATENCY_MS:
+            index = self._min_index
+        elif value >= MAX_LATENCY_MS:
+            index = self._max_index
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def bucket_indices(self, values):
+        # Vectorized _index() for analysis over large sample batches
+        clipped = np.clip(values, MIN_LATENCY_MS, MAX_LATENCY_MS)
+        return np.ceil(np.log(clipped) / self._log_gamma).astype(np.int64)
+
+    def add_bucket_counts(self, indices, counts, total, minimum, maximum):
+        for index, count in zip(indices, counts):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += sum(counts)
+        self.sum += total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        indices, counts = np.unique(self.bucket_indices(values), return_counts=True)
+        self.add_bucket_counts(indices.tolist(), counts.tolist(), float(values.sum()),
+                               float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge histograms with different relative accuracy")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def values(self, indices):
+        # Representative latency of each bucket index, vectorized _value()
+        return 2 * self._gamma ** np.asarray(indices, dtype=float) / (self._gamma + 1)
+
+    def percentiles(self, quantiles=PERCENTILES):
+        return {percentile_label(q): self.quantile(q) for q in quantiles}
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "counts": {str(index): count for index, count in self.counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["relative_accuracy"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        if histogram.count:
+            histogram.min = data["min"]
+            histogram.max = data["max"]
+        return histogram
+
+
+def grouped_quantiles(groups, buckets, counts, minimums, maximums, quantiles, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """LatencyHistogram.quantile() for many histograms at once, from (group, bucket index, count) entries.
+
+    Groups are 0..len(minimums)-1 and may repeat a bucket; returns one array per
+    quantile, with 0 for empty groups.
+    """
+    template = LatencyHistogram(relative_accuracy)
+    n_groups = len(minimums)
+    results = [np.zeros(n_groups) for _ in quantiles]
+    if not len(groups):
+        return results
+    low = int(buckets.min())
+    span = int(buckets.max()) - low + 1
+    codes, inverse = np.unique(np.asarray(groups, dtype=np.int64) * span + buckets - low, return_inverse=True)
+    cumulative = np.cumsum(np.bincount(inverse, weights=counts, minlength=codes.size))
+    code_groups = codes // span
+    totals = np.bincount(code_groups, weights=np.diff(cumulative, prepend=0), minlength=n_groups)
+    offsets = np.concatenate([[0.0], cumulative])[np.searchsorted(code_groups, np.arange(n_groups))]
+    present = totals > 0
+    for result, q in zip(results, quantiles):
+        # First bucket whose running count within its group exceeds the rank
+        positions = np.minimum(np.searchsorted(cumulative, offsets + q * (totals - 1), side="right"), codes.size - 1)
+        values = np.clip(template.values(codes[positions] % span + low), minimums, maximums)
+        result[present] = values[present]
+    return results
+
+
+class LatencyStats:
+    """One LatencyHistogram per (language, status code), with merged views on demand."""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.histograms = {}
+
+    def histogram(self, language, status_code):
+        key = (language, status_code)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(self.relative_accuracy)
+        return histogram
+
+    def record(self, language, status_code, latency_ms):
+        self.histogram(language, status_code).add(latency_ms)
+
+    def record_groups(self, keys, group_ids, latencies):
+        """Vectorized record(): sample i is recorded under keys[group_ids[i]].
+
+        One bincount over (group, bucket) pairs replaces per-sample adds, so large
+        batches cost a few numpy passes regardless of how many groups they hold.
+        The count matrix only spans the groups present and the buckets between the
+        batch's lowest and highest latency, however many keys there are.
+        """
+        latencies = np.asarray(latencies, dtype=float)
+        group_ids = np.asarray(group_ids, dtype=np.int64)
+        valid = ~np.isnan(latencies)
+        latencies, group_ids = latencies[valid], group_ids[valid]
+        if not latencies.size:
+            return
+        template = LatencyHistogram(self.relative_accuracy)
+        present = np.flatnonzero(np.bincount(group_ids, minlength=len(keys)))
+        lookup = np.zeros(len(keys), dtype=np.int64)
+        lookup[present] = np.arange(present.size)
+        group_ids = lookup[group_ids]
+        n_groups = present.size
+        buckets = template.bucket_indices(latencies)
+        low = int(buckets.min())
+        n_buckets = int(buckets.max()) - low + 1
+        counts = np.bincount(group_ids * n_buckets + buckets - low, minlength=n_groups * n_buckets).reshape(n_groups, n_buckets)
+        totals = np.bincount(group_ids, weights=latencies, minlength=n_groups)
+        minimums = np.full(n_groups, np.inf)
+        maximums = np.full(n_groups, -np.inf)
+        np.minimum.at(minimums, group_ids, latencies)
+        np.maximum.at(maximums, group_ids, latencies)
+        for group, key in enumerate(present):
+            nonzero = np.flatnonzero(counts[group])
+            self.histogram(*keys[key]).add_bucket_counts(
+                (nonzero + low).tolist(), counts[group, nonzero].tolist(),
+                float(totals[group]), float(minimums[group]), float(maximums[group])
+            )
+
+    def reset(self):
+        self.histograms = {}
+
+    def regroup(self, key):
+        """A copy with histograms merged under key(language, status_code); keys mapped to None are left out."""
+        regrouped = LatencyStats(self.relative_accuracy)
+        for (language, status_code), histogram in self.histograms.items():
+            new_key = key(language, status_code)
+            if new_key is not None:
+                regrouped.histogram(*new_key).merge(histogram)
+        return regrouped
+
+    def languages(self):
+        return sorted({language for language, _ in self.histograms})
+
+    def _merged(self, predicate):
+        merged = LatencyHistogram(self.relative_accuracy)
+        for (language, status_code), histogram in self.histograms.items():
+            if predicate(language, status_code):
+                merged.merge(histogram)
+        return merged
+
+    def language(self, language, status_code=None):
+        return self._merged(lambda lang, status: lang == language and status_code in (None, status))
+
+    def overall(self, status_code=None):
+        return self._merged(lambda lang, status: status_code in (None, status))
+
+    def error_count(self, language=None):
+        """Failed requests; throttled ones (HTTP 429) are counted by throttled_count() instead."""
+        return sum(
+            histogram.count for (lang, status), histogram in self.histograms.items()
+            if status not in (200, THROTTLED_STATUS) and language in (None, lang)
+        )
+
+    def throttled_count(self, language=None):
+        return sum(
+            histogram.count for (lang, status), histogram in self.histograms.items()
+            if status == THROTTLED_STATUS and language in (None, lang)
+        )
+
+    def merge(self, other):
+        for key, histogram in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(histogram)
+            else:
+                self.histograms[key] = LatencyHistogram(self.relative_accuracy).merge(histogram)
+        return self
+
+    def to_dict(self):
+        histograms = {}
+        for (language, status_code), histogram in self.histograms.items():
+            histograms.setdefault(language, {})[str(status_code)] = histogram.to_dict()
+        return {"relative_accuracy": self.relative_accuracy, "histograms": histograms}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["relative_accuracy"])
+        for language, by_status in data["histograms"].items():
+            for status_code, histogram in by_status.items():
+                stats.histograms[(language, int(status_code))] = LatencyHistogram.from_dict(histogram)
+        return stats
+
+
+class SampleBuffer:
+    """Preallocated arrays of pending samples, folded into histograms in vectorized batches.
+
+    append() only stores a group id and one float per column; when the buffer is
+    full, or on drain(), every target gets the whole batch through record_groups(),
+    which costs far less per sample than a LatencyStats.record() call each.
+    targets are (object with record_groups, column index) pairs.
+    """
+
+    def __init__(self, targets, columns=1, capacity=DEFAULT_BUFFER_CAPACITY):
+        self.targets = list(targets)
+        self.capacity = capacity
+        self.keys = []
+        self._key_ids = {}
+        self._group_ids = array("q", bytes(8 * capacity))
+        self._columns = [array("d", bytes(8 * capacity)) for _ in range(columns)]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, language, status_code, *values):
+        key = (language, status_code)
+        group = self._key_ids.get(key)
+        if group is None:
+            group = self._key_ids[key] = len(self.keys)
+            self.keys.append(key)
+        index = self._size
+        self._group_ids[index] = group
+        for column, value in zip(self._columns, values):
+            column[index] = value
+        self._size = index + 1
+        if self._size == self.capacity:
+            self.drain()
+
+    def drain(self):
+        if not self._size:
+            return
+        group_ids = np.frombuffer(self._group_ids, dtype=np.int64, count=self._size)
+        for target, column in self.targets:
+            target.record_groups(self.keys, group_ids, np.frombuffer(self._columns[column], count=self._size))
+        self._size = 0
+
+    def clear(self):
+        self._size = 0
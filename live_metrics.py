@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from collections import deque
+
+from latency_histogram import LatencyStats
+
+LIVE_METRICS_FILE = "live_metrics.jsonl"
+ROLLING_WINDOW = 10
+
+
+class LiveMetrics:
+    """Per-second JSONL snapshots of throughput, in-flight requests and rolling latency.
+
+    Samples go into the current one-second LatencyStats; every tick closes it and
+    reports RPS, error rate and per-language p50/p95 over the last `window` seconds.
+    """
+
+    def __init__(self, path=LIVE_METRICS_FILE, window=ROLLING_WINDOW):
+        self.path = path
+        self.window = window
+        self.inflight = 0
+        self._current = LatencyStats()
+        self._seconds = deque(maxlen=window)
+        self._started_at = None
+        self._file = None
+        self._cpu = deque(maxlen=window + 1)
+        # Stats over the last rolling_seconds closed seconds, as of the latest tick
+        self.rolling = LatencyStats()
+        self.rolling_seconds = 0
+
+    def start(self):
+        self._current = LatencyStats()
+        self._seconds.clear()
+        self._started_at = time.time()
+        self._cpu.clear()
+        self._cpu.append((time.monotonic(), time.process_time()))
+        self._file = open(self.path, "w")
+
+    def stop(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, language, status_code, latency_ms):
+        self._current.record(language, status_code, latency_ms)
+
+    def record_groups(self, keys, group_ids, latencies):
+        self._current.record_groups(keys, group_ids, latencies)
+
+    def tick(self, inflight=None, cpu_seconds=None):
+        """Close the current second; cpu_seconds is the load generators' total CPU time so far
+        (defaults to this process), reported over the rolling window as % of one core and CPU ms per request."""
+        self._seconds.append(self._current)
+        self._current = LatencyStats()
+        self._cpu.append((time.monotonic(), time.process_time() if cpu_seconds is None else cpu_seconds))
+        (first_tick, first_cpu), (last_tick, last_cpu) = self._cpu[0], self._cpu[-1]
+        cpu_used, wall = last_cpu - first_cpu, last_tick - first_tick
+        rolling = self.rolling = LatencyStats()
+        self.rolling_seconds = len(self._seconds)
+        for stats in self._seconds:
+            rolling.merge(stats)
+        overall = rolling.overall()
+        snapshot = {
+            "elapsed_s": round(time.time() - self._started_at, 1),
+            "rps": overall.count / len(self._seconds),
+            "inflight": self.inflight if inflight is None else inflight,
+            "error_rate": rolling.error_count() / overall.count * 100 if overall.count else 0.0,
+            "throttled_rate": rolling.throttled_count() / overall.count * 100 if overall.count else 0.0,
+            "p50": overall.quantile(0.50),
+            "p95": overall.quantile(0.95),
+            "cpu_percent": cpu_used / wall * 100 if wall > 0 else 0.0,
+            "cpu_ms_per_request": cpu_used * 1000 / overall.count if overall.count else 0.0,
+            "languages": {
+                language: {
+                    "requests": histogram.count,
+                    "p50": histogram.quantile(0.50),
+                    "p95": histogram.quantile(0.95),
+                }
+                for language in rolling.languages()
+                for histogram in [rolling.language(language)]
+            },
+        }
+        if self._file is not None:
+            self._file.write(json.dumps(snapshot) + "\n")
+            self._file.flush()
+        return snapshot
+
+
+class LiveMetricsReader:
+    """Tails a live metrics file, returning only the snapshots written since the last poll."""
+
+    def __init__(self, path=LIVE_METRICS_FILE):
+        self.path = path
+        self._offset = 0
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return []
+        if os.path.getsize(self.path) < self._offset:
+            self._offset = 0  # the file was restarted by a new run
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            lines = f.readlines()
+        # Leave a partially written last line for the next poll
+        if lines and not lines[-1].endswith(b"\n"):
+            lines.pop()
+        self._offset += sum(len(line) for line in lines)
+        return [json.loads(line) for line in lines if line.strip()]
@@ -1,13 +1,30 @@
 import sys
 import io
-from locust import HttpUser, task, between, events
+from locust import HttpUser, FastHttpUser, task, between, constant, events
+from locust.runners import MasterRunner, WorkerRunner
+from locust.clients import LocustHttpAdapter
+from locust.event import EventHook
+from geventhttpclient.client import HTTPClientPool
+from urllib3 import PoolManager
 import json
-import pandas as pd
+import math
 import time
 import os
 from dotenv import load_dotenv
-import random
 import logging
+import uuid
+import gevent
+from result_sink import create_sink, ForwardingSink
+from latency_histogram import THROTTLED_STATUS, LatencyStats, SampleBuffer, PERCENTILES
+from arrival_schedule import ArrivalSchedule
+from live_metrics import LiveMetrics
+from payload_corpus import PayloadCorpus, WeightedChoice, parse_mix, parse_size_mix
+from scenario import Endpoint, load_scenario
+from slo_gate import SLO_JUNIT_FILE, SLO_VERDICT_FILE, load_slo_gate, write_verdict
+from rate_control import RATE_CONTROL_MODES, RateController, combine_summaries, parse_retry_after
+from run_store import RunStore, git_sha
+import request_timing
+from request_timing import NO_TIMINGS
 
 # Set UTF-8 encoding for stdout to prevent encoding errors
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -19,12 +36,22 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-API_KEY = os.getenv("SARVAM_API_KEY")
-if not API_KEY:
-    logger.error("SARVAM_API_KEY not found in environment variables")
-    raise ValueError("SARVAM_API_KEY not found in environment variables")
+API_KEY = os.getenv("SARVAM_API_KEY", "")
+# Optional key pool (comma-separated); load is spread over the keys, each with its own rate limit
+API_KEYS = [key.strip() for key in os.getenv("SARVAM_API_KEYS", "").split(",") if key.strip()] or [API_KEY]
+if not API_KEYS[0]:
+    # Not fatal, so the harness can run against mock_server.py offline
+    logger.warning("SARVAM_API_KEY not found in environment variables; requests are sent without a key")
 
 SAMPLE_TEXT = "Hello, how are you today?"
+REQUEST_TEMPLATE = {
+    "input": "{text}",
+    "source_language_code": "en-IN",
+    "target_language_code": "{target_language}",
+    "numerals_format": "international",
+    "spoken_form": False
+}
+TRANSLITERATE = Endpoint("transliterate", "/transliterate", REQUEST_TEMPLATE, response_field="transliterated_text")
 LANGUAGES = {
     "hi-IN": "Hindi",
     "ta-IN": "Tamil",
@@ -37,106 +64,622 @@ LANGUAGES = {
     "te-IN": "Telugu"
 }
 
-results = []
 VERBOSE = False
+FAST_USER_WAIT = float(os.getenv("FAST_USER_WAIT", "0"))
+# Open-loop (SarvamOpenLoopUser) arrival rate per load generator process
+TARGET_RPS = float(os.getenv("TARGET_RPS", "10"))
+ARRIVAL_MODE = os.getenv("ARRIVAL_MODE", "poisson")
+# Optional JSONL payload corpus replacing SAMPLE_TEXT, plus size and target-language mixes
+CORPUS_PATH = os.getenv("CORPUS_PATH")
+CORPUS_TEXT_FIELD = os.getenv("CORPUS_TEXT_FIELD", "input")
+SIZE_MIX = os.getenv("SIZE_MIX")
+LANGUAGE_MIX = os.getenv("LANGUAGE_MIX")
+# Blended multi-endpoint workload for SarvamScenarioUser (JSON, or YAML with PyYAML)
+SCENARIO_PATH = os.getenv("SCENARIO_PATH")
+# Pass/fail thresholds checked during the run (early abort) and at the end (verdict and exit code)
+SLO_PATH = os.getenv("SLO_PATH")
+SLO_VERDICT_PATH = os.getenv("SLO_VERDICT_PATH", SLO_VERDICT_FILE)
+SLO_JUNIT_PATH = os.getenv("SLO_JUNIT_PATH", SLO_JUNIT_FILE)
+# Reuse pre-serialized bodies and shared headers, and buffer samples for vectorized
+# histogram updates; PRECOMPUTE_REQUESTS=0 builds everything per request (for comparison)
+PRECOMPUTE_REQUESTS = os.getenv("PRECOMPUTE_REQUESTS", "1").lower() in ("1", "true", "yes")
+# RATE_CONTROL=aimd paces requests per API key: additive increase while requests queue,
+# multiplicative decrease on 429, and no sends to a key during its Retry-After
+RATE_CONTROL = os.getenv("RATE_CONTROL", "off").lower()
+if RATE_CONTROL not in RATE_CONTROL_MODES:
+    raise ValueError(f"Unknown RATE_CONTROL '{RATE_CONTROL}'. Choose from: {', '.join(RATE_CONTROL_MODES)}")
+RATE_CONTROL_START_RPS = float(os.getenv("RATE_CONTROL_START_RPS", "5"))
+RATE_CONTROL_STEP_RPS = float(os.getenv("RATE_CONTROL_STEP_RPS", "1"))
+RATE_CONTROL_BACKOFF = float(os.getenv("RATE_CONTROL_BACKOFF", "0.5"))
+RATE_CONTROL_MAX_RPS = float(os.getenv("RATE_CONTROL_MAX_RPS", "1000"))
+# Per-request DNS/connect/TLS/send/TTFB/download breakdown (instruments urllib3 and geventhttpclient)
+PHASE_TIMING = os.getenv("PHASE_TIMING", "0").lower() in ("1", "true", "yes")
+# Connections per user, or in total with SHARED_POOL=1 (one pool shared by all users, like a
+# production client); KEEP_ALIVE=0 sends "Connection: close" so every request opens a new one
+POOL_SIZE = int(os.getenv("POOL_SIZE", "0")) or None
+SHARED_POOL = os.getenv("SHARED_POOL", "0").lower() in ("1", "true", "yes")
+KEEP_ALIVE = os.getenv("KEEP_ALIVE", "1").lower() in ("1", "true", "yes")
+# Requests each user sends on start to open its connection, kept out of the stats and results
+WARMUP_REQUESTS = int(os.getenv("WARMUP_REQUESTS", "0"))
+RESULTS_MESSAGE = "transliteration_results"
+RESULTS_DONE_MESSAGE = "transliteration_results_done"
+# sweep.py points these at each step's own files
+RESULT_PATH = os.getenv("RESULT_PATH")
+HISTOGRAM_FILE = os.getenv("HISTOGRAM_PATH", "latency_histograms.json")
+LIVE_METRICS_FILE = os.getenv("LIVE_METRICS_PATH", "live_metrics.jsonl")
+# Identifies the latest run for incremental uploads (upload_to_sheets.py)
+RUN_INFO_FILE = os.getenv("RUN_INFO_PATH", "run_info.json")
+# Every finished run is added to this SQLite history (set RUN_STORE_PATH= to disable)
+RUN_STORE_FILE = os.getenv("RUN_STORE_PATH", "runs.db")
+RUN_CONFIG_KEYS = [
+    "FAST_USER_WAIT", "TARGET_RPS", "ARRIVAL_MODE", "CORPUS_PATH", "SIZE_MIX", "LANGUAGE_MIX", "RESULT_SINK",
+    "PRECOMPUTE_REQUESTS", "SCENARIO_PATH", "RATE_CONTROL", "RATE_CONTROL_START_RPS", "RATE_CONTROL_STEP_RPS",
+    "RATE_CONTROL_BACKOFF", "RATE_CONTROL_MAX_RPS", "SLO_PATH", "POOL_SIZE", "SHARED_POOL", "KEEP_ALIVE",
+    "WARMUP_REQUESTS",
+]
+INFLIGHT_REPORT_KEY = "transliteration_inflight"
+CPU_REPORT_KEY = "transliteration_cpu_seconds"
+RATE_CONTROL_REPORT_KEY = "transliteration_rate_control"
+# perf_counter is monotonic and high resolution; anchoring it to the wall clock once
+# gives epoch timestamps that never jump backwards with NTP adjustments
+CLOCK_OFFSET = time.time() - time.perf_counter()
 
-class SarvamTransliterationUser(HttpUser):
-    wait_time = between(3, 8)
+result_sink = None
+# Master only: workers whose final batch has not arrived yet
+pending_workers = set()
+finish_pending = False
+payload_corpus = PayloadCorpus(
+    CORPUS_PATH, text_field=CORPUS_TEXT_FIELD, size_mix=parse_size_mix(SIZE_MIX) if SIZE_MIX else None
+) if CORPUS_PATH else None
+scenario = load_scenario(SCENARIO_PATH) if SCENARIO_PATH else None
+slo_gate = load_slo_gate(SLO_PATH) if SLO_PATH else None
+language_weights = parse_mix(LANGUAGE_MIX) if LANGUAGE_MIX else dict.fromkeys(LANGUAGES, 1.0)
+language_choice = WeightedChoice(
+    [(code, LANGUAGES[code]) for code in language_weights if code in LANGUAGES],
+    [weight for code, weight in language_weights.items() if code in LANGUAGES],
+)
+latency_stats = LatencyStats()
+corrected_latency_stats = LatencyStats()
+arrival_schedule = None
+live_metrics = LiveMetrics(LIVE_METRICS_FILE)
+# Read points (live ticks, the percentiles endpoint, the summary) drain it first
+sample_buffer = SampleBuffer(
+    [(latency_stats, 0), (corrected_latency_stats, 1), (live_metrics, 0)], columns=2
+) if PRECOMPUTE_REQUESTS else None
+# One shared headers dict per API key
+KEY_HEADERS = [{
+    "Content-Type": "application/json",
+    "api-subscription-key": key,
+    **({} if KEEP_ALIVE else {"Connection": "close"}),
+} for key in API_KEYS]
+rate_controller = RateController(
+    len(API_KEYS),
+    start_rps=RATE_CONTROL_START_RPS,
+    step_rps=RATE_CONTROL_STEP_RPS,
+    backoff=RATE_CONTROL_BACKOFF,
+    max_rps=RATE_CONTROL_MAX_RPS,
+) if RATE_CONTROL == "aimd" else None
+next_key = 0
+live_metrics_greenlet = None
+# Master only: latest in-flight request count and total CPU seconds reported by each worker
+worker_inflight = {}
+worker_cpu_seconds = {}
+worker_rate_control = {}
+schedule_lag_warned = False
+run_info = {}
+test_started_at = None
+test_started_cpu = None
+test_stopped_at = None
+slo_verdict_done = False
+timestamp_second = None
+timestamp_text = None
 
-    @task
-    def transliterate_single_language_randomly(self):
-        lang_code, lang_name = random.choice(list(LANGUAGES.items()))
-        self.transliterate_single_language(lang_code, lang_name)
-        time.sleep(1)
+def sample_input():
+    """(text, target language code from the corpus or None) from the run-wide input source."""
+    if payload_corpus is None:
+        return SAMPLE_TEXT, None
+    text, target_language_code = payload_corpus.sample()
+    return text, target_language_code if target_language_code in LANGUAGES else None
+
+def default_language():
+    return language_choice.choice()[0]
+
+def choose_payload():
+    lang_code, lang_name = language_choice.choice()
+    text, target_language_code = sample_input()
+    if target_language_code is not None:
+        lang_code, lang_name = target_language_code, LANGUAGES[target_language_code]
+    return lang_code, lang_name, text
+
+def record_result(lang_name, status_code, latency_ms, output_text, error, timestamp, schedule_lag_ms=None, input_chars=0,
+                  start_ts=None, end_ts=None, timings=NO_TIMINGS, endpoint_name=TRANSLITERATE.name, api_key_id=0,
+                  new_connection=False):
+    # Only open-loop requests have a scheduled send time to correct for
+    corrected_latency_ms = round(latency_ms + schedule_lag_ms, 2) if schedule_lag_ms is not None else None
+    record_row((lang_name, status_code, latency_ms, output_text, error, timestamp, schedule_lag_ms,
+                corrected_latency_ms, input_chars, start_ts, end_ts, *timings, endpoint_name,
+                status_code == THROTTLED_STATUS, api_key_id, new_connection))
 
-    def transliterate_single_language(self, lang_code, lang_name):
-        payload = {
-            "input": SAMPLE_TEXT,
-            "source_language_code": "en-IN",
-            "target_language_code": lang_code,
-            "numerals_format": "international",
-            "spoken_form": False
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "api-subscription-key": API_KEY
-        }
-
-        start_time = time.time()
+def schedule_lag(intended_start, start_time):
+    """Milliseconds a request left behind its scheduled send time (both perf_counter seconds)."""
+    global schedule_lag_warned
+    lag_ms = round(max(0.0, start_time - intended_start) * 1000, 2)
+    if lag_ms > 1000 and not schedule_lag_warned:
+        schedule_lag_warned = True
+        logger.warning(f"Requests are leaving {lag_ms:.0f} ms behind schedule; all users are busy or waiting "
+                       f"for an API key's rate limit, add more users or keys")
+    return lag_ms
+
+def choose_key():
+    """Index of the API key for the next request, waiting for its send slot under RATE_CONTROL."""
+    global next_key
+    if rate_controller is not None:
+        return rate_controller.wait()
+    next_key = (next_key + 1) % len(API_KEYS)
+    return next_key
+
+def record_row(row):
+    # row follows result_sink.RESULT_COLUMNS
+    lang_name, status_code, latency_ms = row[:3]
+    corrected_latency_ms = row[7]
+    if sample_buffer is not None:
+        # NaN is skipped when the buffer is folded into the histograms
+        sample_buffer.append(lang_name, status_code, latency_ms,
+                             corrected_latency_ms if corrected_latency_ms is not None else math.nan)
+    else:
+        latency_stats.record(lang_name, status_code, latency_ms)
+        if corrected_latency_ms is not None:
+            corrected_latency_stats.record(lang_name, status_code, corrected_latency_ms)
+        live_metrics.record(lang_name, status_code, latency_ms)
+    if result_sink is not None:
+        result_sink.record(row)
+
+def drain_samples():
+    if sample_buffer is not None:
+        sample_buffer.drain()
+
+def format_timestamp(epoch):
+    # Requests finishing in the same second share one strftime call
+    global timestamp_second, timestamp_text
+    second = int(epoch)
+    if second != timestamp_second:
+        timestamp_second, timestamp_text = second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+    return timestamp_text
+
+class TransliterationMixin:
+    def on_start(self):
+        if POOL_SIZE and not SHARED_POOL and isinstance(self, HttpUser):
+            # requests keeps 10 connections per host by default; FastHttpUser takes POOL_SIZE as its concurrency
+            adapter = LocustHttpAdapter(None, pool_maxsize=POOL_SIZE)
+            self.client.mount("https://", adapter)
+            self.client.mount("http://", adapter)
+        for _ in range(WARMUP_REQUESTS):
+            self.warm_up()
+
+    def warm_up(self):
+        # Sent like a test request (key rotation, rate control, connection pool), but the client reports to an
+        # event nobody listens to, so locust's stats, the SLO gate and every other events.request listener only
+        # see test requests. A 429 still cuts the key's rate, since the test's requests would hit the same limit.
+        endpoint = scenario.choose() if isinstance(self, SarvamScenarioUser) else TRANSLITERATE
+        lang_code, text = endpoint.sample(default_language, sample_input)
+        body = endpoint.bodies.build(lang_code, text)
+        key_id = choose_key()
+        request_event, self.client.request_event = self.client.request_event, EventHook()
         try:
-            with self.client.post("/transliterate", json=payload, headers=headers, catch_response=True) as response:
-                elapsed_time = (time.time() - start_time) * 1000
-                timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            start_time = time.perf_counter()
+            with self.client.post(endpoint.path, data=body, headers=KEY_HEADERS[key_id], catch_response=True) as response:
+                if rate_controller is not None:
+                    if response.status_code == THROTTLED_STATUS:
+                        rate_controller.on_throttled(key_id, start_time, parse_retry_after(response.headers.get("Retry-After")))
+                    elif response.status_code == 200:
+                        rate_controller.on_success(key_id)
+                if response.status_code != 200:
+                    logger.warning(f"Warm-up request to {endpoint.path} got HTTP {response.status_code}")
+                response.success()
+        except Exception as e:
+            logger.warning(f"Warm-up request failed: {e}")
+        finally:
+            self.client.request_event = request_event
+
+    def transliterate_single_language(self, lang_code, lang_name, text=SAMPLE_TEXT, intended_start=None):
+        self.send_request(TRANSLITERATE, lang_code, lang_name, text, intended_start)
+
+    def send_request(self, endpoint, lang_code, lang_name, text, intended_start=None):
+        # intended_start: open-loop send time (perf_counter) the corrected latency is measured from
+        key_id = choose_key()
+        # Always watches for new connections; only PHASE_TIMING times the phases
+        timer = request_timing.start_request(PHASE_TIMING)
+        encode_started = time.perf_counter_ns()
+        if PRECOMPUTE_REQUESTS:
+            body = endpoint.bodies.get(lang_code, text)
+            headers = KEY_HEADERS[key_id]
+        else:
+            body = endpoint.bodies.build(lang_code, text)
+            headers = {
+                "Content-Type": "application/json",
+                "api-subscription-key": API_KEYS[key_id]
+            }
+            if not KEEP_ALIVE:
+                headers["Connection"] = "close"
+        encode_ns = time.perf_counter_ns() - encode_started
+
+        live_metrics.inflight += 1
+        start_time = time.perf_counter()
+        # Taken after the key pool / rate control wait, so client-side queueing counts as lag
+        schedule_lag_ms = schedule_lag(intended_start, start_time) if intended_start is not None else None
+        try:
+            with self.client.post(endpoint.path, data=body, headers=headers, catch_response=True) as response:
+                end_time = time.perf_counter()
+                elapsed_time = (end_time - start_time) * 1000
+                timing = (CLOCK_OFFSET + start_time, CLOCK_OFFSET + end_time)
+                timestamp = format_timestamp(timing[1])
                 if response.status_code == 200:
-                    data = response.json()
-                    transliterated_text = data.get('transliterated_text', 'N/A')
+                    decode_started = time.perf_counter_ns()
+                    # The API answers in UTF-8; decoding directly skips response.json()'s charset detection
+                    data = json.loads(response.content.decode())
+                    decode_ns = time.perf_counter_ns() - decode_started
+                    # Only text outputs are kept (not e.g. base64 audio)
+                    output_text = data.get(endpoint.response_field) if endpoint.response_field else None
+                    if not isinstance(output_text, str):
+                        output_text = None
                     if VERBOSE:
-                        logger.info(f"{lang_name}: '{SAMPLE_TEXT}' -> '{transliterated_text}'")
+                        logger.info(f"{endpoint.name} {lang_name}: '{text}' -> '{output_text}'")
                     response.success()
-                    result = {
-                        "language": lang_name,
-                        "status_code": response.status_code,
-                        "latency_ms": round(elapsed_time, 2),
-                        "output_text": transliterated_text,
-                        "error": False,
-                        "timestamp": timestamp
-                    }
+                    if rate_controller is not None:
+                        rate_controller.on_success(key_id)
+                    timings = timer.timings(encode_ns, elapsed_time, decode_ns) if PHASE_TIMING else NO_TIMINGS
+                    record_result(lang_name, response.status_code, round(elapsed_time, 2), output_text, False, timestamp, schedule_lag_ms, len(text), *timing, timings, endpoint.name, key_id, timer.new_connection)
                 else:
-                    response.failure(f"HTTP {response.status_code}")
-                    result = {
-                        "language": lang_name,
-                        "status_code": response.status_code,
-                        "latency_ms": round(elapsed_time, 2),
-                        "output_text": None,
-                        "error": True,
-                        "timestamp": timestamp
-                    }
-                results.append(result)
+                    throttled = response.status_code == THROTTLED_STATUS
+                    response.failure(f"Throttled (HTTP {THROTTLED_STATUS})" if throttled else f"HTTP {response.status_code}")
+                    if throttled and rate_controller is not None:
+                        rate_controller.on_throttled(key_id, start_time, parse_retry_after(response.headers.get("Retry-After")))
+                    timings = timer.timings(encode_ns, elapsed_time, 0) if PHASE_TIMING else NO_TIMINGS
+                    # Throttled requests are reported apart from failures
+                    record_result(lang_name, response.status_code, round(elapsed_time, 2), None, not throttled, timestamp, schedule_lag_ms, len(text), *timing, timings, endpoint.name, key_id, timer.new_connection)
         except Exception as e:
-            elapsed_time = (time.time() - start_time) * 1000
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            logger.error(f"Error in transliterate task for {lang_name}: {str(e)}")
-            results.append({
-                "language": lang_name,
-                "status_code": 0,
-                "latency_ms": round(elapsed_time, 2),
-                "output_text": None,
-                "error": True,
-                "timestamp": timestamp
-            })
+            end_time = time.perf_counter()
+            elapsed_time = (end_time - start_time) * 1000
+            timestamp = format_timestamp(CLOCK_OFFSET + end_time)
+            logger.error(f"Error in {endpoint.name} task for {lang_name}: {str(e)}")
+            record_result(lang_name, 0, round(elapsed_time, 2), None, True, timestamp, schedule_lag_ms, len(text),
+                          CLOCK_OFFSET + start_time, CLOCK_OFFSET + end_time,
+                          timer.timings(encode_ns, elapsed_time, 0) if PHASE_TIMING else NO_TIMINGS, endpoint.name, key_id,
+                          timer.new_connection)
+        finally:
+            live_metrics.inflight -= 1
+            if PHASE_TIMING:
+                request_timing.end_request()
+
+class SarvamTransliterationUser(TransliterationMixin, HttpUser):
+    wait_time = between(3, 8)
+
+    @task
+    def transliterate_single_language_randomly(self):
+        lang_code, lang_name, text = choose_payload()
+        self.transliterate_single_language(lang_code, lang_name, text)
+        time.sleep(1)
+
+class SarvamTransliterationFastUser(TransliterationMixin, FastHttpUser):
+    # geventhttpclient with pooled keep-alive connections and no blocking sleep, so a
+    # single process can keep thousands of users (one in-flight request each) busy
+    wait_time = constant(FAST_USER_WAIT)
+
+    @task
+    def transliterate_single_language_randomly(self):
+        lang_code, lang_name, text = choose_payload()
+        self.transliterate_single_language(lang_code, lang_name, text)
+
+class SarvamOpenLoopUser(TransliterationMixin, FastHttpUser):
+    # Open-loop model: requests follow arrival_schedule at TARGET_RPS regardless of
+    # response times. Run enough users to cover TARGET_RPS x worst-case latency.
+    wait_time = constant(0)
+
+    @task
+    def transliterate_on_schedule(self):
+        intended = arrival_schedule.next_send_time()
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lang_code, lang_name, text = choose_payload()
+        self.transliterate_single_language(lang_code, lang_name, text, intended)
+
+class SarvamScenarioUser(TransliterationMixin, FastHttpUser):
+    # Blended workload from SCENARIO_PATH: each request picks an endpoint by weight
+    wait_time = constant(FAST_USER_WAIT)
+
+    @task
+    def call_scenario_endpoint(self):
+        endpoint = scenario.choose()
+        lang_code, text = endpoint.sample(default_language, sample_input)
+        self.send_request(endpoint, lang_code, LANGUAGES.get(lang_code, lang_code), text)
+
+USER_CLASSES = [SarvamTransliterationUser, SarvamTransliterationFastUser, SarvamOpenLoopUser, SarvamScenarioUser]
+
+def select_user_class(name):
+    # Only the selected user class is picked up by locust
+    if name not in [user_class.__name__ for user_class in USER_CLASSES]:
+        raise ValueError(f"Unknown SARVAM_USER_CLASS '{name}'")
+    if name == SarvamScenarioUser.__name__ and scenario is None:
+        raise ValueError(f"{name} needs SCENARIO_PATH to point at a scenario file")
+    for user_class in USER_CLASSES:
+        user_class.abstract = user_class.__name__ != name
+
+select_user_class(os.getenv("SARVAM_USER_CLASS", SarvamTransliterationUser.__name__))
+if SHARED_POOL:
+    # Class attributes, so every user of a class draws on the same connections
+    SarvamTransliterationUser.pool_manager = PoolManager(maxsize=POOL_SIZE or 10, block=True)
+    shared_client_pool = HTTPClientPool(
+        concurrency=POOL_SIZE or 10, connection_timeout=FastHttpUser.connection_timeout,
+        network_timeout=FastHttpUser.network_timeout, insecure=FastHttpUser.insecure
+    )
+    for user_class in USER_CLASSES:
+        if issubclass(user_class, FastHttpUser):
+            user_class.client_pool = shared_client_pool
+elif POOL_SIZE:
+    for user_class in USER_CLASSES:
+        if issubclass(user_class, FastHttpUser):
+            user_class.concurrency = POOL_SIZE
+request_timing.install()
+
+def on_results_message(environment, msg, **kwargs):
+    for row in msg.data:
+        record_row(tuple(row))
+
+def on_results_done_message(environment, msg, **kwargs):
+    pending_workers.discard(msg.node_id)
+    if finish_pending and not pending_workers:
+        finish_results(environment)
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    # Workers forward their samples to the master, which owns the result file
+    if environment.runner is not None and not isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message(RESULTS_MESSAGE, on_results_message)
+        environment.runner.register_message(RESULTS_DONE_MESSAGE, on_results_done_message)
+    if isinstance(environment.runner, MasterRunner):
+        environment.events.worker_report.add_listener(on_worker_report)
+    if isinstance(environment.runner, WorkerRunner):
+        environment.events.report_to_master.add_listener(on_report_to_master)
+    if environment.web_ui is not None:
+        environment.web_ui.app.add_url_rule("/transliteration/percentiles", "transliteration_percentiles", live_percentiles)
+
+def on_report_to_master(client_id, data, **kwargs):
+    data[INFLIGHT_REPORT_KEY] = live_metrics.inflight
+    data[CPU_REPORT_KEY] = time.process_time() - test_started_cpu if test_started_cpu is not None else 0.0
+    if rate_controller is not None:
+        data[RATE_CONTROL_REPORT_KEY] = rate_controller.summary()
+
+def on_worker_report(client_id, data, **kwargs):
+    worker_inflight[client_id] = data.get(INFLIGHT_REPORT_KEY, 0)
+    if CPU_REPORT_KEY in data:
+        worker_cpu_seconds[client_id] = data[CPU_REPORT_KEY]
+    if RATE_CONTROL_REPORT_KEY in data:
+        worker_rate_control[client_id] = data[RATE_CONTROL_REPORT_KEY]
+
+def generator_cpu_seconds():
+    # Master plus worker CPU, workers counting from their own test start
+    return time.process_time() + sum(worker_cpu_seconds.values())
+
+def publish_live_metrics(environment):
+    while True:
+        gevent.sleep(1)
+        drain_samples()
+        live_metrics.tick(live_metrics.inflight + sum(worker_inflight.values()), generator_cpu_seconds())
+        if slo_gate is None:
+            continue
+        reason = slo_gate.observe(live_metrics.rolling, live_metrics.rolling_seconds, time.time() - test_started_at)
+        if reason:
+            logger.error(f"SLO gate: aborting the test, {reason}")
+            # Quitting kills this greenlet, so do it from another one
+            gevent.spawn(environment.runner.quit)
+            return
+
+def log_cpu_usage(requests):
+    cpu_used = time.process_time() - test_started_cpu
+    wall = (test_stopped_at or time.time()) - test_started_at
+    cpu_percent = cpu_used / wall * 100 if wall > 0 else 0.0
+    logger.info(f"Load generator CPU: {cpu_percent:.0f}% of one core, {cpu_used * 1000 / max(requests, 1):.3f} ms per request")
+    if cpu_percent > 90:
+        logger.warning("The load generator is CPU-bound, so latencies include client-side queuing; add worker processes")
+
+def live_percentiles():
+    drain_samples()
+    stats = {}
+    for lang in latency_stats.languages():
+        histogram = latency_stats.language(lang)
+        stats[lang] = {"requests": histogram.count, "errors": latency_stats.error_count(lang), **histogram.percentiles()}
+    overall = latency_stats.overall()
+    stats["Aggregated"] = {"requests": overall.count, "errors": latency_stats.error_count(), **overall.percentiles()}
+    return stats
 
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
+    global result_sink, finish_pending, test_started_at, test_started_cpu, arrival_schedule, schedule_lag_warned, live_metrics_greenlet
+    global test_stopped_at, slo_verdict_done
+    if result_sink is not None:
+        finish_results(environment)
     logger.info(f"Starting Transliteration Load Test")
-    logger.info(f"Testing {len(LANGUAGES)} languages with text: '{SAMPLE_TEXT}'")
+    if not SarvamScenarioUser.abstract:
+        shares = ", ".join(f"{name} {share:.0%}" for name, share in scenario.target_shares().items())
+        logger.info(f"Scenario '{scenario.name}': {shares}")
+    if payload_corpus is not None:
+        logger.info(f"Testing {len(language_choice.items)} languages with {len(payload_corpus)} inputs from {CORPUS_PATH}")
+    else:
+        logger.info(f"Testing {len(language_choice.items)} languages with text: '{SAMPLE_TEXT}'")
+    if sample_buffer is not None:
+        sample_buffer.clear()
+    latency_stats.reset()
+    corrected_latency_stats.reset()
+    if not SarvamOpenLoopUser.abstract:
+        arrival_schedule = ArrivalSchedule(TARGET_RPS, ARRIVAL_MODE)
+        schedule_lag_warned = False
+        logger.info(f"Open-loop arrivals: {ARRIVAL_MODE} at {TARGET_RPS:g} RPS")
+    test_started_at = time.time()
+    test_started_cpu = time.process_time()
+    test_stopped_at = None
+    slo_verdict_done = False
+    if isinstance(environment.runner, WorkerRunner):
+        result_sink = ForwardingSink(lambda batch: environment.runner.send_message(RESULTS_MESSAGE, batch))
+        logger.info("Forwarding results to master")
+    else:
+        result_sink = create_sink(path=RESULT_PATH)
+        logger.info(f"Streaming results to: {result_sink.path}")
+        run_info.clear()
+        run_info.update({
+            "run_id": f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            "started_at": test_started_at,
+            "host": environment.host,
+            "user_class": next(cls.__name__ for cls in USER_CLASSES if not cls.abstract),
+            "results_file": result_sink.path,
+            "git_sha": git_sha(),
+            "config": {key: os.getenv(key) for key in RUN_CONFIG_KEYS if os.getenv(key) is not None},
+        })
+        write_run_info()
+    if isinstance(environment.runner, MasterRunner):
+        pending_workers.clear()
+        pending_workers.update(client.id for client in environment.runner.clients.all)
+    finish_pending = False
+    result_sink.start()
+    if not isinstance(environment.runner, WorkerRunner):
+        worker_inflight.clear()
+        worker_cpu_seconds.clear()
+        worker_rate_control.clear()
+        if slo_gate is not None:
+            slo_gate.reset()
+            logger.info(f"SLO gate from {SLO_PATH}: aborting once a limit is breached for {slo_gate.abort_after_s:g}s "
+                        f"after the first {slo_gate.grace_s:g}s")
+        live_metrics.start()
+        live_metrics_greenlet = gevent.spawn(publish_live_metrics, environment)
 
 @events.test_stop.add_listener
 def on_test_stop(environment, **kwargs):
-    if not results:
+    global result_sink, finish_pending, test_stopped_at
+    if result_sink is None:
+        return
+    test_stopped_at = time.time()
+    if isinstance(environment.runner, WorkerRunner):
+        result_sink.close()
+        environment.runner.send_message(RESULTS_DONE_MESSAGE, None)
+        logger.info(f"Forwarded {result_sink.rows_written} results to master")
+        log_cpu_usage(result_sink.rows_written)
+        result_sink = None
+        return
+    run_info["concurrency"] = environment.runner.target_user_count
+    if pending_workers:
+        # On a headless quit the master stops before the workers' final batches arrive
+        finish_pending = True
+    else:
+        finish_results(environment)
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    if finish_pending:
+        logger.warning(f"No final results from {len(pending_workers)} worker(s), summary may be incomplete")
+        finish_results(environment)
+    if (slo_gate is not None and not slo_verdict_done and test_started_at is not None
+            and not isinstance(environment.runner, WorkerRunner)):
+        # On SIGTERM (the dashboard's Stop and abort) locust fires quitting and picks the exit code
+        # before runner.quit() fires test_stop, so the verdict and its exit code must be in by now
+        drain_samples()
+        finish_slo_gate(environment)
+
+def rate_control_summary():
+    # Each process paces its own share of the load, so per-key rates add up
+    if worker_rate_control:
+        return combine_summaries(worker_rate_control.values())
+    return rate_controller.summary() if rate_controller is not None else []
+
+def write_run_info():
+    with open(RUN_INFO_FILE, "w") as f:
+        json.dump(run_info, f, indent=2)
+
+def finish_slo_gate(environment):
+    global slo_verdict_done
+    slo_verdict_done = True
+    duration = (test_stopped_at or time.time()) - test_started_at
+    verdict = slo_gate.verdict(latency_stats, duration, run_info)
+    write_verdict(verdict, SLO_VERDICT_PATH, SLO_JUNIT_PATH)
+    environment.process_exit_code = 0 if verdict["passed"] else 1
+    for check in verdict["checks"]:
+        if not check["passed"]:
+            logger.error(f"SLO breached: {check['scope']} {check['metric']} {check['observed']:g} (limit {check['limit']:g})")
+    logger.info(f"SLO verdict: {'PASS' if verdict['passed'] else 'FAIL'} "
+                f"({len(verdict['checks'])} checks), saved to {SLO_VERDICT_PATH} and {SLO_JUNIT_PATH}")
+
+def finish_results(environment):
+    global result_sink, finish_pending, live_metrics_greenlet
+    drain_samples()
+    if live_metrics_greenlet is not None:
+        live_metrics_greenlet.kill()
+        live_metrics_greenlet = None
+        live_metrics.tick(0, generator_cpu_seconds())
+        live_metrics.stop()
+    result_sink.close()
+    filename = result_sink.path
+    rows_written = result_sink.rows_written
+    result_sink = None
+    finish_pending = False
+    run_info.update({"stopped_at": test_stopped_at, "rows": rows_written})
+    rate_summary = rate_control_summary()
+    if rate_summary:
+        run_info["rate_control"] = rate_summary
+    write_run_info()
+    if slo_gate is not None and not slo_verdict_done:
+        finish_slo_gate(environment)
+
+    total = latency_stats.overall().count
+    if not total:
         logger.warning("No results collected.")
         return
 
-    df = pd.DataFrame(results)
-    filename = "locust_results.csv"
-    df.to_csv(filename, index=False)
+    with open(HISTOGRAM_FILE, "w") as f:
+        json.dump({
+            "run_id": run_info.get("run_id"),
+            "started_at": test_started_at,
+            "stopped_at": test_stopped_at,
+            **latency_stats.to_dict(),
+            # Open-loop runs only
+            **({"corrected": corrected_latency_stats.to_dict()} if corrected_latency_stats.histograms else {}),
+        }, f)
 
     logger.info("TEST SUMMARY")
     logger.info("=" * 60)
-    total = len(results)
-    successes = sum(1 for r in results if not r['error'])
-    failures = total - successes
-    avg_latency = sum(r['latency_ms'] for r in results if not r['error']) / successes if successes else 0
-    logger.info(f"Successful requests: {successes}")
-    logger.info(f"Failed requests: {failures}")
-    logger.info(f"Avg latency: {avg_latency:.2f} ms")
+    successes = latency_stats.overall(200)
+    throttled = latency_stats.throttled_count()
+    logger.info(f"Successful requests: {successes.count}")
+    logger.info(f"Failed requests: {latency_stats.error_count()}")
+    logger.info(f"Throttled requests (HTTP {THROTTLED_STATUS}): {throttled}")
+    logger.info(f"Avg latency: {successes.mean:.2f} ms")
+    if not worker_cpu_seconds:
+        log_cpu_usage(total)
     logger.info(f"Results saved to: {filename}")
+    logger.info(f"Latency histograms saved to: {HISTOGRAM_FILE}")
+    for key_id, entry in enumerate(rate_summary):
+        sustainable = f"~{entry['sustainable_rps']:.1f} RPS" if entry["sustainable_rps"] is not None else "not reached"
+        logger.info(f"API key #{key_id}: max sustainable {sustainable} | final rate {entry['rate_rps']:.1f} RPS | "
+                    f"{entry['cuts']} backoffs | {entry['successes']} ok | {entry['throttled']} throttled")
+    if RUN_STORE_FILE and run_info:
+        store = RunStore(RUN_STORE_FILE)
+        store.add_run(run_info, latency_stats)
+        store.close()
+        logger.info(f"Run {run_info['run_id']} added to: {RUN_STORE_FILE}")
 
     logger.info("PERFORMANCE STATS PER LANGUAGE")
     for lang in LANGUAGES.values():
-        lang_results = [r for r in results if r['language'] == lang]
-        if not lang_results:
+        histogram = latency_stats.language(lang)
+        if not histogram.count:
             continue
-        success = [r for r in lang_results if not r['error']]
-        fail = len(lang_results) - len(success)
-        avg = sum(r['latency_ms'] for r in success) / len(success) if success else 0
-        logger.info(f"{lang}: {len(lang_results)} reqs | Success: {len(success)} | Fail: {fail} | Avg: {avg:.2f} ms")
\ No newline at end of file
+        success = latency_stats.language(lang, 200)
+        fail = latency_stats.error_count(lang)
+        tail = " | ".join(f"{label}: {value:.2f} ms" for label, value in histogram.percentiles(PERCENTILES[2:]).items())
+        logger.info(f"{lang}: {histogram.count} reqs | Success: {success.count} | Fail: {fail} | Throttled: {latency_stats.throttled_count(lang)} | Avg: {success.mean:.2f} ms | {tail}")
+
+    if arrival_schedule is not None:
+        logger.info("CORRECTED LATENCY PER LANGUAGE (from scheduled send time)")
+        for lang in LANGUAGES.values():
+            histogram = corrected_latency_stats.language(lang)
+            if not histogram.count:
+                continue
+            tail = " | ".join(f"{label}: {value:.2f} ms" for label, value in histogram.percentiles(PERCENTILES[2:]).items())
+            logger.info(f"{lang}: {tail}")
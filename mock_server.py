@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import base64
+import json
+import math
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+from collections import deque
+
+SUPPORTED_LANGUAGES = ("en-IN", "hi-IN", "ta-IN", "bn-IN", "kn-IN", "ml-IN", "mr-IN", "od-IN", "pa-IN", "te-IN", "gu-IN")
+ENDPOINTS = ("/transliterate", "/translate", "/text-lid", "/text-to-speech")
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "lognormal")
+# Settings are looked up per language, then per endpoint, then "default"; latencies are in milliseconds
+DEFAULT_PROFILE = {
+    "default": {
+        "distribution": "lognormal",
+        "median_ms": 50,
+        "sigma": 0.3,
+        "per_char_ms": 0.05,
+        "error_rate": 0.0,
+        "error_codes": [500, 503],
+        "throttle_rate": 0.0,
+    },
+    "endpoints": {},
+    "languages": {},
+    "rate_limit": None,
+}
+STATUS_REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+    429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class LanguageProfile:
+    def __init__(self, distribution="constant", ms=0.0, min_ms=0.0, max_ms=0.0, median_ms=0.0, sigma=0.0,
+                 per_char_ms=0.0, error_rate=0.0, error_codes=(500,), throttle_rate=0.0, rng=random):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'. Choose from: {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.distribution = distribution
+        self.ms = ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.per_char_ms = per_char_ms
+        self.error_rate = error_rate
+        self.error_codes = list(error_codes)
+        self.throttle_rate = throttle_rate
+        self._random = rng
+
+    def latency(self, input_chars):
+        """Simulated processing time in seconds for an input of input_chars characters."""
+        if self.distribution == "lognormal":
+            ms = self.median_ms * math.exp(self._random.gauss(0.0, self.sigma)) if self.median_ms > 0 else 0.0
+        elif self.distribution == "uniform":
+            ms = self._random.uniform(self.min_ms, self.max_ms)
+        else:
+            ms = self.ms
+        return (ms + self.per_char_ms * input_chars) / 1000
+
+    def injected_status(self):
+        roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return self._random.choice(self.error_codes)
+        return 200
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Spend one token; return 0 if granted, otherwise seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def load_profile(path=None):
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        profile["default"].update(overrides.get("default", {}))
+        profile["endpoints"].update(overrides.get("endpoints", {}))
+        profile["languages"].update(overrides.get("languages", {}))
+        profile["rate_limit"] = overrides.get("rate_limit", profile["rate_limit"])
+    return profile
+
+
+class MockSarvamAPI:
+    """Request handling for a stand-in of Sarvam's text endpoints (see ENDPOINTS).
+
+    Same request and response schema as the real API. Each endpoint and target
+    language gets its own latency distribution plus 429/5xx injection, and an
+    optional token bucket (global or per API key, shared by all endpoints)
+    answers 429 with Retry-After once exceeded.
+    """
+
+    def __init__(self, profile, api_key=None, rate_share=1.0, seed=None):
+        self._random = random.Random(seed)
+        self.api_key = api_key
+        self.profiles = {
+            (endpoint, code): LanguageProfile(**{
+                **profile["default"], **profile["endpoints"].get(endpoint, {}), **profile["languages"].get(code, {})
+            }, rng=self._random)
+            for endpoint in ENDPOINTS
+            for code in SUPPORTED_LANGUAGES
+        }
+        rate_limit = profile.get("rate_limit") or {}
+        self.rate = rate_limit.get("rps", 0) * rate_share
+        self.burst = max(1.0, rate_limit.get("burst", self.rate) * rate_share)
+        self.per_key = rate_limit.get("per_key", False)
+        self.buckets = {}
+        self.requests = 0
+
+    def _throttled(self, key):
+        if self.rate <= 0:
+            return 0.0
+        bucket_key = key if self.per_key else None
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self.buckets[bucket_key] = TokenBucket(self.rate, self.burst)
+        return bucket.take()
+
+    def handle(self, method, path, headers, body):
+        """Return (status, JSON body, extra headers, delay in seconds)."""
+        self.requests += 1
+        endpoint = path.split("?", 1)[0]
+        if endpoint not in ENDPOINTS:
+            return error(404, "Not found")
+        if method != "POST":
+            return error(405, "Method not allowed")
+        key = headers.get("api-subscription-key")
+        if self.api_key is not None and key != self.api_key:
+            return error(403, "Invalid API subscription key")
+        # Text-to-speech takes "text"; language identification has no target language
+        text_field = "text" if endpoint == "/text-to-speech" else "input"
+        try:
+            payload = json.loads(body)
+            text = payload[text_field]
+            source = payload.get("source_language_code", "auto")
+            target = payload["target_language_code"] if endpoint != "/text-lid" else "en-IN"
+        except (ValueError, KeyError, TypeError):
+            return error(400, f"Request body must be JSON with '{text_field}' and 'target_language_code'")
+        if not isinstance(text, str) or (endpoint, target) not in self.profiles:
+            return error(400, f"Unsupported target_language_code '{target}'")
+
+        retry_after = self._throttled(key)
+        if retry_after:
+            return error(429, "Rate limit exceeded", {"Retry-After": str(math.ceil(retry_after))})
+        profile = self.profiles[(endpoint, target)]
+        status = profile.injected_status()
+        delay = profile.latency(len(text))
+        if status == 429:
+            return error(429, "Rate limit exceeded", {"Retry-After": "1"})
+        if status != 200:
+            return (*error(status, "Injected failure")[:3], delay)
+        return 200, {"request_id": f"mock-{os.getpid()}-{self.requests}", **response_fields(endpoint, text, source)}, {}, delay
+
+
+def response_fields(endpoint, text, source):
+    if endpoint == "/transliterate":
+        return {"transliterated_text": text, "source_language_code": source}
+    if endpoint == "/translate":
+        return {"translated_text": text, "source_language_code": source}
+    if endpoint == "/text-lid":
+        return {"language_code": "en-IN", "script_code": "Latn"}
+    # About 2 KB of silent 16-bit audio per input character
+    return {"audios": [base64.b64encode(bytes(2048 * len(text))).decode()]}
+
+
+def error(status, message, headers=None):
+    return status, {"error": {"message": message, "code": STATUS_REASONS.get(status, "error")}}, headers or {}, 0.0
+
+
+def build_response(status, body, headers, close):
+    content = json.dumps(body).encode()
+    lines = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, 'Unknown')}",
+             "Content-Type: application/json", f"Content-Length: {len(content)}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    if close:
+        lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + content
+
+
+class HttpProtocol(asyncio.Protocol):
+    """Minimal keep-alive HTTP/1.1 server connection.
+
+    Delayed responses are scheduled with call_later instead of a task per request
+    and queued in request order, so pipelined requests are answered in sequence.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.transport = None
+        self.buffer = bytearray()
+        self.pending = deque()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            header_end = self.buffer.find(b"\r\n\r\n")
+            if header_end < 0:
+                return
+            try:
+                request_line, *header_lines = self.buffer[:header_end].decode("latin-1").split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                self.transport.write(build_response(400, {"error": {"message": "Malformed request"}}, {}, True))
+                self.transport.close()
+                return
+            body_end = header_end + 4 + length
+            if len(self.buffer) < body_end:
+                return
+            body = bytes(self.buffer[header_end + 4:body_end])
+            del self.buffer[:body_end]
+
+            close = headers.get("connection", "").lower() == "close"
+            status, payload, extra_headers, delay = self.api.handle(method, path, headers, body)
+            slot = [None]
+            self.pending.append(slot)
+            response = build_response(status, payload, extra_headers, close)
+            if delay > 0:
+                asyncio.get_running_loop().call_later(delay, self._ready, slot, response, close)
+            else:
+                self._ready(slot, response, close)
+
+    def _ready(self, slot, response, close):
+        slot[0] = (response, close)
+        while self.pending and self.pending[0][0] is not None:
+            response, close = self.pending.popleft()[0]
+            if self.transport.is_closing():
+                continue
+            self.transport.write(response)
+            if close:
+                self.transport.close()
+
+
+async def serve(host, port, profile, api_key=None, rate_share=1.0, seed=None, reuse_port=False):
+    api = MockSarvamAPI(profile, api_key, rate_share, seed)
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: HttpProtocol(api), host, port, reuse_port=reuse_port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+def run_worker(host, port, profile, api_key, rate_share, seed, reuse_port):
+    try:
+        asyncio.run(serve(host, port, profile, api_key, rate_share, seed, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Sarvam text APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--profile", help="JSON file with default/per-endpoint/per-language latency, error and rate limit settings")
+    parser.add_argument("--api-key", help="Only accept this api-subscription-key (default: accept any)")
+    parser.add_argument("--workers", type=int, default=1, help="Server processes sharing the port (SO_REUSEPORT)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile)
+    print(f"Mock Sarvam API listening on http://{args.host}:{args.port} with {args.workers} worker(s)", flush=True)
+    # Each worker enforces an equal share of the rate limit
+    worker_args = [
+        (args.host, args.port, profile, args.api_key, 1 / args.workers,
+         None if args.seed is None else args.seed + worker, args.workers > 1)
+        for worker in range(args.workers)
+    ]
+    processes = [multiprocessing.Process(target=run_worker, args=worker) for worker in worker_args[1:]]
+    for process in processes:
+        process.start()
+    # Stop like on Ctrl+C, so terminating the server also stops its worker processes
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        run_worker(*worker_args[0])
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import json
+import mmap
+import random
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+TEXT_PLACEHOLDER = "{text}"
+LANGUAGE_PLACEHOLDER = "{target_language}"
+# RequestBodies keeps bodies up to this many bytes in total
+DEFAULT_BODY_CACHE_BYTES = 32 * 1024 * 1024
+# Rough per-entry cost beyond the body and text: dict slot, key tuple and object headers
+BODY_ENTRY_OVERHEAD = 200
+
+
+def parse_mix(value):
+    """Parse 'key:weight,key:weight' into a dict, e.g. 'hi-IN:3,ta-IN:1'."""
+    mix = {}
+    for item in value.split(","):
+        if item.strip():
+            key, _, weight = item.rpartition(":")
+            mix[key.strip()] = float(weight)
+    return mix
+
+
+def parse_size_mix(value):
+    """Parse 'min-max:weight,...' (character counts, max exclusive) into [((min, max), weight)]."""
+    buckets = []
+    for key, weight in parse_mix(value).items():
+        low, _, high = key.partition("-")
+        buckets.append(((int(low), int(high) if high else None), weight))
+    return buckets
+
+
+class WeightedChoice:
+    def __init__(self, items, weights):
+        self.items = items if isinstance(items, (list, array)) else list(items)
+        self.cumulative = array("d", accumulate(weights))
+        if not self.items or self.cumulative[-1] <= 0:
+            raise ValueError("Weighted choice needs at least one item with a positive weight")
+
+    def choice(self, rng=random):
+        return self.items[bisect_right(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+class PayloadCorpus:
+    """Samples transliteration inputs from a JSONL file without loading it into memory.
+
+    The file is memory-mapped and indexed lazily on first use: only each line's
+    offset, input length and weight are kept, in compact arrays. Lines can carry a
+    weight field and a target_language_code that overrides the language mix; a
+    size mix picks an input-length bucket first and then a line inside it.
+    """
+
+    def __init__(self, path, text_field="input", weight_field="weight", size_mix=None, seed=None):
+        self.path = path
+        self.text_field = text_field
+        self.weight_field = weight_field
+        self.size_mix = size_mix
+        self._random = random.Random(seed)
+        self._mmap = None
+        self._offsets = None
+        self._buckets = None
+
+    def _build_index(self):
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets, lengths, weights = array("Q"), array("I"), array("d")
+        position = 0
+        for line in iter(self._mmap.readline, b""):
+            record = json.loads(line) if line.strip() else None
+            if isinstance(record, dict) and record.get(self.text_field):
+                offsets.append(position)
+                lengths.append(len(record[self.text_field]))
+                weights.append(float(record.get(self.weight_field, 1.0)))
+            position += len(line)
+        if not offsets:
+            raise ValueError(f"No records with a '{self.text_field}' field in {self.path}")
+        self._offsets = offsets
+
+        size_mix = self.size_mix or [((0, None), 1.0)]
+        buckets, bucket_weights = [], []
+        for (low, high), bucket_weight in size_mix:
+            lines = array("Q", (i for i, length in enumerate(lengths) if length >= low and (high is None or length < high)))
+            if lines and bucket_weight > 0:
+                buckets.append(WeightedChoice(lines, (weights[i] for i in lines)))
+                bucket_weights.append(bucket_weight)
+        self._buckets = WeightedChoice(buckets, bucket_weights)
+
+    def __len__(self):
+        if self._offsets is None:
+            self._build_index()
+        return len(self._offsets)
+
+    def sample(self):
+        """Return (text, target_language_code or None) for a randomly chosen line."""
+        if self._buckets is None:
+            self._build_index()
+        line = self._buckets.choice(self._random).choice(self._random)
+        offset = self._offsets[line]
+        end = self._mmap.find(b"\n", offset)
+        record = json.loads(self._mmap[offset:end if end != -1 else len(self._mmap)])
+        return record[self.text_field], record.get("target_language_code")
+
+
+def fill_template(value, lang_code, text):
+    """Copy of a JSON template with "{text}" and "{target_language}" string values filled in."""
+    if value == TEXT_PLACEHOLDER:
+        return text
+    if value == LANGUAGE_PLACEHOLDER:
+        return lang_code
+    if isinstance(value, dict):
+        return {key: fill_template(item, lang_code, text) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill_template(item, lang_code, text) for item in value]
+    return value
+
+
+class RequestBodies:
+    """JSON request bodies, serialized once per (target language, input) and reused as bytes.
+
+    template is the body with "{text}" and "{target_language}" placeholders (see
+    fill_template). Cached bodies take at most about max_bytes (body, input text
+    and per-entry overhead), so a large corpus or long inputs fall back to
+    serializing the inputs seen after the cache filled per request.
+    """
+
+    def __init__(self, template, max_bytes=DEFAULT_BODY_CACHE_BYTES):
+        self.template = template
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._bodies = {}
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def build(self, lang_code, text):
+        return json.dumps(fill_template(self.template, lang_code, text)).encode()
+
+    def get(self, lang_code, text):
+        key = (lang_code, text)
+        body = self._bodies.get(key)
+        if body is None:
+            body = self.build(lang_code, text)
+            size = len(body) + len(text) + BODY_ENTRY_OVERHEAD
+            if self.size_bytes + size <= self.max_bytes:
+                self._bodies[key] = body
+                self.size_bytes += size
+        return body
@@ -0,0 +1,147 @@
+import email.utils
+import math
+import statistics
+import time
+
+RATE_CONTROL_MODES = ("off", "aimd")
+DEFAULT_START_RPS = 5.0
+# Added to a key's send rate per second while requests are queueing behind it
+DEFAULT_STEP_RPS = 1.0
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_RPS = 1000.0
+MIN_RPS = 0.5
+# Rates at the last few throttling events estimate the sustainable rate
+CEILING_SAMPLES = 5
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class KeyLimiter:
+    """AIMD send rate for one API key, with sends paced evenly at that rate.
+
+    The rate grows by step_rps per second while requests are waiting for it and is
+    multiplied by backoff on a 429, at most once per round trip: only a request
+    sent after the last cut can cut again. A cut also restarts the schedule at the
+    new rate, since requests queued at the old rate give up their slots (see
+    RateController.wait). Retry-After blocks the key until it ends.
+    """
+
+    def __init__(self, start_rps=DEFAULT_START_RPS, step_rps=DEFAULT_STEP_RPS, backoff=DEFAULT_BACKOFF,
+                 max_rps=DEFAULT_MAX_RPS):
+        self.rate = start_rps
+        self.step_rps = step_rps
+        self.backoff = backoff
+        self.max_rps = max_rps
+        now = time.perf_counter()
+        self.next_send = now
+        self.blocked_until = now
+        self.updated = now
+        self.last_cut = -math.inf
+        self.ceilings = []
+        self.successes = 0
+        self.throttled = 0
+
+    def available_at(self, now):
+        return max(self.next_send, self.blocked_until, now)
+
+    def reserve(self, now):
+        """Claim the next send slot; returns its perf_counter time."""
+        if self.next_send > now and now > self.blocked_until:
+            # Demand exceeds the current rate, so probe upwards
+            self.rate = min(self.max_rps, self.rate + self.step_rps * (now - self.updated))
+        self.updated = now
+        send_at = self.available_at(now)
+        self.next_send = send_at + 1 / self.rate
+        return send_at
+
+    def on_throttled(self, sent_at, retry_after=None):
+        now = time.perf_counter()
+        self.throttled += 1
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        if sent_at >= self.last_cut:
+            self.ceilings.append(self.rate)
+            self.rate = max(MIN_RPS, self.rate * self.backoff)
+            self.last_cut = now
+            # Slots handed out at the old rate are abandoned, so they must not push later sends back
+            self.next_send = max(now, self.blocked_until) + 1 / self.rate
+
+    def sustainable_rps(self):
+        """Median rate at the recent 429s, or None if this key was never throttled."""
+        if not self.ceilings:
+            return None
+        return statistics.median(self.ceilings[-CEILING_SAMPLES:])
+
+
+class RateController:
+    """One KeyLimiter per API key; each request goes to the key that can send soonest."""
+
+    def __init__(self, keys=1, **limiter_args):
+        self.limiters = [KeyLimiter(**limiter_args) for _ in range(keys)]
+
+    def acquire(self):
+        """Return (key index, perf_counter time to send at)."""
+        now = time.perf_counter()
+        key_id = min(range(len(self.limiters)), key=lambda i: self.limiters[i].available_at(now))
+        return key_id, self.limiters[key_id].reserve(now)
+
+    def wait(self):
+        """Sleep until a key may send and return its index.
+
+        A slot reserved before its key was throttled is given up and a new one
+        taken, so queued requests neither ignore Retry-After nor go out at the old rate.
+        """
+        while True:
+            key_id, send_at = self.acquire()
+            limiter = self.limiters[key_id]
+            cuts = len(limiter.ceilings)
+            delay = send_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if len(limiter.ceilings) == cuts:
+                return key_id
+
+    def on_success(self, key_id):
+        self.limiters[key_id].successes += 1
+
+    def on_throttled(self, key_id, sent_at, retry_after=None):
+        self.limiters[key_id].on_throttled(sent_at, retry_after)
+
+    def summary(self):
+        return [
+            {
+                "rate_rps": limiter.rate,
+                "sustainable_rps": limiter.sustainable_rps(),
+                "cuts": len(limiter.ceilings),
+                "successes": limiter.successes,
+                "throttled": limiter.throttled,
+            }
+            for limiter in self.limiters
+        ]
+
+
+def combine_summaries(summaries):
+    """Add up per-key summaries from several load generator processes."""
+    combined = []
+    for per_key in zip(*summaries):
+        sustainable = [entry["sustainable_rps"] for entry in per_key if entry["sustainable_rps"] is not None]
+        combined.append({
+            "rate_rps": sum(entry["rate_rps"] for entry in per_key),
+            "sustainable_rps": sum(sustainable) if sustainable else None,
+            "cuts": sum(entry["cuts"] for entry in per_key),
+            "successes": sum(entry["successes"] for entry in per_key),
+            "throttled": sum(entry["throttled"] for entry in per_key),
+        })
+    return combined
@@ -0,0 +1,149 @@
+import functools
+import socket
+import time
+
+import gevent.local
+
+# Network phases, in the order they happen; each is measured exclusive of the others
+PHASES = ("dns", "connect", "tls", "send", "ttfb", "download")
+# Matching result columns: encode and decode around the request, then the leftover overhead
+TIMING_COLUMNS = ["encode_ms"] + [f"{phase}_ms" for phase in PHASES] + ["decode_ms", "overhead_ms"]
+NO_TIMINGS = (None,) * len(TIMING_COLUMNS)
+# Phases that only happen when a request opens a new connection
+CONNECTION_PHASES = frozenset(("dns", "connect", "tls"))
+_current = gevent.local.local()
+_installed = False
+
+
+class ConnectionWatch:
+    """Only notes whether the current greenlet's request opened a new connection."""
+
+    __slots__ = ("new_connection",)
+
+    def __init__(self):
+        self.new_connection = False
+
+    def timed(self, phase, call, *args, **kwargs):
+        if phase in CONNECTION_PHASES:
+            self.new_connection = True
+        return call(*args, **kwargs)
+
+
+class PhaseTimer:
+    """Nanosecond time spent in each phase of the request the current greenlet is making.
+
+    Times are wall-clock, so a phase that yields to the gevent hub also includes
+    whatever other greenlets ran before this one was resumed.
+    """
+
+    __slots__ = ("phases", "total", "new_connection")
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0)
+        self.total = 0
+        self.new_connection = False
+
+    def timed(self, phase, call, *args, **kwargs):
+        if phase in CONNECTION_PHASES:
+            self.new_connection = True
+        # Exclusive timing: time spent in phases nested inside this call is not counted twice
+        started = time.perf_counter_ns()
+        nested = self.total
+        try:
+            return call(*args, **kwargs)
+        finally:
+            exclusive = time.perf_counter_ns() - started - (self.total - nested)
+            self.phases[phase] += exclusive
+            self.total += exclusive
+
+    def timings(self, encode_ns, latency_ms, decode_ns):
+        """Values for TIMING_COLUMNS; overhead is the part of latency_ms outside every network phase."""
+        network = [self.phases[phase] / 1e6 for phase in PHASES]
+        overhead = max(0.0, latency_ms - self.total / 1e6)
+        return tuple(round(value, 3) for value in [encode_ns / 1e6, *network, decode_ns / 1e6, overhead])
+
+
+def start_request(timed=True):
+    """Watch the current greenlet's next request; timed=False only notes whether it opens a connection."""
+    if timed:
+        timer = _current.timer = PhaseTimer()
+        return timer
+    # The greenlet keeps its ConnectionWatch across requests, so it needs no end_request()
+    watch = getattr(_current, "timer", None)
+    if type(watch) is not ConnectionWatch:
+        watch = _current.timer = ConnectionWatch()
+    watch.new_connection = False
+    return watch
+
+
+def end_request():
+    _current.timer = None
+
+
+def current():
+    return getattr(_current, "timer", None)
+
+
+def _timed(phase, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        timer = current()
+        if timer is None:
+            return function(*args, **kwargs)
+        return timer.timed(phase, function, *args, **kwargs)
+
+    return wrapper
+
+
+def _timed_create_connection(create_connection):
+    # Resolve separately so DNS and TCP connect are timed apart; connecting to each
+    # resolved address in turn keeps urllib3's fallback across addresses
+    from urllib3.util.connection import allowed_gai_family
+
+    @functools.wraps(create_connection)
+    def wrapper(address, *args, **kwargs):
+        timer = current()
+        if timer is None:
+            return create_connection(address, *args, **kwargs)
+        host, port = address
+        addresses = timer.timed("dns", socket.getaddrinfo, host.strip("[]"), port, allowed_gai_family(), socket.SOCK_STREAM)
+        error = None
+        for *_, sockaddr in addresses:
+            try:
+                return timer.timed("connect", create_connection, (sockaddr[0], port), *args, **kwargs)
+            except OSError as e:
+                error = e
+        raise error
+
+    return wrapper
+
+
+def install():
+    """Instrument urllib3 (HttpUser) and geventhttpclient (FastHttpUser) connections.
+
+    Only requests made between start_request() and end_request() on the same
+    greenlet are watched; everything else goes through the original methods.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    import urllib3.connection
+    import urllib3.response
+    import urllib3.util.connection
+
+    urllib3.util.connection.create_connection = _timed_create_connection(urllib3.util.connection.create_connection)
+    urllib3.connection.HTTPSConnection.connect = _timed("tls", urllib3.connection.HTTPSConnection.connect)
+    urllib3.connection.HTTPConnection.request = _timed("send", urllib3.connection.HTTPConnection.request)
+    urllib3.connection.HTTPConnection.getresponse = _timed("ttfb", urllib3.connection.HTTPConnection.getresponse)
+    urllib3.response.HTTPResponse.read = _timed("download", urllib3.response.HTTPResponse.read)
+
+    from geventhttpclient import client, connectionpool, response
+
+    connectionpool.ConnectionPool._resolve = _timed("dns", connectionpool.ConnectionPool._resolve)
+    connectionpool.ConnectionPool._connect_socket = _timed("connect", connectionpool.ConnectionPool._connect_socket)
+    connectionpool.SSLConnectionPool._connect_socket = _timed("tls", connectionpool.SSLConnectionPool._connect_socket)
+    client.HTTPClient.request = _timed("send", client.HTTPClient.request)
+    response.HTTPSocketResponse._read_headers = _timed("ttfb", response.HTTPSocketResponse._read_headers)
+    response.HTTPSocketResponse.read = _timed("download", response.HTTPSocketResponse.read)
@@ -0,0 +1,240 @@
+import abc
+import csv
+import logging
+import os
+import time
+
+from gevent.threadpool import ThreadPool
+
+logger = logging.getLogger(__name__)
+
+# Column name and Arrow type alias for every per-request sample, in row order
+RESULT_FIELDS = [
+    ("language", "string"),
+    ("status_code", "int32"),
+    ("latency_ms", "float64"),
+    ("output_text", "string"),
+    ("error", "bool"),
+    ("timestamp", "string"),
+    # Open-loop runs: how late the request left versus its scheduled send time,
+    # and the latency measured from the scheduled time (coordinated-omission corrected)
+    ("schedule_lag_ms", "float64"),
+    ("corrected_latency_ms", "float64"),
+    ("input_chars", "int32"),
+    # Request start and end in epoch seconds, read from a monotonic high-resolution clock
+    ("start_ts", "float64"),
+    ("end_ts", "float64"),
+    # PHASE_TIMING=1 breakdown in ms: JSON encode, network phases, response decode, and the
+    # client-side overhead (latency_ms minus the network phases); empty otherwise
+    ("encode_ms", "float64"),
+    ("dns_ms", "float64"),
+    ("connect_ms", "float64"),
+    ("tls_ms", "float64"),
+    ("send_ms", "float64"),
+    ("ttfb_ms", "float64"),
+    ("download_ms", "float64"),
+    ("decode_ms", "float64"),
+    ("overhead_ms", "float64"),
+    # API endpoint the request went to (scenario endpoint name; "transliterate" by default)
+    ("endpoint", "string"),
+    # Rate-limited (HTTP 429), counted apart from errors; index of the API key used from SARVAM_API_KEYS
+    ("throttled", "bool"),
+    ("api_key_id", "int32"),
+    # Whether the request had to open a connection (DNS/connect/TLS) rather than reuse a pooled one
+    ("new_connection", "bool"),
+]
+RESULT_COLUMNS = [name for name, _ in RESULT_FIELDS]
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0
+# A Parquet result directory gets a new part file every this many batches
+DEFAULT_PART_BATCHES = 20
+PART_PREFIX = "part-"
+
+
+class ResultSink(abc.ABC):
+    """Streams result rows to disk in batches written on a separate OS thread.
+
+    The request path only appends a tuple to the current batch; full (or stale)
+    batches go to a one-thread gevent ThreadPool, so file writes and flushes never
+    block the hub driving the requests (under locust's monkey-patching a
+    threading.Thread would just be another greenlet). Memory stays bounded by
+    batch_size no matter how long the run is.
+    """
+
+    def __init__(self, path, fields=RESULT_FIELDS, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.fields = list(fields)
+        self.columns = [name for name, _ in self.fields]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._batch = []
+        self._last_flush = time.monotonic()
+        self._pool = None
+
+    def start(self):
+        self._open()
+        self._pool = ThreadPool(1)
+
+    def record(self, row):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._dispatch(batch)
+
+    def close(self):
+        if self._pool is None:
+            return
+        self.flush()
+        self._pool.spawn(self._close)
+        self._pool.join()
+        self._pool.kill()
+        self._pool = None
+
+    def _dispatch(self, batch):
+        # A single worker thread writes batches in the order they were recorded
+        self._pool.spawn(self._write, batch)
+
+    def _write(self, batch):
+        try:
+            self._write_batch(batch)
+            self.rows_written += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} results to {self.path}: {e}")
+
+    @abc.abstractmethod
+    def _open(self):
+        """Create the output; called on the caller's thread before any batch is written."""
+
+    @abc.abstractmethod
+    def _write_batch(self, batch):
+        """Write a list of rows; runs on the writer thread."""
+
+    def _close(self):
+        pass
+
+
+class CsvResultSink(ResultSink):
+    def _open(self):
+        self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.columns)
+        self._file.flush()
+
+    def _write_batch(self, batch):
+        self._csv.writerows(batch)
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class ParquetResultSink(ResultSink):
+    """Writes a directory of Parquet part files, one row group per batch (requires pyarrow).
+
+    A Parquet file is only readable once its footer is written, so every
+    part_batches batches the current part is closed and renamed into place. A
+    killed run loses at most its open part, which readers skip: it keeps a
+    leading "." until it is complete.
+    """
+
+    def __init__(self, path, part_batches=DEFAULT_PART_BATCHES, **kwargs):
+        super().__init__(path, **kwargs)
+        self.part_batches = part_batches
+
+    def _open(self):
+        import pyarrow as pa
+
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.type_for_alias(alias)) for name, alias in self.fields])
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.lstrip(".").startswith(PART_PREFIX):
+                    os.remove(os.path.join(self.path, name))
+        else:
+            if os.path.exists(self.path):
+                # A single-file result from an older version
+                os.remove(self.path)
+            os.makedirs(self.path)
+        self._parts = 0
+        self._part = None
+
+    def _write_batch(self, batch):
+        if self._part is None:
+            self._open_part()
+        columns = list(zip(*batch))
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(col, type=field.type) for col, field in zip(columns, self._schema)],
+            schema=self._schema,
+        )
+        self._part.write_table(table)
+        self._part_batches += 1
+        if self._part_batches >= self.part_batches:
+            self._close_part()
+
+    def _open_part(self):
+        import pyarrow.parquet as pq
+
+        name = f"{PART_PREFIX}{self._parts:05d}.parquet"
+        self._part_path = os.path.join(self.path, name)
+        self._pending_path = os.path.join(self.path, "." + name)
+        self._part = pq.ParquetWriter(self._pending_path, self._schema)
+        self._part_batches = 0
+
+    def _close_part(self):
+        self._part.close()
+        os.replace(self._pending_path, self._part_path)
+        self._part = None
+        self._parts += 1
+
+    def _close(self):
+        if self._part is None and not self._parts:
+            # An empty run still leaves a part with the schema, so readers find the columns
+            self._open_part()
+        if self._part is not None:
+            self._close_part()
+
+
+class ForwardingSink(ResultSink):
+    """Hands batches to a callable (e.g. a locust worker -> master message) instead of a file."""
+
+    def __init__(self, send, **kwargs):
+        super().__init__(None, **kwargs)
+        self._send = send
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def _dispatch(self, batch):
+        # locust's message channel belongs to the hub, so batches are sent right away
+        self._write(batch)
+
+    def _open(self):
+        pass
+
+    def _write_batch(self, batch):
+        self._send(batch)
+
+
+SINKS = {
+    "csv": (CsvResultSink, "locust_results.csv"),
+    "parquet": (ParquetResultSink, "locust_results.parquet"),
+}
+
+
+def create_sink(kind=None, path=None, **kwargs):
+    kind = (kind or os.getenv("RESULT_SINK", "csv")).lower()
+    if kind not in SINKS:
+        raise ValueError(f"Unknown result sink '{kind}'. Choose from: {', '.join(SINKS)}")
+    sink_class, default_path = SINKS[kind]
+    return sink_class(path or os.getenv("RESULT_PATH", default_path), **kwargs)
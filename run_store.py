@@ -0,0 +1,366 @@
+import argparse
+import json
+import math
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from latency_histogram import LatencyStats
+
+RUN_STORE_FILE = "runs.db"
+HISTOGRAM_FILE = "latency_histograms.json"
+RUN_INFO_FILE = "run_info.json"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL,
+    stopped_at REAL,
+    host TEXT,
+    user_class TEXT,
+    concurrency INTEGER,
+    git_sha TEXT,
+    config TEXT,
+    requests INTEGER,
+    errors INTEGER,
+    rps REAL,
+    histograms TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_git_sha ON runs (git_sha);
+CREATE INDEX IF NOT EXISTS runs_concurrency ON runs (concurrency);
+CREATE TABLE IF NOT EXISTS run_languages (
+    run_id TEXT REFERENCES runs (run_id) ON DELETE CASCADE,
+    language TEXT,
+    requests INTEGER,
+    errors INTEGER,
+    rps REAL,
+    mean_ms REAL,
+    p50_ms REAL,
+    p75_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    p999_ms REAL,
+    PRIMARY KEY (run_id, language)
+);
+CREATE INDEX IF NOT EXISTS run_languages_language ON run_languages (language, run_id);
+"""
+METRIC_COLUMNS = {
+    "requests": "requests", "rps": "rps", "mean": "mean_ms", "p50": "p50_ms", "p75": "p75_ms",
+    "p95": "p95_ms", "p99": "p99_ms", "p99.9": "p999_ms",
+}
+AGGREGATED = "Aggregated"
+COMPARED_QUANTILES = [("p50", 0.50), ("p95", 0.95), ("p99", 0.99)]
+BOOTSTRAP_RESAMPLES = 2000
+# Languages with fewer requests than this in either run are left out of compare()
+MIN_REQUESTS = 100
+COMPARISON_COLUMNS = ["Language", "Metric", "Baseline", "Candidate", "Change (%)", "p-value", "Worse"]
+
+
+def git_sha():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def quantile_tests(baseline, candidate, quantiles, resamples=BOOTSTRAP_RESAMPLES, rng=None):
+    """Two-sided bootstrap p-value per quantile that two latency histograms share it.
+
+    Each histogram's bucket counts are resampled from a multinomial with its own
+    sample size, and the quantile's bucket is read off every resample. The p-value
+    is twice the smaller share of resampled differences on either side of zero
+    (ties split evenly), with a +1 correction so it is never exactly 0.
+    """
+    if not baseline.count or not candidate.count:
+        return [1.0] * len(quantiles)
+    rng = rng if rng is not None else np.random.default_rng(0)
+    indices = sorted(set(baseline.counts) | set(candidate.counts))
+
+    def resampled_buckets(histogram):
+        counts = np.array([histogram.counts.get(index, 0) for index in indices], dtype=float)
+        cumulative = np.cumsum(rng.multinomial(histogram.count, counts / counts.sum(), size=resamples), axis=1)
+        # Same rank rule as LatencyHistogram.quantile(): first bucket whose running count exceeds it
+        return [(cumulative > q * (histogram.count - 1)).argmax(axis=1) for q in quantiles]
+
+    p_values = []
+    for base, cand in zip(resampled_buckets(baseline), resampled_buckets(candidate)):
+        difference = cand - base
+        ties = (difference == 0).sum() / 2
+        tail = min((difference < 0).sum() + ties, (difference > 0).sum() + ties)
+        p_values.append(min(1.0, 2 * (tail + 1) / (resamples + 1)))
+    return p_values
+
+
+def holm_adjust(p_values):
+    """Holm-Bonferroni adjusted p-values, in the input order; NaN entries are not counted as tests."""
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full(p_values.size, np.nan)
+    tested = np.flatnonzero(~np.isnan(p_values))
+    order = tested[np.argsort(p_values[tested], kind="stable")]
+    steps = (order.size - np.arange(order.size)) * p_values[order]
+    adjusted[order] = np.minimum(1.0, np.maximum.accumulate(steps))
+    return adjusted
+
+
+def rate_test(baseline_count, baseline_seconds, candidate_count, candidate_seconds):
+    """Two-sided p-value that two Poisson request counts come from the same rate."""
+    total = baseline_count + candidate_count
+    share = candidate_seconds / (baseline_seconds + candidate_seconds)
+    if not total or share in (0, 1):
+        return 1.0
+    z = (candidate_count - total * share) / math.sqrt(total * share * (1 - share))
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def proportion_test(baseline_hits, baseline_total, candidate_hits, candidate_total):
+    """Two-sided p-value of a two-proportion z-test."""
+    if not baseline_total or not candidate_total:
+        return 1.0
+    pooled = (baseline_hits + candidate_hits) / (baseline_total + candidate_total)
+    variance = pooled * (1 - pooled) * (1 / baseline_total + 1 / candidate_total)
+    if variance <= 0:
+        return 1.0
+    z = (candidate_hits / candidate_total - baseline_hits / baseline_total) / math.sqrt(variance)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+class RunStore:
+    """SQLite history of load test runs.
+
+    Each run keeps its metadata (config, concurrency, git SHA), per-language summary
+    metrics for quick trend queries, and its full latency histograms so runs can be
+    compared statistically without the raw result files.
+    """
+
+    def __init__(self, path=RUN_STORE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, run_info, stats):
+        duration = (run_info.get("stopped_at") or 0) - (run_info.get("started_at") or 0)
+        overall = stats.overall()
+        with self.connection:
+            self.connection.execute("DELETE FROM runs WHERE run_id = ?", (run_info["run_id"],))
+            self.connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_info["run_id"], run_info.get("started_at"), run_info.get("stopped_at"), run_info.get("host"),
+                 run_info.get("user_class"), run_info.get("concurrency"), run_info.get("git_sha"),
+                 json.dumps(run_info.get("config", {}), sort_keys=True), overall.count, stats.error_count(),
+                 overall.count / duration if duration > 0 else None, json.dumps(stats.to_dict())),
+            )
+            for language in stats.languages() + [AGGREGATED]:
+                histogram = stats.overall() if language == AGGREGATED else stats.language(language)
+                self.connection.execute(
+                    "INSERT INTO run_languages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_info["run_id"], language, histogram.count,
+                     stats.error_count(None if language == AGGREGATED else language),
+                     histogram.count / duration if duration > 0 else None, histogram.mean,
+                     *[histogram.quantile(q) for q in (0.50, 0.75, 0.95, 0.99, 0.999)]),
+                )
+
+    def runs(self, limit=20, concurrency=None, user_class=None, git_sha=None):
+        filters, params = self._filters(concurrency, user_class, git_sha)
+        return pd.read_sql_query(
+            "SELECT run_id, datetime(started_at, 'unixepoch', 'localtime') AS started, host, user_class, concurrency, "
+            f"git_sha, requests, errors, rps FROM runs {filters} ORDER BY started_at DESC LIMIT ?",
+            self.connection, params=params + [limit],
+        )
+
+    def history(self, language=AGGREGATED, metric="p95", limit=30, concurrency=None, user_class=None, git_sha=None):
+        """One metric for one language over the most recent runs, newest first."""
+        if metric not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown metric '{metric}'. Choose from: {', '.join(METRIC_COLUMNS)}")
+        filters, params = self._filters(concurrency, user_class, git_sha, "AND")
+        return pd.read_sql_query(
+            "SELECT r.run_id, datetime(r.started_at, 'unixepoch', 'localtime') AS started, r.concurrency, r.git_sha, "
+            f"l.{METRIC_COLUMNS[metric]} AS {metric.replace('.', '')} FROM run_languages l JOIN runs r USING (run_id) "
+            f"WHERE l.language = ? {filters} ORDER BY r.started_at DESC LIMIT ?",
+            self.connection, params=[language] + params + [limit],
+        )
+
+    @staticmethod
+    def _filters(concurrency, user_class, git_sha, keyword="WHERE"):
+        clauses, params = [], []
+        for column, value in [("concurrency", concurrency), ("user_class", user_class), ("git_sha", git_sha)]:
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (f"{keyword} " + " AND ".join(clauses) if clauses else ""), params
+
+    def resolve(self, selector):
+        """Run ID for 'latest', 'previous' or a (prefix of a) run ID."""
+        if selector in ("latest", "previous"):
+            row = self.connection.execute(
+                "SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1 OFFSET ?", (int(selector == "previous"),)
+            ).fetchone()
+        else:
+            row = self.connection.execute(
+                "SELECT run_id FROM runs WHERE run_id = ? OR run_id LIKE ? ORDER BY started_at DESC LIMIT 1",
+                (selector, selector + "%"),
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No run matching '{selector}' in {self.path}")
+        return row[0]
+
+    def load(self, run_id):
+        started_at, stopped_at, histograms = self.connection.execute(
+            "SELECT started_at, stopped_at, histograms FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        return LatencyStats.from_dict(json.loads(histograms)), (stopped_at or 0) - (started_at or 0)
+
+    def compare(self, baseline_id, candidate_id, alpha=0.05, min_change=0.05, min_requests=MIN_REQUESTS, seed=0):
+        """Per-language latency, throughput and error-rate changes with significance tests.
+
+        Latency uses successful requests only, with a bootstrap test per quantile.
+        p-values are Holm-adjusted across the whole table, so comparing two runs of
+        the same build flags a regression with probability at most alpha. A change
+        is a regression when its adjusted p-value is below alpha, it is in the bad
+        direction, and it is at least min_change relative. Languages (and latency
+        rows) with fewer than min_requests requests in either run are skipped.
+        """
+        baseline, baseline_seconds = self.load(baseline_id)
+        candidate, candidate_seconds = self.load(candidate_id)
+        rng = np.random.default_rng(seed)
+        rows = []
+        languages = sorted(set(baseline.languages()) & set(candidate.languages())) + [AGGREGATED]
+        for language in languages:
+            selected = None if language == AGGREGATED else language
+
+            def histograms(stats, status_code=None):
+                return stats.overall(status_code) if selected is None else stats.language(selected, status_code)
+
+            base_all, cand_all = histograms(baseline), histograms(candidate)
+            if min(base_all.count, cand_all.count) < min_requests:
+                continue
+            base_ok, cand_ok = histograms(baseline, 200), histograms(candidate, 200)
+            if min(base_ok.count, cand_ok.count) >= min_requests:
+                p_values = quantile_tests(base_ok, cand_ok, [q for _, q in COMPARED_QUANTILES], rng=rng)
+                for (label, q), p_value in zip(COMPARED_QUANTILES, p_values):
+                    rows.append(comparison_row(
+                        language, f"{label} Latency (ms)", base_ok.quantile(q), cand_ok.quantile(q), p_value,
+                        min_change, worse_if_higher=True,
+                    ))
+
+            rows.append(comparison_row(
+                language, "RPS",
+                base_all.count / baseline_seconds if baseline_seconds > 0 else 0,
+                cand_all.count / candidate_seconds if candidate_seconds > 0 else 0,
+                rate_test(base_all.count, baseline_seconds, cand_all.count, candidate_seconds),
+                min_change, worse_if_higher=False,
+            ))
+            base_errors, cand_errors = baseline.error_count(selected), candidate.error_count(selected)
+            rows.append(comparison_row(
+                language, "Error Rate (%)",
+                base_errors / base_all.count * 100 if base_all.count else 0,
+                cand_errors / cand_all.count * 100 if cand_all.count else 0,
+                proportion_test(base_errors, base_all.count, cand_errors, cand_all.count),
+                min_change, worse_if_higher=True,
+            ))
+        comparison = pd.DataFrame(rows, columns=COMPARISON_COLUMNS)
+        comparison["Adjusted p-value"] = holm_adjust(comparison["p-value"])
+        comparison["Regression"] = comparison.pop("Worse").astype(bool) & (comparison["Adjusted p-value"] < alpha)
+        return comparison
+
+
+def comparison_row(language, metric, baseline, candidate, p_value, min_change, worse_if_higher):
+    change = (candidate - baseline) / baseline if baseline else (math.inf if candidate else 0.0)
+    worse = change >= min_change if worse_if_higher else change <= -min_change
+    return {
+        "Language": language,
+        "Metric": metric,
+        "Baseline": baseline,
+        "Candidate": candidate,
+        "Change (%)": change * 100,
+        "p-value": p_value,
+        "Worse": bool(worse),
+    }
+
+
+def ingest(store, histogram_file=HISTOGRAM_FILE, run_info_file=RUN_INFO_FILE):
+    """Add the run described by a latency histogram file (and its run_info.json, if any)."""
+    with open(histogram_file) as f:
+        histogram_data = json.load(f)
+    run_info = {}
+    if os.path.exists(run_info_file):
+        with open(run_info_file) as f:
+            run_info = json.load(f)
+    if run_info.get("run_id") != histogram_data.get("run_id"):
+        run_info = {}
+    run_info.setdefault("run_id", histogram_data.get("run_id") or time.strftime(
+        "%Y%m%d-%H%M%S", time.localtime(histogram_data.get("started_at") or time.time())))
+    run_info.setdefault("started_at", histogram_data.get("started_at"))
+    run_info.setdefault("stopped_at", histogram_data.get("stopped_at"))
+    store.add_run(run_info, LatencyStats.from_dict(histogram_data))
+    return run_info["run_id"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and compare stored load test runs.")
+    parser.add_argument("--db", default=os.getenv("RUN_STORE_PATH") or RUN_STORE_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Store a finished run from its histogram file")
+    ingest_parser.add_argument("--histograms", default=HISTOGRAM_FILE)
+    ingest_parser.add_argument("--run-info", default=RUN_INFO_FILE)
+
+    for name, help_text in [("list", "Most recent runs"), ("history", "One metric across recent runs")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--limit", type=int, default=30 if name == "history" else 20)
+        command.add_argument("--concurrency", type=int)
+        command.add_argument("--user-class")
+        command.add_argument("--git-sha")
+        if name == "history":
+            command.add_argument("--language", default=AGGREGATED)
+            command.add_argument("--metric", default="p95", choices=list(METRIC_COLUMNS))
+
+    compare_parser = commands.add_parser("compare", help="Flag significant regressions between two runs")
+    compare_parser.add_argument("baseline", help="Run ID (or prefix), 'latest' or 'previous'")
+    compare_parser.add_argument("candidate", nargs="?", default="latest")
+    compare_parser.add_argument("--alpha", type=float, default=0.05)
+    compare_parser.add_argument("--min-change", type=float, default=0.05,
+                                help="Smallest relative change that counts as a regression")
+    compare_parser.add_argument("--min-requests", type=int, default=MIN_REQUESTS,
+                                help="Skip languages with fewer requests than this in either run")
+    compare_parser.add_argument("--output", help="Also save the comparison as CSV")
+    args = parser.parse_args()
+
+    store = RunStore(args.db)
+    try:
+        if args.command == "ingest":
+            print(f"Stored run {ingest(store, args.histograms, args.run_info)} in {args.db}")
+        elif args.command == "list":
+            print(store.runs(args.limit, args.concurrency, args.user_class, args.git_sha).to_string(index=False))
+        elif args.command == "history":
+            print(store.history(args.language, args.metric, args.limit, args.concurrency, args.user_class,
+                                args.git_sha).to_string(index=False))
+        else:
+            baseline, candidate = store.resolve(args.baseline), store.resolve(args.candidate)
+            comparison = store.compare(baseline, candidate, args.alpha, args.min_change, args.min_requests)
+            print(f"Baseline {baseline} vs candidate {candidate}")
+            print(comparison.to_string(index=False, float_format=lambda value: f"{value:.4g}"))
+            if args.output:
+                comparison.to_csv(args.output, index=False)
+            regressions = comparison[comparison["Regression"]]
+            if not regressions.empty:
+                print(f"{len(regressions)} significant regression(s)")
+                return 1
+            print("No significant regressions")
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+        return 1
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import json
+
+from payload_corpus import PayloadCorpus, RequestBodies, WeightedChoice
+
+SLO_KEYS = ("p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+class Endpoint:
+    """One weighted API call of a scenario: where it goes, how its body is built, and its SLO.
+
+    payload is a JSON body template (see payload_corpus.fill_template). Inputs come
+    from the endpoint's own corpus or inputs list, else from the run's default
+    sampler; the target language from the input, the endpoint's language weights,
+    or the run's language mix, in that order.
+    """
+
+    def __init__(self, name, path, payload, weight=1.0, response_field=None, languages=None, inputs=None,
+                 corpus=None, corpus_text_field="input", slo=None):
+        if weight < 0:
+            raise ValueError(f"Endpoint '{name}' has a negative weight")
+        unknown = set(slo or {}) - set(SLO_KEYS)
+        if unknown:
+            raise ValueError(f"Endpoint '{name}' has unknown SLO keys {sorted(unknown)}. Use: {', '.join(SLO_KEYS)}")
+        self.name = name
+        self.path = path
+        self.weight = weight
+        self.response_field = response_field
+        self.slo = dict(slo or {})
+        self.bodies = RequestBodies(payload)
+        self.language_choice = WeightedChoice(list(languages), list(languages.values())) if languages else None
+        self.inputs = WeightedChoice(inputs, [1.0] * len(inputs)) if inputs else None
+        self.corpus = PayloadCorpus(corpus, text_field=corpus_text_field) if corpus else None
+
+    def sample(self, default_language, default_input):
+        """Return (target language code, text); the defaults are callables for the run-wide mixes."""
+        if self.corpus is not None:
+            text, lang_code = self.corpus.sample()
+        elif self.inputs is not None:
+            text, lang_code = self.inputs.choice(), None
+        else:
+            text, lang_code = default_input()
+        if lang_code is None:
+            lang_code = self.language_choice.choice() if self.language_choice is not None else default_language()
+        return lang_code, text
+
+    def slo_breaches(self, p50, p95, p99, error_rate):
+        """Names of the SLO limits the given metrics exceed."""
+        observed = {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "error_rate": error_rate}
+        return [key for key, limit in self.slo.items() if observed[key] > limit]
+
+
+class Scenario:
+    """A blended workload: endpoints picked per request in proportion to their weights."""
+
+    def __init__(self, name, endpoints):
+        if not endpoints:
+            raise ValueError(f"Scenario '{name}' has no endpoints")
+        self.name = name
+        self.endpoints = {endpoint.name: endpoint for endpoint in endpoints}
+        self._choice = WeightedChoice(endpoints, [endpoint.weight for endpoint in endpoints])
+
+    def choose(self):
+        return self._choice.choice()
+
+    def target_shares(self):
+        total = sum(endpoint.weight for endpoint in self.endpoints.values())
+        return {name: endpoint.weight / total for name, endpoint in self.endpoints.items()}
+
+
+def load_scenario(path):
+    """Load a scenario from JSON, or YAML (needs PyYAML) for .yaml/.yml files."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    endpoints = []
+    for name, spec in data.get("endpoints", {}).items():
+        try:
+            endpoints.append(Endpoint(name, **spec))
+        except TypeError as e:
+            raise ValueError(f"Invalid endpoint '{name}' in {path}: {e}") from None
+    return Scenario(data.get("name", path), endpoints)
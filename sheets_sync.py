@@ -0,0 +1,256 @@
+import functools
+import json
+import logging
+import math
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SHEET_SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+# Sheets allows 60 write requests per minute per user; stay under it
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_BATCH_ROWS = 2000
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+SYNC_STATE_FILE = "sheets_sync_state.json"
+
+
+class FakeQuotaError(Exception):
+    """Raised by FakeSpreadsheet to simulate a 429 from the Sheets API."""
+
+    code = 429
+
+
+def is_retryable(error):
+    import requests
+
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None) or getattr(error, "code", None)
+    return code in RETRYABLE_STATUS
+
+
+def with_retries(call, attempts=6, base_delay=1.0, max_delay=64.0, sleep=time.sleep):
+    """Run call(), retrying quota and transient errors with exponential backoff and full jitter."""
+    for attempt in range(attempts):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            logger.warning(f"Sheets request failed ({e}), retrying in {delay:.1f}s")
+            sleep(delay)
+
+
+class RequestPacer:
+    """Spaces out write requests to stay within a per-minute quota."""
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, sleep=time.sleep):
+        self.interval = 60 / requests_per_minute if requests_per_minute else 0
+        self.sleep = sleep
+        self._next = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self._next:
+            self.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(credentials_file):
+    """Authorized gspread client, created once per credentials file and process."""
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    creds = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, SHEET_SCOPE)
+    return gspread.authorize(creds)
+
+
+def open_spreadsheet(name, credentials_file):
+    return get_client(credentials_file).open(name)
+
+
+def to_values(df, decimals=2):
+    """Sheet-ready rows for df: floats rounded, NaN/inf blank, numpy scalars converted."""
+    if decimals is not None:
+        df = df.round(decimals)
+    df = df.replace([np.inf, -np.inf], np.nan)
+    return df.astype(object).where(df.notna(), "").values.tolist()
+
+
+class SheetWriter:
+    """Quota-aware writes to one spreadsheet: every request is paced and retried."""
+
+    def __init__(self, spreadsheet, batch_rows=DEFAULT_BATCH_ROWS, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 sleep=time.sleep):
+        self.spreadsheet = spreadsheet
+        self.batch_rows = batch_rows
+        self.pacer = RequestPacer(requests_per_minute, sleep)
+        self.sleep = sleep
+        self.requests = 0
+
+    def _call(self, call):
+        self.pacer.wait()
+        self.requests += 1
+        return with_retries(call, sleep=self.sleep)
+
+    def worksheet(self, title, rows=100, cols=26):
+        import gspread
+
+        try:
+            return self._call(lambda: self.spreadsheet.worksheet(title))
+        except (gspread.exceptions.WorksheetNotFound, KeyError):
+            return self._call(lambda: self.spreadsheet.add_worksheet(title=title, rows=rows, cols=cols))
+
+    def replace(self, title, df, decimals=2):
+        """Overwrite a tab with df (header plus rows), in batches of batch_rows."""
+        worksheet = self.worksheet(title, rows=len(df) + 10, cols=max(26, len(df.columns)))
+        self._call(worksheet.clear)
+        self._call(lambda: worksheet.update(values=[df.columns.tolist()], range_name="A1"))
+        self.write_rows(worksheet, df, 2, decimals)
+        return worksheet
+
+    def write_rows(self, worksheet, df, first_row, decimals=2):
+        """Write df's rows from sheet row first_row down, in batches of batch_rows.
+
+        Batches go to fixed ranges rather than being appended, so retrying a write
+        the server applied before timing out rewrites the same cells instead of
+        adding the rows twice.
+        """
+        last_row = first_row + len(df) - 1
+        if last_row > worksheet.row_count:
+            # Unlike appends, writes past the grid fail, so grow it first (in steps, to save requests)
+            rows = max(last_row, worksheet.row_count + 10 * self.batch_rows)
+            self._call(lambda: worksheet.resize(rows=rows))
+        for start in range(0, len(df), self.batch_rows):
+            values = to_values(df.iloc[start:start + self.batch_rows], decimals)
+            self._call(lambda: worksheet.update(values=values, range_name=f"A{first_row + start}"))
+
+    def sync_rows(self, title, batches, run_id, state, decimals=None):
+        """Append only rows added since the last sync of run_id; a new run starts the tab over."""
+        worksheet = self.worksheet(title, rows=1000)
+        appended = 0
+        seen = 0
+        for batch in batches:
+            if state.run_id != run_id:
+                self._call(worksheet.clear)
+                self._call(lambda: worksheet.update(values=[batch.columns.tolist()], range_name="A1"))
+                state.run_id, state.rows_synced = run_id, 0
+                state.save()
+            new_rows = batch.iloc[max(0, state.rows_synced - seen):]
+            seen += len(batch)
+            for start in range(0, len(new_rows), self.batch_rows):
+                chunk = new_rows.iloc[start:start + self.batch_rows]
+                # Row 1 is the header
+                self.write_rows(worksheet, chunk, 2 + state.rows_synced, decimals)
+                # Save after every chunk so an interrupted sync resumes where it stopped
+                state.rows_synced += len(chunk)
+                appended += len(chunk)
+                state.save()
+        return appended
+
+
+class SyncState:
+    """Watermark of raw result rows already uploaded, per run, persisted between syncs."""
+
+    def __init__(self, path=SYNC_STATE_FILE):
+        self.path = path
+        self.run_id = None
+        self.rows_synced = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.run_id = data.get("run_id")
+            self.rows_synced = data.get("rows_synced", 0)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump({"run_id": self.run_id, "rows_synced": self.rows_synced}, f)
+
+
+def sample_rows(batches, total_rows, max_rows):
+    """Evenly spaced sample of at most max_rows rows, streamed from batches."""
+    stride = max(1, math.ceil(total_rows / max_rows)) if max_rows else 1
+    samples = []
+    seen = 0
+    for batch in batches:
+        # Keep the global row positions that are multiples of stride
+        samples.append(batch.iloc[(-seen) % stride::stride])
+        seen += len(batch)
+    return pd.concat(samples, ignore_index=True) if samples else pd.DataFrame()
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows=100, cols=26, fail=lambda: None):
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.values = []
+        self._fail = fail
+
+    def clear(self):
+        self._fail()
+        self.values = []
+
+    def resize(self, rows=None, cols=None):
+        self._fail()
+        self.row_count = rows or self.row_count
+        self.col_count = cols or self.col_count
+
+    def update(self, values, range_name="A1"):
+        self._fail()
+        start = int("".join(ch for ch in range_name.split(":")[0] if ch.isdigit()) or 1) - 1
+        if start + len(values) > self.row_count:
+            raise ValueError(f"Range {range_name} exceeds grid limits ({self.row_count} rows)")
+        for offset, row in enumerate(values):
+            while len(self.values) <= start + offset:
+                self.values.append([])
+            self.values[start + offset] = list(row)
+
+    def get_all_values(self):
+        return [list(row) for row in self.values]
+
+
+class FakeSpreadsheet:
+    """In-memory stand-in for a gspread Spreadsheet, optionally persisted to a JSON file.
+
+    Supports the calls SheetWriter makes; quota_error_rate makes a share of calls
+    raise FakeQuotaError so retries can be exercised without Google credentials.
+    """
+
+    def __init__(self, path=None, quota_error_rate=0.0, seed=None):
+        self.path = path
+        self.quota_error_rate = quota_error_rate
+        self._random = random.Random(seed)
+        self.worksheets = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for title, values in json.load(f).items():
+                    self.worksheets[title] = FakeWorksheet(title, max(100, len(values)), fail=self._maybe_fail)
+                    self.worksheets[title].values = values
+
+    def _maybe_fail(self):
+        if self._random.random() < self.quota_error_rate:
+            raise FakeQuotaError("Quota exceeded (fake)")
+
+    def worksheet(self, title):
+        self._maybe_fail()
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows=100, cols=26):
+        self._maybe_fail()
+        self.worksheets[title] = FakeWorksheet(title, rows, cols, fail=self._maybe_fail)
+        return self.worksheets[title]
+
+    def save(self):
+        if self.path:
+            with open(self.path, "w") as f:
+                json.dump({title: worksheet.values for title, worksheet in self.worksheets.items()}, f)
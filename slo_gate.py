@@ -0,0 +1,146 @@
+import json
+import time
+import xml.etree.ElementTree as ET
+
+# Limits a language or the aggregate can have; min_rps applies to the aggregate only
+LATENCY_LIMITS = {"p50_ms": 0.50, "p95_ms": 0.95, "p99_ms": 0.99}
+GATE_KEYS = (*LATENCY_LIMITS, "error_rate", "min_rps")
+AGGREGATE = "Aggregated"
+SLO_VERDICT_FILE = "slo_verdict.json"
+SLO_JUNIT_FILE = "slo_verdict.xml"
+DEFAULT_GRACE_S = 30
+DEFAULT_ABORT_AFTER_S = 10
+DEFAULT_MIN_REQUESTS = 50
+
+
+def check_limits(name, limits):
+    unknown = set(limits) - set(GATE_KEYS)
+    if unknown:
+        raise ValueError(f"SLO '{name}' has unknown keys {sorted(unknown)}. Use: {', '.join(GATE_KEYS)}")
+    if name != AGGREGATE and "min_rps" in limits:
+        raise ValueError(f"min_rps can only be set for the aggregate, not '{name}'")
+    return dict(limits)
+
+
+class SloGate:
+    """Pass/fail thresholds evaluated from streaming latency statistics.
+
+    `aggregate` limits apply to all requests together; `default` limits to every
+    language, overridden per language by `languages`. During the run, observe()
+    checks the rolling window and asks for an abort once a limit has been breached
+    for `abort_after_s` seconds in a row, ignoring the first `grace_s` seconds and
+    any window with fewer than `min_requests` requests. verdict() checks the whole run.
+    """
+
+    def __init__(self, aggregate=None, default=None, languages=None, grace_s=DEFAULT_GRACE_S,
+                 abort_after_s=DEFAULT_ABORT_AFTER_S, min_requests=DEFAULT_MIN_REQUESTS):
+        self.aggregate = check_limits(AGGREGATE, aggregate or {})
+        self.default = check_limits("default", default or {})
+        self.languages = {language: check_limits(language, limits) for language, limits in (languages or {}).items()}
+        self.grace_s = grace_s
+        self.abort_after_s = abort_after_s
+        self.min_requests = min_requests
+        self._breached_since = {}
+        self.abort_reason = None
+
+    def reset(self):
+        self._breached_since.clear()
+        self.abort_reason = None
+
+    def limits_for(self, language):
+        if language == AGGREGATE:
+            return self.aggregate
+        return {**self.default, **self.languages.get(language, {})}
+
+    def evaluate(self, stats, duration, min_requests=1):
+        """One check per configured limit: dicts with scope, metric, limit, observed and passed."""
+        scopes = [(AGGREGATE, stats.overall(), stats.error_count())]
+        scopes += [(language, stats.language(language), stats.error_count(language)) for language in stats.languages()]
+        checks = []
+        for scope, histogram, errors in scopes:
+            if histogram.count < min_requests:
+                continue
+            for metric, limit in self.limits_for(scope).items():
+                if metric in LATENCY_LIMITS:
+                    observed, passed = histogram.quantile(LATENCY_LIMITS[metric]), None
+                elif metric == "error_rate":
+                    observed, passed = errors / histogram.count * 100, None
+                else:
+                    observed = histogram.count / duration if duration > 0 else 0.0
+                    passed = observed >= limit
+                checks.append({
+                    "scope": scope,
+                    "metric": metric,
+                    "limit": limit,
+                    "observed": round(observed, 3),
+                    "passed": observed <= limit if passed is None else passed,
+                })
+        return checks
+
+    def observe(self, rolling_stats, window_s, elapsed_s):
+        """Feed the rolling-window stats once per tick; returns a reason to abort, or None."""
+        if elapsed_s < self.grace_s:
+            return None
+        now = time.monotonic()
+        failed = {
+            (check["scope"], check["metric"]): check
+            for check in self.evaluate(rolling_stats, window_s, self.min_requests) if not check["passed"]
+        }
+        self._breached_since = {key: self._breached_since.get(key, now) for key in failed}
+        for key, since in self._breached_since.items():
+            if now - since >= self.abort_after_s:
+                check = failed[key]
+                self.abort_reason = (f"{check['scope']} {check['metric']} {check['observed']:g} breached the limit "
+                                     f"{check['limit']:g} for {self.abort_after_s:g}s")
+                return self.abort_reason
+        return None
+
+    def verdict(self, stats, duration, run_info=None):
+        checks = self.evaluate(stats, duration)
+        return {
+            "run_id": (run_info or {}).get("run_id"),
+            "passed": self.abort_reason is None and bool(checks) and all(check["passed"] for check in checks),
+            "aborted": self.abort_reason is not None,
+            "abort_reason": self.abort_reason,
+            "duration_s": round(duration, 3),
+            "checks": checks,
+        }
+
+
+def load_slo_gate(path):
+    """Load thresholds from JSON, or YAML (needs PyYAML) for .yaml/.yml files."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    try:
+        return SloGate(**data)
+    except TypeError as e:
+        raise ValueError(f"Invalid SLO file {path}: {e}") from None
+
+
+def write_verdict(verdict, json_path=SLO_VERDICT_FILE, junit_path=SLO_JUNIT_FILE):
+    """Write the verdict as JSON and as a JUnit report with one test case per check."""
+    with open(json_path, "w") as f:
+        json.dump(verdict, f, indent=2)
+    failures = [check for check in verdict["checks"] if not check["passed"]]
+    suite = ET.Element("testsuite", {
+        "name": "slo",
+        "tests": str(len(verdict["checks"]) + verdict["aborted"]),
+        "failures": str(len(failures) + verdict["aborted"]),
+        "time": str(verdict["duration_s"]),
+    })
+    for check in verdict["checks"]:
+        case = ET.SubElement(suite, "testcase", {"classname": check["scope"], "name": check["metric"]})
+        if not check["passed"]:
+            relation = "below" if check["metric"] == "min_rps" else "above"
+            ET.SubElement(case, "failure", {
+                "message": f"{check['observed']:g} is {relation} the limit {check['limit']:g}"
+            })
+    if verdict["aborted"]:
+        case = ET.SubElement(suite, "testcase", {"classname": AGGREGATE, "name": "early_abort"})
+        ET.SubElement(case, "failure", {"message": verdict["abort_reason"]})
+    ET.ElementTree(suite).write(junit_path, encoding="utf-8", xml_declaration=True)
@@ -0,0 +1,243 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import uuid
+
+import gevent
+import pandas as pd
+from locust import events
+from locust.env import Environment
+from locust.runners import STATE_RUNNING
+from locust.util.timespan import parse_timespan
+
+import locustfile
+from latency_histogram import LatencyStats
+from result_sink import SINKS
+from run_store import RunStore, git_sha
+
+SWEEP_FILE = "sweep_results.csv"
+SWEEP_HISTOGRAM_FILE = "sweep_histograms.json"
+# Each step's raw results, histograms and run info go to their own subdirectory
+SWEEP_STEPS_DIR = "sweep_steps"
+# Time allowed beyond users / spawn rate for a step to finish spawning
+SPAWN_GRACE_S = 30
+
+
+def parse_steps(value):
+    return [float(step) for step in value.split(",") if step.strip()]
+
+
+def build_steps(args):
+    if args.rps:
+        return [(math.ceil(rps * args.latency_budget), rps) for rps in parse_steps(args.rps)]
+    if args.users:
+        return [(int(users), None) for users in parse_steps(args.users)]
+    steps = []
+    users = args.start_users
+    while users <= args.max_users:
+        steps.append((users, None))
+        users = max(users + 1, math.ceil(users * args.factor))
+    return steps
+
+
+def use_step_paths(step, steps_dir):
+    """Point locustfile's result, histogram and run info files at this step's directory."""
+    step_dir = os.path.join(steps_dir, f"step_{step:02d}")
+    os.makedirs(step_dir, exist_ok=True)
+    _, results_name = SINKS[os.getenv("RESULT_SINK", "csv").lower()]
+    locustfile.RESULT_PATH = os.path.join(step_dir, results_name)
+    locustfile.HISTOGRAM_FILE = os.path.join(step_dir, "latency_histograms.json")
+    locustfile.RUN_INFO_FILE = os.path.join(step_dir, "run_info.json")
+    return locustfile.RESULT_PATH
+
+
+def wait_until_running(runner, timeout):
+    deadline = time.monotonic() + timeout
+    while runner.state != STATE_RUNNING:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"users did not finish spawning within {timeout:g}s (runner state: {runner.state})")
+        gevent.sleep(0.1)
+
+
+def run_step(runner, users, spawn_rate, target_rps, warmup, duration):
+    if target_rps is not None:
+        locustfile.TARGET_RPS = target_rps
+    runner.start(users, spawn_rate=spawn_rate)
+    # Only measure the steady part of the step, after spawning and warm-up: its rows stay out of
+    # the step's result file (test_start has just opened it) and its samples out of the histograms
+    result_sink, locustfile.result_sink = locustfile.result_sink, None
+    try:
+        wait_until_running(runner, users / spawn_rate + SPAWN_GRACE_S)
+        gevent.sleep(warmup)
+        locustfile.drain_samples()
+    finally:
+        locustfile.result_sink = result_sink
+    locustfile.latency_stats.reset()
+    locustfile.corrected_latency_stats.reset()
+    started_at = time.time()
+    gevent.sleep(duration)
+    stopped_at = time.time()
+    locustfile.drain_samples()
+    runner.stop()
+    return locustfile.latency_stats, stopped_at - started_at
+
+
+def step_rows(step, users, target_rps, stats, duration):
+    rows = []
+    for language in stats.languages() + ["Aggregated"]:
+        histogram = stats.overall() if language == "Aggregated" else stats.language(language)
+        errors = stats.error_count(None if language == "Aggregated" else language)
+        rows.append({
+            "Step": step,
+            "Concurrency": users,
+            "Target RPS": target_rps,
+            "Language": language,
+            "Requests": histogram.count,
+            "RPS": histogram.count / duration if duration > 0 else 0,
+            "Error Rate (%)": errors / histogram.count * 100 if histogram.count else 0,
+            "p50 Latency (ms)": histogram.quantile(0.50),
+            "p95 Latency (ms)": histogram.quantile(0.95),
+            "p99 Latency (ms)": histogram.quantile(0.99),
+        })
+    return rows
+
+
+def is_knee(previous, current, users_ratio, min_efficiency):
+    # Throughput should grow roughly in proportion to load; when the gain falls below
+    # min_efficiency of the load increase while p95 keeps rising, the API is saturated
+    if not previous["RPS"] or users_ratio <= 1:
+        return False
+    efficiency = (current["RPS"] / previous["RPS"] - 1) / (users_ratio - 1)
+    return efficiency < min_efficiency and current["p95 Latency (ms)"] > previous["p95 Latency (ms)"]
+
+
+def record_sweep(args, store_path, started_at, stopped_at, histograms):
+    """Add the whole sweep to the run history as one run, with the measured part of every step merged."""
+    stats = LatencyStats()
+    for step in histograms:
+        stats.merge(LatencyStats.from_dict(step))
+    run_info = {
+        "run_id": f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started_at))}-sweep-{uuid.uuid4().hex[:8]}",
+        "started_at": started_at,
+        "stopped_at": stopped_at,
+        "host": args.host,
+        "user_class": args.user_class,
+        "concurrency": histograms[-1]["concurrency"],
+        "git_sha": git_sha(),
+        "config": {
+            **{key: os.getenv(key) for key in locustfile.RUN_CONFIG_KEYS if os.getenv(key) is not None},
+            "sweep_steps": [{"concurrency": step["concurrency"], "target_rps": step["target_rps"]} for step in histograms],
+            "sweep_step_time": args.step_time,
+            "sweep_warmup": args.warmup,
+        },
+    }
+    store = RunStore(store_path)
+    store.add_run(run_info, stats)
+    store.close()
+    return run_info["run_id"]
+
+
+def run_sweep(args):
+    locustfile.select_user_class(args.user_class)
+    user_class = next(cls for cls in locustfile.USER_CLASSES if cls.__name__ == args.user_class)
+    environment = Environment(user_classes=[user_class], host=args.host, events=events)
+    runner = environment.create_local_runner()
+    events.init.fire(environment=environment, runner=runner, web_ui=None)
+    # The sweep goes into the run history once, at the end, rather than once per step
+    store_path, locustfile.RUN_STORE_FILE = locustfile.RUN_STORE_FILE, ""
+
+    steps = build_steps(args)
+    rows = []
+    histograms = []
+    previous = None
+    stop_reason = "all steps completed"
+    error = None
+    started_at = time.time()
+    try:
+        for step, (users, target_rps) in enumerate(steps):
+            load = f"{target_rps:g} RPS ({users} users)" if target_rps is not None else f"{users} users"
+            print(f"Step {step}: {load} for {args.step_time}s...")
+            results_file = use_step_paths(step, args.steps_dir)
+            stats, duration = run_step(runner, users, args.spawn_rate or users, target_rps, args.warmup, args.step_time)
+            histograms.append({
+                "step": step, "concurrency": users, "target_rps": target_rps, "results_file": results_file,
+                **stats.to_dict(),
+            })
+            current_rows = step_rows(step, users, target_rps, stats, duration)
+            current = current_rows[-1]
+            current["Knee"] = previous is not None and is_knee(
+                previous, current,
+                (target_rps / previous["Target RPS"]) if target_rps is not None else users / previous["Concurrency"],
+                args.knee_efficiency,
+            )
+            current["SLO Breached"] = (
+                (args.slo_p95 is not None and current["p95 Latency (ms)"] > args.slo_p95) or
+                (args.slo_error_rate is not None and current["Error Rate (%)"] > args.slo_error_rate)
+            )
+            rows.extend(current_rows)
+            print(f"  {current['RPS']:.2f} RPS | p95: {current['p95 Latency (ms)']:.2f} ms | "
+                  f"p99: {current['p99 Latency (ms)']:.2f} ms | errors: {current['Error Rate (%)']:.2f}%")
+            if current["Knee"]:
+                stop_reason = f"saturation knee at step {step}"
+                break
+            if current["SLO Breached"]:
+                stop_reason = f"SLO breached at step {step}"
+                break
+            previous = current
+    except RuntimeError as e:
+        error = e
+        stop_reason = f"step {step} failed: {e}"
+    finally:
+        runner.quit()
+    stopped_at = time.time()
+
+    print(f"Sweep stopped: {stop_reason}")
+    sweep_df = pd.DataFrame(rows)
+    if rows:
+        sweep_df[["Knee", "SLO Breached"]] = sweep_df[["Knee", "SLO Breached"]].fillna(False)
+        sweep_df.to_csv(args.output, index=False)
+        with open(SWEEP_HISTOGRAM_FILE, "w") as f:
+            json.dump(histograms, f)
+        print(f"Sweep results saved to {args.output} and {SWEEP_HISTOGRAM_FILE}, raw results per step in {args.steps_dir}")
+        if store_path:
+            print(f"Sweep {record_sweep(args, store_path, started_at, stopped_at, histograms)} added to: {store_path}")
+    if error is not None:
+        raise error
+    return sweep_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step load up until the API saturates or an SLO breaks.")
+    parser.add_argument("--host", default="https://api.sarvam.ai")
+    parser.add_argument("--user-class", default=os.getenv("SARVAM_USER_CLASS", "SarvamTransliterationFastUser"))
+    parser.add_argument("--users", help="Comma-separated concurrency steps, e.g. 1,5,10,25")
+    parser.add_argument("--rps", help="Comma-separated open-loop RPS steps (implies SarvamOpenLoopUser)")
+    parser.add_argument("--start-users", type=int, default=1)
+    parser.add_argument("--factor", type=float, default=2.0, help="Concurrency multiplier between steps")
+    parser.add_argument("--max-users", type=int, default=256)
+    parser.add_argument("--latency-budget", type=float, default=2.0,
+                        help="Open-loop steps run RPS x this many seconds worth of users")
+    parser.add_argument("--spawn-rate", type=float, help="Defaults to spawning each step at once")
+    parser.add_argument("--step-time", type=parse_timespan, default="1m")
+    parser.add_argument("--warmup", type=parse_timespan, default="5s")
+    parser.add_argument("--slo-p95", type=float, help="Stop once aggregate p95 exceeds this many ms")
+    parser.add_argument("--slo-error-rate", type=float, help="Stop once the error rate exceeds this percentage")
+    parser.add_argument("--knee-efficiency", type=float, default=0.5,
+                        help="Stop once throughput grows by less than this fraction of the load increase")
+    parser.add_argument("--output", default=SWEEP_FILE)
+    parser.add_argument("--steps-dir", default=SWEEP_STEPS_DIR, help="Where each step's raw results are kept")
+    args = parser.parse_args()
+    if args.rps:
+        args.user_class = "SarvamOpenLoopUser"
+    try:
+        run_sweep(args)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis_engine import RunAggregates, aggregate_results, null_columns, row_groups, stats_by
+from latency_histogram import LatencyStats
+from result_sink import RESULT_FIELDS, CsvResultSink, ParquetResultSink
+from windowed_metrics import WindowedStats
+
+LANGUAGES = ["Hindi", "Tamil", "Odia"]
+ENDPOINTS = ["transliterate", "translate"]
+
+
+def results(seed=0, size=6000, duration=20.0):
+    rng = np.random.default_rng(seed)
+    start = 1_700_000_000 + rng.uniform(0, duration, size)
+    latencies = rng.lognormal(4, 0.6, size)
+    return pd.DataFrame({
+        "language": pd.Categorical(rng.choice(LANGUAGES, size=size)),
+        "status_code": rng.choice([200, 200, 200, 500, 429], size=size).astype("int32"),
+        "endpoint": pd.Categorical(rng.choice(ENDPOINTS, size=size)),
+        "new_connection": rng.random(size) < 0.1,
+        "latency_ms": latencies,
+        "start_ts": start,
+        "end_ts": start + latencies / 1000,
+    })
+
+
+def direct_stats(frame, column=None):
+    stats = LatencyStats()
+    groups = frame["language"] if column is None else zip(frame[column], frame["language"])
+    for group, status, latency in zip(groups, frame["status_code"], frame["latency_ms"]):
+        stats.record(group, int(status), latency)
+    return stats
+
+
+def assert_same_stats(actual, expected):
+    assert set(actual.histograms) == set(expected.histograms)
+    for key, histogram in expected.histograms.items():
+        assert actual.histograms[key].counts == histogram.counts
+        assert actual.histograms[key].sum == pytest.approx(histogram.sum)
+        assert actual.histograms[key].min == pytest.approx(histogram.min)
+        assert actual.histograms[key].max == pytest.approx(histogram.max)
+
+
+def aggregate_in_batches(frame, batches=4, window=1.0):
+    # Batches in shuffled order, so windows are split across batches and arrive out of order
+    aggregates = RunAggregates(WindowedStats(window))
+    shuffled = frame.sample(frac=1, random_state=1)
+    for bounds in np.array_split(np.arange(len(shuffled)), batches):
+        aggregates.add_batch(shuffled.iloc[bounds])
+    return aggregates
+
+
+def test_row_groups():
+    batch = pd.DataFrame({
+        "language": ["Hindi", None, "Tamil", "Hindi"],
+        "endpoint": ["translate", "translate", None, "translate"],
+        "status_code": [200, 200, 500, 200],
+    })
+    keys, group_ids, valid = row_groups(batch, ["language", "endpoint", "new_connection"])
+    assert valid.tolist() == [True, False, True, True]
+    assert [keys[group] for group in group_ids] == [
+        (("Hindi", "translate", None), 200), (("Tamil", None, None), 500), (("Hindi", "translate", None), 200),
+    ]
+    assert len(keys) == 2
+
+
+def test_single_pass_matches_per_row_stats():
+    frame = results()
+    aggregates = aggregate_in_batches(frame)
+    assert_same_stats(aggregates.stats, direct_stats(frame))
+    assert aggregates.duration == pytest.approx(frame["end_ts"].max() - frame["start_ts"].min())
+
+
+def test_stats_between_matches_filtered_rows():
+    frame = results(1)
+    aggregates = aggregate_in_batches(frame)
+    start, end = 1_700_000_005.0, 1_700_000_012.0
+    steady = frame[(frame["start_ts"] >= start) & (frame["start_ts"] < end)]
+    assert_same_stats(aggregates.windows.stats_between(start, end).regroup(lambda group, status: (group[0], status)),
+                      direct_stats(steady))
+    assert aggregates.windows.span_between(start, end) == pytest.approx(steady["end_ts"].max() - steady["start_ts"].min())
+    assert aggregates.windows.span_between(0, 1) == 0
+
+
+def test_endpoint_stats_from_the_single_pass():
+    frame = results(6)
+    frame["endpoint"] = frame["endpoint"].astype(object).where(np.arange(len(frame)) % 10 > 0, None)
+    aggregates = aggregate_in_batches(frame)
+    # Rows without an endpoint count towards the language but not towards any endpoint
+    assert_same_stats(aggregates.stats, direct_stats(frame))
+    assert_same_stats(stats_by(aggregates.grouped, "endpoint"), direct_stats(frame.dropna(subset=["endpoint"]), "endpoint"))
+    start, end = 1_700_000_004.0, 1_700_000_015.0
+    steady = frame[(frame["start_ts"] >= start) & (frame["start_ts"] < end)].dropna(subset=["endpoint"])
+    assert_same_stats(stats_by(aggregates.windows.stats_between(start, end), "endpoint"), direct_stats(steady, "endpoint"))
+
+
+def test_connection_stats_from_the_single_pass():
+    frame = results(7)
+    aggregates = aggregate_in_batches(frame)
+    assert_same_stats(stats_by(aggregates.grouped, "new_connection"), direct_stats(frame, "new_connection"))
+    # The per-window histograms are not split by connection
+    assert {len(group) for group, _ in aggregates.windows.keys} == {2}
+    assert_same_stats(stats_by(aggregates.windows.stats_between(0, 2e9)), direct_stats(frame))
+
+
+def test_corrected_only_with_values():
+    frame = results(5, size=200)
+    frame["corrected_latency_ms"] = np.nan
+    assert aggregate_in_batches(frame).corrected is None
+    frame["corrected_latency_ms"] = frame["latency_ms"] + 5
+    assert aggregate_in_batches(frame).corrected.overall().count == len(frame)
+
+
+@pytest.mark.parametrize("window", [1.0, 2.5])
+def test_windowed_rows_match_per_window_histograms(window):
+    frame = results(2)
+    windowed = aggregate_in_batches(frame, window=window).windows.finish()
+    frame["window"] = np.floor(frame["start_ts"] / window) * window
+    expected = []
+    for window_start, rows in frame.groupby("window"):
+        stats = direct_stats(rows)
+        for language in stats.languages() + ["Aggregated"]:
+            histogram = stats.overall() if language == "Aggregated" else stats.language(language)
+            expected.append([window_start, language, histogram.count,
+                             stats.error_count(None if language == "Aggregated" else language) / histogram.count * 100,
+                             histogram.quantile(0.50), histogram.quantile(0.95), histogram.quantile(0.99)])
+    expected = pd.DataFrame(expected, columns=[
+        "Window Start", "Language", "Requests", "Error Rate (%)", "p50 Latency (ms)", "p95 Latency (ms)", "p99 Latency (ms)",
+    ])
+    pd.testing.assert_frame_equal(windowed[expected.columns], expected, check_dtype=False, rtol=1e-12)
+    assert windowed["Elapsed (s)"].iloc[0] == 0
+
+
+def test_windows_double_past_max_bytes():
+    frame = results(8)
+    coarsened = RunAggregates(WindowedStats(1.0, max_bytes=70_000))
+    coarsened.add_batch(frame)
+    windowed = coarsened.windows.finish()
+    assert coarsened.windows.window == 4.0
+    assert coarsened.windows.nbytes <= 70_000
+    # Merging aligned windows gives what a run with the longer window would have recorded
+    expected = aggregate_in_batches(frame, window=coarsened.windows.window).windows
+    pd.testing.assert_frame_equal(windowed, expected.finish(), rtol=1e-12)
+    start, end = 1_700_000_000.0, 1_700_000_016.0
+    assert_same_stats(coarsened.windows.stats_between(start, end), expected.stats_between(start, end))
+    assert coarsened.windows.span_between(start, end) == pytest.approx(expected.span_between(start, end))
+
+
+def test_timing_breakdown_uses_successful_timed_requests():
+    frame = results(3, size=500)
+    frame["encode_ms"] = 1.0
+    frame["overhead_ms"] = np.where(np.arange(len(frame)) % 2, 2.0, np.nan)
+    aggregates = aggregate_in_batches(frame)
+    breakdown = aggregates.timing_breakdown().set_index("Language")
+    timed = frame[(frame["status_code"] == 200) & frame["overhead_ms"].notna()]
+    assert breakdown.loc["Aggregated", "Requests"] == len(timed)
+    assert breakdown.loc["Hindi", "Requests"] == (timed["language"] == "Hindi").sum()
+    assert breakdown.loc["Aggregated", "Overhead Mean (ms)"] == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize("sink_class, name", [(CsvResultSink, "results.csv"), (ParquetResultSink, "results.parquet")])
+def test_aggregate_results_reads_sink_output(tmp_path, sink_class, name):
+    frame = results(4, size=3000)
+    path = str(tmp_path / name)
+    sink = sink_class(path, batch_size=500)
+    sink.start()
+    for row in frame.itertuples(index=False):
+        values = {"language": row.language, "status_code": int(row.status_code), "latency_ms": row.latency_ms,
+                  "start_ts": row.start_ts, "end_ts": row.end_ts, "timestamp": "2026-01-01 00:00:00",
+                  "input_chars": 10, "api_key_id": 0}
+        sink.record(tuple(values.get(field) for field, _ in RESULT_FIELDS))
+    sink.close()
+    aggregates = aggregate_results(path, batch_size=1000, windows=WindowedStats())
+    assert_same_stats(aggregates.stats, direct_stats(frame))
+    assert aggregates.windows.finish()["Requests"].sum() == 2 * len(frame)
+    if sink_class is ParquetResultSink:
+        assert {"encode_ms", "overhead_ms", "corrected_latency_ms"} <= null_columns(path)
+        assert "latency_ms" not in null_columns(path)
+        assert aggregates.corrected is None
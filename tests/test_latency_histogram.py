@@ -0,0 +1,214 @@
+import json
+
+import numpy as np
+import pytest
+
+from latency_histogram import (
+    MAX_LATENCY_MS, THROTTLED_STATUS, LatencyHistogram, LatencyStats, SampleBuffer, grouped_quantiles,
+)
+
+QUANTILES = [0.01, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99, 0.999]
+
+
+def random_latencies(seed, size=20_000):
+    return np.random.default_rng(seed).lognormal(mean=4.5, sigma=0.8, size=size)
+
+
+def histogram_of(values, relative_accuracy=0.01):
+    histogram = LatencyHistogram(relative_accuracy)
+    histogram.add_many(values)
+    return histogram
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.02])
+def test_quantiles_within_relative_error(seed, relative_accuracy):
+    values = random_latencies(seed)
+    histogram = histogram_of(values, relative_accuracy)
+    for q in QUANTILES:
+        # quantile() reports the sample at rank floor(q * (n - 1)), which is numpy's "lower" method
+        exact = np.percentile(values, q * 100, method="lower")
+        assert abs(histogram.quantile(q) - exact) <= relative_accuracy * exact * (1 + 1e-9)
+
+
+def test_quantiles_stay_within_observed_range():
+    values = random_latencies(7, size=50)
+    histogram = histogram_of(values)
+    assert histogram.quantile(0.0) >= values.min()
+    assert histogram.quantile(1.0) <= values.max()
+    assert histogram.min == values.min() and histogram.max == values.max()
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.95) == 0.0
+    assert histogram.mean == 0.0
+
+
+def test_add_and_add_many_agree():
+    values = random_latencies(1, size=2000)
+    single = LatencyHistogram()
+    for value in values:
+        single.add(value)
+    batched = histogram_of(values)
+    assert single.counts == batched.counts
+    assert single.count == batched.count
+    assert single.sum == pytest.approx(batched.sum)
+
+
+def test_add_many_skips_nan():
+    histogram = histogram_of([1.0, np.nan, 2.0])
+    assert histogram.count == 2
+
+
+def test_out_of_range_values_are_clamped_to_edge_buckets():
+    histogram = histogram_of([0.0001, 10.0, 1e9])
+    assert histogram.count == 3
+    assert len(histogram.counts) == 3
+    assert histogram.quantile(1.0) == pytest.approx(MAX_LATENCY_MS, rel=0.01)
+
+
+def test_merge_equals_histogram_of_all_samples():
+    parts = [random_latencies(seed, size=5000) for seed in range(3)]
+    merged = LatencyHistogram()
+    for part in parts:
+        merged.merge(histogram_of(part))
+    combined = histogram_of(np.concatenate(parts))
+    assert merged.counts == combined.counts
+    assert merged.count == combined.count
+    assert merged.min == combined.min and merged.max == combined.max
+    for q in QUANTILES:
+        assert merged.quantile(q) == combined.quantile(q)
+
+
+def test_merge_is_associative_and_commutative():
+    a, b, c = (histogram_of(random_latencies(seed, size=3000)) for seed in range(3))
+    left = LatencyHistogram().merge(a).merge(b).merge(c)
+    right = LatencyHistogram().merge(a).merge(LatencyHistogram().merge(b).merge(c))
+    reversed_order = LatencyHistogram().merge(c).merge(b).merge(a)
+    for other in (right, reversed_order):
+        assert left.counts == other.counts
+        assert left.count == other.count
+        assert left.sum == pytest.approx(other.sum)
+        assert (left.min, left.max) == (other.min, other.max)
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0.01).merge(LatencyHistogram(0.02))
+
+
+def test_histogram_round_trip():
+    histogram = histogram_of(random_latencies(3))
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.counts == histogram.counts
+    assert restored.count == histogram.count
+    assert restored.sum == histogram.sum
+    assert (restored.min, restored.max) == (histogram.min, histogram.max)
+    assert restored.percentiles() == histogram.percentiles()
+
+
+def test_empty_histogram_round_trip():
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(LatencyHistogram().to_dict())))
+    assert restored.count == 0
+    assert restored.quantile(0.5) == 0.0
+
+
+def sample_stats(seed=0, size=5000):
+    rng = np.random.default_rng(seed)
+    languages = rng.choice(["Hindi", "Tamil", "Odia"], size=size)
+    statuses = rng.choice([200, 200, 200, 500, THROTTLED_STATUS], size=size)
+    return languages, statuses, random_latencies(seed, size)
+
+
+def test_record_groups_matches_record():
+    languages, statuses, latencies = sample_stats()
+    one_by_one = LatencyStats()
+    for language, status, latency in zip(languages, statuses, latencies):
+        one_by_one.record(str(language), int(status), latency)
+    keys = sorted(set(zip(languages.tolist(), statuses.tolist())))
+    key_ids = {key: index for index, key in enumerate(keys)}
+    vectorized = LatencyStats()
+    vectorized.record_groups(keys, [key_ids[key] for key in zip(languages.tolist(), statuses.tolist())], latencies)
+    assert set(vectorized.histograms) == set(one_by_one.histograms)
+    for key, histogram in one_by_one.histograms.items():
+        assert vectorized.histograms[key].counts == histogram.counts
+        assert vectorized.histograms[key].sum == pytest.approx(histogram.sum)
+
+
+def test_record_groups_only_creates_present_keys():
+    stats = LatencyStats()
+    keys = [("Hindi", 200), ("Tamil", 200), ("Odia", 500)]
+    stats.record_groups(keys, [2, 2, 0], [10.0, 20.0, np.nan])
+    assert set(stats.histograms) == {("Odia", 500)}
+    assert stats.histograms[("Odia", 500)].count == 2
+
+
+def test_regroup_merges_and_drops_keys():
+    languages, statuses, latencies = sample_stats(2)
+    stats = LatencyStats()
+    for language, status, latency in zip(languages, statuses, latencies):
+        stats.record(str(language), int(status), latency)
+    by_status = stats.regroup(lambda language, status: ("All", status) if language != "Hindi" else None)
+    assert by_status.overall(200).counts == stats._merged(lambda lang, status: lang != "Hindi" and status == 200).counts
+    assert by_status.languages() == ["All"]
+
+
+def test_grouped_quantiles_match_histograms():
+    rng = np.random.default_rng(3)
+    histograms = [histogram_of(random_latencies(seed, size)) for seed, size in [(0, 1), (1, 7), (2, 5000)]]
+    groups, buckets, counts = [], [], []
+    for group, histogram in enumerate(histograms):
+        # Split each bucket's count in two entries, as per-batch entries would be
+        for index, count in histogram.counts.items():
+            first = int(rng.integers(0, count + 1))
+            groups += [group, group]
+            buckets += [index, index]
+            counts += [first, count - first]
+    minimums = np.array([histogram.min for histogram in histograms] + [np.inf])
+    maximums = np.array([histogram.max for histogram in histograms] + [-np.inf])
+    results = grouped_quantiles(np.array(groups), np.array(buckets), np.array(counts), minimums, maximums, QUANTILES)
+    for q, result in zip(QUANTILES, results):
+        assert result[:3] == pytest.approx([histogram.quantile(q) for histogram in histograms], rel=1e-12)
+        assert result[3] == 0
+
+
+def test_error_and_throttled_counts():
+    stats = LatencyStats()
+    for status in [200, 200, 500, 0, THROTTLED_STATUS, THROTTLED_STATUS]:
+        stats.record("Hindi", status, 10.0)
+    stats.record("Tamil", 503, 10.0)
+    assert stats.error_count() == 3
+    assert stats.error_count("Hindi") == 2
+    assert stats.throttled_count() == 2
+    assert stats.throttled_count("Tamil") == 0
+    assert stats.overall(200).count == 2
+
+
+def test_stats_merge_and_round_trip():
+    languages, statuses, latencies = sample_stats(1)
+    halves = [LatencyStats(), LatencyStats()]
+    whole = LatencyStats()
+    for index, (language, status, latency) in enumerate(zip(languages, statuses, latencies)):
+        halves[index % 2].record(str(language), int(status), latency)
+        whole.record(str(language), int(status), latency)
+    merged = LatencyStats().merge(halves[0]).merge(halves[1])
+    restored = LatencyStats.from_dict(json.loads(json.dumps(merged.to_dict())))
+    assert set(restored.histograms) == set(whole.histograms)
+    for key, histogram in whole.histograms.items():
+        assert restored.histograms[key].counts == histogram.counts
+    assert restored.overall().quantile(0.99) == whole.overall().quantile(0.99)
+
+
+def test_sample_buffer_feeds_every_target():
+    latency, corrected = LatencyStats(), LatencyStats()
+    buffer = SampleBuffer([(latency, 0), (corrected, 1)], columns=2, capacity=64)
+    expected = LatencyStats()
+    for index in range(200):
+        buffer.append("Hindi", 200, float(index + 1), float(index + 11))
+        expected.record("Hindi", 200, float(index + 1))
+    assert len(buffer) == 200 % 64
+    buffer.drain()
+    assert len(buffer) == 0
+    assert latency.histograms[("Hindi", 200)].counts == expected.histograms[("Hindi", 200)].counts
+    assert corrected.overall().min == 11.0
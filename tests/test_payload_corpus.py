@@ -0,0 +1,109 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from payload_corpus import (
+    BODY_ENTRY_OVERHEAD, PayloadCorpus, RequestBodies, WeightedChoice, fill_template, parse_mix, parse_size_mix,
+)
+
+
+def write_corpus(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record, ensure_ascii=False)) + "\n")
+    return str(path)
+
+
+def test_parse_mix():
+    assert parse_mix("hi-IN:3, ta-IN:1,") == {"hi-IN": 3.0, "ta-IN": 1.0}
+
+
+def test_parse_size_mix():
+    assert parse_size_mix("0-20:1,20-100:2,100-:0.5") == [((0, 20), 1.0), ((20, 100), 2.0), ((100, None), 0.5)]
+
+
+def test_weighted_choice_follows_weights():
+    chooser = WeightedChoice(["a", "b", "c"], [1, 3, 0])
+    rng = random.Random(1)
+    counts = Counter(chooser.choice(rng) for _ in range(20000))
+    assert counts["c"] == 0
+    assert counts["b"] / counts["a"] == pytest.approx(3, rel=0.1)
+
+
+def test_weighted_choice_needs_a_positive_weight():
+    with pytest.raises(ValueError):
+        WeightedChoice(["a"], [0])
+    with pytest.raises(ValueError):
+        WeightedChoice([], [])
+
+
+def test_corpus_skips_blank_and_unusable_lines(tmp_path):
+    path = write_corpus(tmp_path / "corpus.jsonl", [
+        {"input": "namaste"}, "", {"other": "x"}, {"input": ""}, {"input": "vanakkam", "target_language_code": "ta-IN"},
+    ])
+    corpus = PayloadCorpus(path, seed=0)
+    assert len(corpus) == 2
+    samples = {corpus.sample() for _ in range(200)}
+    assert samples == {("namaste", None), ("vanakkam", "ta-IN")}
+
+
+def test_corpus_reads_a_last_line_without_newline(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    path.write_text('{"input": "ek"}\n{"input": "do"}', encoding="utf-8")
+    corpus = PayloadCorpus(str(path), seed=0)
+    assert {corpus.sample()[0] for _ in range(200)} == {"ek", "do"}
+
+
+def test_corpus_line_weights(tmp_path):
+    path = write_corpus(tmp_path / "corpus.jsonl", [{"input": "rare", "weight": 1}, {"input": "common", "weight": 9}])
+    corpus = PayloadCorpus(path, seed=0)
+    counts = Counter(corpus.sample()[0] for _ in range(10000))
+    assert counts["common"] / counts["rare"] == pytest.approx(9, rel=0.15)
+
+
+def test_corpus_size_mix_picks_the_bucket_first(tmp_path):
+    records = [{"input": "x" * 5} for _ in range(99)] + [{"input": "y" * 50}]
+    path = write_corpus(tmp_path / "corpus.jsonl", records)
+    corpus = PayloadCorpus(path, size_mix=parse_size_mix("0-10:1,10-:1,1000-:5"), seed=0)
+    counts = Counter(len(corpus.sample()[0]) for _ in range(10000))
+    # The empty 1000+ bucket is dropped, the other two are equally likely despite 99:1 lines
+    assert set(counts) == {5, 50}
+    assert counts[50] / counts[5] == pytest.approx(1, rel=0.1)
+
+
+def test_corpus_without_inputs_fails(tmp_path):
+    corpus = PayloadCorpus(write_corpus(tmp_path / "corpus.jsonl", [{"text": "namaste"}]))
+    with pytest.raises(ValueError):
+        len(corpus)
+
+
+def test_fill_template():
+    template = {"input": "{text}", "target_language_code": "{target_language}", "options": [{"lang": "{target_language}"}, 1]}
+    assert fill_template(template, "hi-IN", "namaste") == {
+        "input": "namaste", "target_language_code": "hi-IN", "options": [{"lang": "hi-IN"}, 1],
+    }
+    assert template["input"] == "{text}"
+
+
+def test_request_bodies_reuse_cached_bytes():
+    bodies = RequestBodies({"input": "{text}", "target_language_code": "{target_language}"})
+    body = bodies.get("hi-IN", "namaste")
+    assert json.loads(body) == {"input": "namaste", "target_language_code": "hi-IN"}
+    assert bodies.get("hi-IN", "namaste") is body
+    assert bodies.get("ta-IN", "namaste") != body
+    assert len(bodies) == 2
+
+
+def test_request_bodies_cache_is_capped_by_bytes():
+    template = {"input": "{text}"}
+    long_text = "x" * 10_000
+    entry = len(RequestBodies(template).build("hi-IN", long_text)) + len(long_text) + BODY_ENTRY_OVERHEAD
+    bodies = RequestBodies(template, max_bytes=3 * entry)
+    for i in range(10):
+        text = long_text[:-1] + str(i)
+        # Bodies past the cap are still built correctly, just not kept
+        assert json.loads(bodies.get("hi-IN", text)) == {"input": text}
+    assert len(bodies) == 3
+    assert bodies.size_bytes <= bodies.max_bytes
@@ -0,0 +1,149 @@
+import email.utils
+import heapq
+import time
+
+import pytest
+
+import rate_control
+from rate_control import MIN_RPS, KeyLimiter, RateController, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_control.time, "perf_counter", fake)
+    monkeypatch.setattr(rate_control.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_sends_are_paced_at_the_rate(clock):
+    limiter = KeyLimiter(start_rps=4, step_rps=0)
+    assert [limiter.reserve(clock.now) - 100 for _ in range(4)] == pytest.approx([0, 0.25, 0.5, 0.75])
+
+
+def test_additive_increase_while_requests_queue(clock):
+    limiter = KeyLimiter(start_rps=5, step_rps=2)
+    limiter.reserve(clock.now)
+    limiter.reserve(clock.now)
+    clock.now += 0.1
+    # The next slot is still ahead, so demand exceeds the rate: 0.1 s at 2 RPS/s
+    limiter.reserve(clock.now)
+    assert limiter.rate == pytest.approx(5.2)
+    clock.now += 10
+    # Nothing was queued, so an idle key does not grow
+    limiter.reserve(clock.now)
+    assert limiter.rate == pytest.approx(5.2)
+
+
+def test_increase_stops_at_max_rps(clock):
+    limiter = KeyLimiter(start_rps=5, step_rps=100, max_rps=8)
+    limiter.reserve(clock.now)
+    clock.now += 0.1
+    limiter.reserve(clock.now)
+    assert limiter.rate == 8
+
+
+def test_multiplicative_decrease_once_per_round_trip(clock):
+    limiter = KeyLimiter(start_rps=8, step_rps=0, backoff=0.5)
+    sent_before = clock.now
+    clock.now += 1
+    limiter.on_throttled(sent_before)
+    assert limiter.rate == 4 and limiter.ceilings == [8]
+    # Another 429 for a request sent before that cut is the same congestion event
+    limiter.on_throttled(sent_before)
+    assert limiter.rate == 4 and limiter.throttled == 2
+    clock.now += 0.5
+    limiter.on_throttled(clock.now - 0.1)
+    assert limiter.rate == 2 and limiter.ceilings == [8, 4]
+    assert limiter.sustainable_rps() == 6
+
+
+def test_rate_never_drops_below_min_rps(clock):
+    limiter = KeyLimiter(start_rps=0.6, backoff=0.1)
+    limiter.on_throttled(clock.now)
+    assert limiter.rate == MIN_RPS
+
+
+def test_retry_after_blocks_the_key(clock):
+    limiter = KeyLimiter(start_rps=10, step_rps=0)
+    limiter.on_throttled(clock.now, retry_after=3)
+    assert limiter.available_at(clock.now) == pytest.approx(103.2)
+    assert limiter.reserve(clock.now) == pytest.approx(103.2)
+    # A later 429 from before the cut still extends the block, without cutting again
+    limiter.on_throttled(clock.now - 1, retry_after=5)
+    assert limiter.blocked_until == pytest.approx(105) and limiter.rate == 5
+
+
+def test_cut_releases_slots_reserved_at_the_old_rate(clock):
+    limiter = KeyLimiter(start_rps=5, step_rps=0)
+    for _ in range(10):
+        limiter.reserve(clock.now)
+    assert limiter.next_send == pytest.approx(102)
+    limiter.on_throttled(clock.now)
+    # The ten queued requests will take new slots, paced from now at 2.5 RPS
+    assert limiter.next_send == pytest.approx(100.4)
+
+
+def test_queued_users_keep_the_rate_after_a_cut(clock):
+    # Ten users send back to back through one key, and one 429 arrives at t=1s
+    controller = RateController(start_rps=5, step_rps=0)
+    limiter = controller.limiters[0]
+    waiting = []
+    for user in range(10):
+        key_id, send_at = controller.acquire()
+        heapq.heappush(waiting, (send_at, user, len(limiter.ceilings)))
+    sends = []
+    throttled = False
+    while clock.now < 105:
+        send_at, user, cuts = heapq.heappop(waiting)
+        clock.now = send_at
+        if not throttled and clock.now >= 101:
+            controller.on_throttled(0, clock.now - 0.01)
+            throttled = True
+        if len(limiter.ceilings) == cuts:
+            # Sent; the user queues again right away
+            sends.append(clock.now)
+        _, send_at = controller.acquire()
+        heapq.heappush(waiting, (send_at, user, len(limiter.ceilings)))
+    after_cut = [sent for sent in sends if 101.5 <= sent < 105]
+    assert len(after_cut) / 3.5 == pytest.approx(limiter.rate, rel=0.15)
+
+
+def test_wait_takes_a_new_slot_after_a_cut(clock, monkeypatch):
+    controller = RateController(keys=2, start_rps=1, step_rps=0)
+    assert controller.wait() == 0
+    assert controller.wait() == 1
+    # Both keys are busy for 1 s; key 0 is throttled while this request sleeps for its slot,
+    # so the request moves to key 1 rather than sending into the Retry-After block
+    sleep = clock.sleep
+
+    def throttled_sleep(seconds):
+        sleep(seconds)
+        if not controller.limiters[0].ceilings:
+            controller.on_throttled(0, clock.now, retry_after=10)
+
+    monkeypatch.setattr(rate_control.time, "sleep", throttled_sleep)
+    assert controller.wait() == 1
+    assert clock.now == pytest.approx(101)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-3") == 0
+    assert parse_retry_after("soon") is None
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert parse_retry_after(date) == pytest.approx(30, abs=1.5)
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0
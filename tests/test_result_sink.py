@@ -0,0 +1,123 @@
+import csv
+import os
+import threading
+
+import pytest
+
+from analysis_engine import count_rows, iter_batches, result_columns
+from result_sink import (
+    RESULT_COLUMNS, CsvResultSink, ForwardingSink, ParquetResultSink, ResultSink, create_sink,
+)
+
+FIELDS = [("language", "string"), ("status_code", "int32"), ("latency_ms", "float64")]
+
+
+def rows(count, start=0):
+    return [("Hindi" if index % 2 else "Tamil", 200, float(index)) for index in range(start, start + count)]
+
+
+def read_latencies(path):
+    return [value for batch in iter_batches(path, ["latency_ms"]) for value in batch["latency_ms"]]
+
+
+def test_result_sink_is_abstract():
+    with pytest.raises(TypeError):
+        ResultSink("results.csv")
+
+
+def test_csv_sink_writes_every_row_in_order(tmp_path):
+    path = str(tmp_path / "results.csv")
+    sink = CsvResultSink(path, fields=FIELDS, batch_size=7)
+    sink.start()
+    for row in rows(100):
+        sink.record(row)
+    sink.close()
+    assert sink.rows_written == 100
+    with open(path, newline="", encoding="utf-8") as f:
+        written = list(csv.reader(f))
+    assert written[0] == ["language", "status_code", "latency_ms"]
+    assert [float(row[2]) for row in written[1:]] == [float(index) for index in range(100)]
+
+
+def test_batches_are_written_off_the_calling_thread(tmp_path):
+    writer_threads = set()
+
+    class RecordingSink(CsvResultSink):
+        def _write_batch(self, batch):
+            writer_threads.add(threading.get_ident())
+            super()._write_batch(batch)
+
+    sink = RecordingSink(str(tmp_path / "results.csv"), fields=FIELDS, batch_size=10)
+    sink.start()
+    for row in rows(50):
+        sink.record(row)
+    sink.close()
+    assert writer_threads and threading.get_ident() not in writer_threads
+
+
+def test_parquet_sink_rolls_part_files(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    sink = ParquetResultSink(path, fields=FIELDS, batch_size=10, part_batches=3)
+    sink.start()
+    for row in rows(95):
+        sink.record(row)
+    sink.close()
+    parts = sorted(os.listdir(path))
+    # 10 batches of 10 rows at 3 batches per part
+    assert parts == [f"part-{index:05d}.parquet" for index in range(4)]
+    assert count_rows(path) == 95
+    assert read_latencies(path) == [float(index) for index in range(95)]
+    assert result_columns(path) == ["language", "status_code", "latency_ms"]
+
+
+def test_parquet_parts_survive_a_killed_run(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    sink = ParquetResultSink(path, fields=FIELDS, batch_size=10, part_batches=2)
+    sink.start()
+    for row in rows(50):
+        sink.record(row)
+    sink.flush()
+    # Wait for the writer but never close the sink, as if the process had been killed
+    sink._pool.join()
+    assert sorted(os.listdir(path)) == [".part-00002.parquet", "part-00000.parquet", "part-00001.parquet"]
+    assert read_latencies(path) == [float(index) for index in range(40)]
+
+
+def test_parquet_sink_replaces_previous_run(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    for count in (30, 5):
+        sink = ParquetResultSink(path, fields=FIELDS, batch_size=10, part_batches=1)
+        sink.start()
+        for row in rows(count):
+            sink.record(row)
+        sink.close()
+    assert count_rows(path) == 5
+
+
+def test_empty_parquet_run_keeps_the_schema(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    sink = ParquetResultSink(path, fields=FIELDS)
+    sink.start()
+    sink.close()
+    assert result_columns(path) == ["language", "status_code", "latency_ms"]
+    assert count_rows(path) == 0
+
+
+def test_forwarding_sink_sends_batches_synchronously():
+    sent = []
+    sink = ForwardingSink(sent.append, batch_size=4)
+    sink.start()
+    for row in rows(10):
+        sink.record(row)
+    assert [len(batch) for batch in sent] == [4, 4]
+    sink.close()
+    assert [len(batch) for batch in sent] == [4, 4, 2]
+    assert sink.rows_written == 10
+
+
+def test_create_sink(tmp_path):
+    sink = create_sink("parquet", str(tmp_path / "results.parquet"))
+    assert isinstance(sink, ParquetResultSink)
+    assert sink.columns == RESULT_COLUMNS
+    with pytest.raises(ValueError):
+        create_sink("xml")
@@ -0,0 +1,129 @@
+import json
+
+import numpy as np
+import pytest
+
+from latency_histogram import LatencyStats
+from run_store import AGGREGATED, RunStore, holm_adjust, ingest, quantile_tests
+
+LANGUAGES = ["hi-IN", "ta-IN", "bn-IN"]
+
+
+def random_stats(seed, size=5000, scale=1.0, errors=0.01, languages=LANGUAGES):
+    rng = np.random.default_rng(seed)
+    stats = LatencyStats()
+    for language in languages:
+        latencies = rng.lognormal(mean=4.5, sigma=0.5, size=size) * scale
+        statuses = np.where(rng.random(size) < errors, 500, 200)
+        keys = [(language, 200), (language, 500)]
+        stats.record_groups(keys, (statuses == 500).astype(np.int64), latencies)
+    return stats
+
+
+def store_with(tmp_path, *runs):
+    store = RunStore(str(tmp_path / "runs.db"))
+    for index, stats in enumerate(runs):
+        store.add_run({"run_id": f"run-{index}", "started_at": 1000.0 * index, "stopped_at": 1000.0 * index + 60},
+                      stats)
+    return store
+
+
+def test_identical_runs_have_no_regressions(tmp_path):
+    stats = random_stats(0)
+    store = store_with(tmp_path, stats, stats)
+    comparison = store.compare("run-0", "run-1")
+    assert set(comparison["Language"]) == set(LANGUAGES) | {AGGREGATED}
+    assert not comparison["Regression"].any()
+    latency = comparison[comparison["Metric"].str.contains("Latency")]
+    assert (latency["p-value"] > 0.5).all()
+
+
+def test_runs_of_the_same_distribution_rarely_regress(tmp_path):
+    flagged = 0
+    for seed in range(10):
+        store = store_with(tmp_path, random_stats(2 * seed), random_stats(2 * seed + 1))
+        flagged += store.compare("run-0", "run-1", min_change=0.0)["Regression"].any()
+        store.close()
+    # Holm keeps the chance of any false regression per table at alpha
+    assert flagged <= 2
+
+
+def test_slower_candidate_is_flagged(tmp_path):
+    store = store_with(tmp_path, random_stats(0), random_stats(1, scale=1.3))
+    comparison = store.compare("run-0", "run-1")
+    latency = comparison[comparison["Metric"].str.contains("Latency")]
+    assert latency["Regression"].all()
+    assert (latency["Adjusted p-value"] < 0.05).all()
+    assert not comparison[comparison["Metric"] == "Error Rate"]["Regression"].any()
+
+
+def test_faster_candidate_is_not_a_regression(tmp_path):
+    store = store_with(tmp_path, random_stats(0), random_stats(1, scale=0.7))
+    comparison = store.compare("run-0", "run-1")
+    assert not comparison["Regression"].any()
+    assert (comparison[comparison["Metric"] == "p95 Latency (ms)"]["Change (%)"] < -20).all()
+
+
+def test_quantile_tests_only_flag_the_quantile_that_moved():
+    rng = np.random.default_rng(3)
+    base = rng.lognormal(mean=4.5, sigma=0.5, size=20_000)
+    # Same body, heavier tail: only the top 2% get slower
+    tail = base.copy()
+    tail[tail > np.quantile(tail, 0.98)] *= 3
+    baseline, candidate = LatencyStats(), LatencyStats()
+    baseline.record_groups([("hi-IN", 200)], np.zeros(base.size, dtype=np.int64), base)
+    candidate.record_groups([("hi-IN", 200)], np.zeros(tail.size, dtype=np.int64), tail)
+    p50, p99 = quantile_tests(baseline.overall(200), candidate.overall(200), [0.50, 0.99])
+    assert p50 > 0.5
+    assert p99 < 0.01
+
+
+def test_holm_adjust():
+    adjusted = holm_adjust([0.01, 0.04, float("nan"), 0.03, 0.5])
+    # Sorted: 0.01*4, 0.03*3, 0.04*2, 0.5*1, each at least the one before it
+    np.testing.assert_allclose(adjusted[[0, 3, 1, 4]], [0.04, 0.09, 0.09, 0.5])
+    assert np.isnan(adjusted[2])
+    assert holm_adjust([0.9, 0.8]).max() == 1.0
+
+
+def test_small_languages_are_skipped(tmp_path):
+    baseline = random_stats(0)
+    baseline.record_groups([("te-IN", 200)], np.zeros(20, dtype=np.int64), np.full(20, 100.0))
+    candidate = random_stats(1)
+    candidate.record_groups([("te-IN", 200)], np.zeros(20, dtype=np.int64), np.full(20, 900.0))
+    store = store_with(tmp_path, baseline, candidate)
+    assert "te-IN" not in set(store.compare("run-0", "run-1")["Language"])
+    assert "te-IN" in set(store.compare("run-0", "run-1", min_requests=10)["Language"])
+
+
+def test_round_trip_and_resolve(tmp_path):
+    stats = random_stats(0, size=500)
+    store = store_with(tmp_path, stats, random_stats(1, size=500))
+    loaded, seconds = store.load("run-0")
+    assert seconds == 60
+    assert loaded.to_dict() == stats.to_dict()
+    assert store.resolve("latest") == "run-1"
+    assert store.resolve("previous") == "run-0"
+    assert store.resolve("run-") == "run-1"
+    with pytest.raises(KeyError):
+        store.resolve("missing")
+    history = store.history(metric="p95")
+    assert list(history["run_id"]) == ["run-1", "run-0"]
+    assert list(store.runs()["requests"]) == [1500, 1500]
+
+
+def test_ingest_uses_matching_run_info(tmp_path):
+    stats = random_stats(0, size=200)
+    histogram_file, run_info_file = tmp_path / "latency_histograms.json", tmp_path / "run_info.json"
+    histogram_file.write_text(json.dumps({**stats.to_dict(), "run_id": "abc", "started_at": 10.0, "stopped_at": 70.0}))
+    run_info_file.write_text(json.dumps({"run_id": "abc", "concurrency": 8, "host": "http://example"}))
+    store = RunStore(str(tmp_path / "runs.db"))
+    assert ingest(store, str(histogram_file), str(run_info_file)) == "abc"
+    run = store.runs().iloc[0]
+    assert run["concurrency"] == 8 and run["host"] == "http://example"
+    assert run["rps"] == pytest.approx(600 / 60)
+    # A run_info.json from another run is ignored
+    run_info_file.write_text(json.dumps({"run_id": "other", "concurrency": 99}))
+    histogram_file.write_text(json.dumps({**stats.to_dict(), "run_id": "def", "started_at": 80.0, "stopped_at": 90.0}))
+    assert ingest(store, str(histogram_file), str(run_info_file)) == "def"
+    assert store.runs().iloc[0]["concurrency"] is None or np.isnan(store.runs().iloc[0]["concurrency"])
@@ -0,0 +1,187 @@
+import pandas as pd
+import pytest
+import requests
+
+import sheets_sync
+from sheets_sync import (
+    FakeQuotaError, FakeSpreadsheet, RequestPacer, SheetWriter, SyncState, sample_rows, to_values, with_retries,
+)
+
+
+class FakeClock:
+    """time.monotonic() that only moves when sleep() is called."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sheets_sync.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def results(start, count):
+    return pd.DataFrame({"row": range(start, start + count), "latency_ms": [float(index) for index in range(count)]})
+
+
+def batches(frame, size):
+    for start in range(0, len(frame), size):
+        yield frame.iloc[start:start + size]
+
+
+def synced_rows(spreadsheet, title="Raw Data"):
+    header, *rows = spreadsheet.worksheets[title].get_all_values()
+    assert header == ["row", "latency_ms"]
+    return [row[0] for row in rows]
+
+
+def writer(spreadsheet, clock, batch_rows=100, requests_per_minute=0):
+    return SheetWriter(spreadsheet, batch_rows=batch_rows, requests_per_minute=requests_per_minute, sleep=clock.sleep)
+
+
+def test_sync_appends_every_row_once(tmp_path, clock):
+    sheet = FakeSpreadsheet()
+    state = SyncState(str(tmp_path / "state.json"))
+    frame = results(0, 450)
+    assert writer(sheet, clock).sync_rows("Raw Data", batches(frame, 200), "run-1", state) == 450
+    assert synced_rows(sheet) == list(range(450))
+    assert state.rows_synced == 450
+
+
+def test_resync_adds_no_duplicates(tmp_path, clock):
+    sheet = FakeSpreadsheet()
+    path = str(tmp_path / "state.json")
+    frame = results(0, 300)
+    writer(sheet, clock).sync_rows("Raw Data", batches(frame, 128), "run-1", SyncState(path))
+    assert writer(sheet, clock).sync_rows("Raw Data", batches(frame, 128), "run-1", SyncState(path)) == 0
+    # The run kept writing: only the new rows go up
+    grown = results(0, 520)
+    assert writer(sheet, clock).sync_rows("Raw Data", batches(grown, 128), "run-1", SyncState(path)) == 220
+    assert synced_rows(sheet) == list(range(520))
+
+
+def test_interrupted_sync_resumes_from_watermark(tmp_path, clock):
+    sheet = FakeSpreadsheet()
+    path = str(tmp_path / "state.json")
+    frame = results(0, 1000)
+
+    def interrupted(frame):
+        for index, batch in enumerate(batches(frame, 250)):
+            if index == 2:
+                raise KeyboardInterrupt
+            yield batch
+
+    with pytest.raises(KeyboardInterrupt):
+        writer(sheet, clock).sync_rows("Raw Data", interrupted(frame), "run-1", SyncState(path))
+    assert SyncState(path).rows_synced == 500
+    assert writer(sheet, clock).sync_rows("Raw Data", batches(frame, 300), "run-1", SyncState(path)) == 500
+    assert synced_rows(sheet) == list(range(1000))
+
+
+def test_new_run_starts_the_tab_over(tmp_path, clock):
+    sheet = FakeSpreadsheet()
+    path = str(tmp_path / "state.json")
+    writer(sheet, clock).sync_rows("Raw Data", batches(results(0, 300), 100), "run-1", SyncState(path))
+    writer(sheet, clock).sync_rows("Raw Data", batches(results(5000, 50), 100), "run-2", SyncState(path))
+    assert synced_rows(sheet) == list(range(5000, 5050))
+    assert SyncState(path).run_id == "run-2"
+
+
+def test_quota_errors_are_retried_with_backoff(tmp_path, clock):
+    sheet = FakeSpreadsheet(quota_error_rate=0.3, seed=7)
+    state = SyncState(str(tmp_path / "state.json"))
+    frame = results(0, 2000)
+    writer(sheet, clock).sync_rows("Raw Data", batches(frame, 500), "run-1", state)
+    assert synced_rows(sheet) == list(range(2000))
+    assert clock.sleeps, "some calls should have hit the fake quota error and backed off"
+
+
+def test_retried_write_that_landed_is_not_duplicated(tmp_path, clock):
+    sheet = FakeSpreadsheet()
+    worksheet = sheet.add_worksheet("Raw Data", rows=100)
+    update = worksheet.update
+    timed_out = []
+
+    def update_then_time_out(values, range_name="A1"):
+        update(values, range_name)
+        # The write is applied but its response is lost, so the writer retries it
+        if range_name != "A1" and range_name not in timed_out:
+            timed_out.append(range_name)
+            raise requests.exceptions.Timeout("read timed out")
+
+    worksheet.update = update_then_time_out
+    state = SyncState(str(tmp_path / "state.json"))
+    assert writer(sheet, clock).sync_rows("Raw Data", batches(results(0, 450), 200), "run-1", state) == 450
+    assert timed_out == ["A2", "A102", "A202", "A302", "A402"]
+    assert synced_rows(sheet) == list(range(450))
+    assert worksheet.row_count >= 451
+
+
+def test_with_retries_backoff_grows_and_gives_up(clock):
+    calls = []
+
+    def throttled():
+        calls.append(1)
+        raise FakeQuotaError("429")
+
+    with pytest.raises(FakeQuotaError):
+        with_retries(throttled, attempts=5, base_delay=1.0, max_delay=4.0, sleep=clock.sleep)
+    assert len(calls) == 5
+    assert len(clock.sleeps) == 4
+    # Full jitter: each delay is drawn from [0, min(max_delay, base_delay * 2**attempt)]
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0 <= delay <= min(4.0, 2 ** attempt)
+
+
+def test_with_retries_does_not_retry_other_errors(clock):
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        with_retries(broken, sleep=clock.sleep)
+    assert len(calls) == 1 and not clock.sleeps
+
+
+def test_pacer_spaces_requests(clock):
+    pacer = RequestPacer(requests_per_minute=30, sleep=clock.sleep)
+    for _ in range(4):
+        pacer.wait()
+    assert clock.sleeps == pytest.approx([2.0, 2.0, 2.0])
+    # Time spent elsewhere counts towards the interval
+    clock.now += 1.5
+    pacer.wait()
+    assert clock.sleeps[-1] == pytest.approx(0.5)
+
+
+def test_replace_writes_in_paced_batches(clock):
+    sheet = FakeSpreadsheet()
+    sheet_writer = writer(sheet, clock, batch_rows=2000, requests_per_minute=60)
+    sheet_writer.replace("Summary", results(0, 4500))
+    assert synced_rows(sheet, "Summary") == list(range(4500))
+    # Lookup, add, clear, header, then three batches of at most 2000 rows
+    assert sheet_writer.requests == 7
+    assert clock.sleeps == pytest.approx([1.0] * 6)
+
+
+def test_to_values_blanks_missing_and_infinite():
+    frame = pd.DataFrame({"a": [1.234, float("nan"), float("inf")], "b": ["x", None, "z"]})
+    assert to_values(frame) == [[1.23, "x"], ["", ""], ["", "z"]]
+
+
+def test_sample_rows_is_evenly_spaced():
+    frame = results(0, 1000)
+    sample = sample_rows(batches(frame, 333), total_rows=1000, max_rows=100)
+    assert sample["row"].tolist() == list(range(0, 1000, 10))
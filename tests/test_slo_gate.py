@@ -0,0 +1,190 @@
+import importlib.util
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+import slo_gate
+from latency_histogram import LatencyStats
+from slo_gate import AGGREGATE, SloGate, load_slo_gate, write_verdict
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(slo_gate.time, "monotonic", fake)
+    return fake
+
+
+def stats_with(latencies_by_language, errors=0):
+    stats = LatencyStats()
+    for language, latencies in latencies_by_language.items():
+        latencies = np.asarray(latencies, dtype=float)
+        statuses = np.zeros(latencies.size, dtype=np.int64)
+        statuses[:errors] = 1
+        stats.record_groups([(language, 200), (language, 500)], statuses, latencies)
+    return stats
+
+
+def checks_by_key(checks):
+    return {(check["scope"], check["metric"]): check for check in checks}
+
+
+def test_language_limits_override_the_default():
+    gate = SloGate(aggregate={"p95_ms": 500, "min_rps": 10}, default={"p95_ms": 200},
+                   languages={"Tamil": {"p95_ms": 400, "error_rate": 5}})
+    stats = stats_with({"Hindi": np.full(100, 150.0), "Tamil": np.full(100, 300.0)}, errors=10)
+    checks = checks_by_key(gate.evaluate(stats, duration=10))
+    assert checks[("Hindi", "p95_ms")]["passed"]
+    # Tamil's own 400 ms limit applies rather than the 200 ms default
+    assert checks[("Tamil", "p95_ms")]["limit"] == 400 and checks[("Tamil", "p95_ms")]["passed"]
+    assert not checks[("Tamil", "error_rate")]["passed"]
+    assert checks[("Tamil", "error_rate")]["observed"] == 10
+    assert checks[(AGGREGATE, "min_rps")]["observed"] == 20 and checks[(AGGREGATE, "min_rps")]["passed"]
+    assert not SloGate(aggregate={"min_rps": 25}).evaluate(stats, duration=10)[0]["passed"]
+
+
+def test_invalid_limits_are_rejected():
+    with pytest.raises(ValueError, match="unknown keys"):
+        SloGate(default={"p90_ms": 100})
+    with pytest.raises(ValueError, match="min_rps"):
+        SloGate(languages={"Hindi": {"min_rps": 1}})
+
+
+def test_scopes_below_min_requests_are_not_checked():
+    gate = SloGate(default={"p95_ms": 100})
+    stats = stats_with({"Hindi": np.full(10, 500.0), "Tamil": np.full(100, 50.0)})
+    assert [check["scope"] for check in gate.evaluate(stats, 10, min_requests=50)] == ["Tamil"]
+
+
+def test_observe_waits_for_grace_and_persistence(clock):
+    gate = SloGate(aggregate={"p95_ms": 100}, grace_s=30, abort_after_s=10, min_requests=50)
+    slow = stats_with({"Hindi": np.full(100, 500.0)})
+    fast = stats_with({"Hindi": np.full(100, 50.0)})
+    assert gate.observe(slow, 10, elapsed_s=5) is None
+    assert gate.observe(slow, 10, elapsed_s=30) is None
+    clock.now += 5
+    assert gate.observe(slow, 10, elapsed_s=35) is None
+    # Recovering resets the breach, so it has to persist for abort_after_s again
+    clock.now += 1
+    assert gate.observe(fast, 10, elapsed_s=36) is None
+    clock.now += 1
+    assert gate.observe(slow, 10, elapsed_s=37) is None
+    clock.now += 9.5
+    assert gate.observe(slow, 10, elapsed_s=46.5) is None
+    clock.now += 0.5
+    reason = gate.observe(slow, 10, elapsed_s=47)
+    assert reason.startswith("Aggregated p95_ms 500") and gate.abort_reason == reason
+    gate.reset()
+    assert gate.abort_reason is None
+
+
+def test_observe_ignores_quiet_windows(clock):
+    gate = SloGate(aggregate={"p95_ms": 100}, grace_s=0, abort_after_s=0, min_requests=50)
+    assert gate.observe(stats_with({"Hindi": np.full(10, 500.0)}), 10, elapsed_s=60) is None
+    assert gate.observe(stats_with({"Hindi": np.full(60, 500.0)}), 10, elapsed_s=61) is not None
+
+
+def test_verdict():
+    gate = SloGate(aggregate={"p95_ms": 100})
+    fast = stats_with({"Hindi": np.full(100, 50.0)})
+    assert gate.verdict(fast, 10, {"run_id": "abc"}) == {
+        "run_id": "abc", "passed": True, "aborted": False, "abort_reason": None, "duration_s": 10,
+        "checks": [{"scope": AGGREGATE, "metric": "p95_ms", "limit": 100, "observed": 50.0, "passed": True}],
+    }
+    assert not gate.verdict(stats_with({"Hindi": np.full(100, 500.0)}), 10)["passed"]
+    # An aborted run fails even if the whole run is within the limits, and no checks at all is not a pass
+    gate.abort_reason = "p95 breached"
+    assert not gate.verdict(fast, 10)["passed"]
+    assert not SloGate().verdict(fast, 10)["passed"]
+
+
+def test_load_slo_gate(tmp_path):
+    path = tmp_path / "slo.json"
+    path.write_text(json.dumps({"aggregate": {"p99_ms": 800}, "default": {"error_rate": 1}, "grace_s": 5}))
+    gate = load_slo_gate(str(path))
+    assert gate.limits_for("Hindi") == {"error_rate": 1}
+    assert gate.limits_for(AGGREGATE) == {"p99_ms": 800}
+    assert gate.grace_s == 5
+    path.write_text(json.dumps({"aggregate": {}, "abort_after": 5}))
+    with pytest.raises(ValueError, match="Invalid SLO file"):
+        load_slo_gate(str(path))
+
+
+def test_write_verdict_junit(tmp_path):
+    verdict = {
+        "run_id": "abc", "passed": False, "aborted": True, "abort_reason": "Aggregated p95_ms 500 breached",
+        "duration_s": 12.5, "checks": [
+            {"scope": AGGREGATE, "metric": "p95_ms", "limit": 100, "observed": 500.0, "passed": False},
+            {"scope": AGGREGATE, "metric": "min_rps", "limit": 10, "observed": 4.0, "passed": False},
+            {"scope": "Hindi", "metric": "error_rate", "limit": 1, "observed": 0.0, "passed": True},
+        ],
+    }
+    json_path, junit_path = tmp_path / "verdict.json", tmp_path / "verdict.xml"
+    write_verdict(verdict, str(json_path), str(junit_path))
+    assert json.loads(json_path.read_text()) == verdict
+    suite = ET.parse(junit_path).getroot()
+    assert (suite.get("tests"), suite.get("failures"), suite.get("time")) == ("4", "3", "12.5")
+    failures = {(case.get("classname"), case.get("name")): case.find("failure") for case in suite.iter("testcase")}
+    assert failures[(AGGREGATE, "p95_ms")].get("message") == "500 is above the limit 100"
+    assert failures[(AGGREGATE, "min_rps")].get("message") == "4 is below the limit 10"
+    assert failures[("Hindi", "error_rate")] is None
+    assert failures[(AGGREGATE, "early_abort")].get("message") == "Aggregated p95_ms 500 breached"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_breached_verdict_sets_the_exit_code_on_sigterm(tmp_path):
+    # Only look for locust: importing it here would monkey-patch this process
+    if importlib.util.find_spec("locust") is None:
+        pytest.skip("locust is not installed")
+    from benchmark import wait_for_port
+
+    # The dashboard's Stop and abort buttons terminate locust, which quits before test_stop fires
+    port = free_port()
+    mock = subprocess.Popen([sys.executable, os.path.join(REPO, "mock_server.py"), "--port", str(port)],
+                            cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port("127.0.0.1", port)
+        slo_path = tmp_path / "slo.json"
+        slo_path.write_text(json.dumps({"aggregate": {"p50_ms": 0.001}, "grace_s": 0, "abort_after_s": 3600}))
+        env = {**os.environ, "SARVAM_API_KEY": "test", "SLO_PATH": str(slo_path), "RUN_STORE_PATH": ""}
+        locust = subprocess.Popen(
+            [sys.executable, "-m", "locust", "-f", os.path.join(REPO, "locustfile.py"), "--headless", "--only-summary",
+             "-u", "2", "-r", "2", "-t", "60s", "--host", f"http://127.0.0.1:{port}"],
+            cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        # Wait until the sink has flushed a few results, so the verdict has samples to judge
+        results = tmp_path / "locust_results.csv"
+        deadline = time.monotonic() + 30
+        while not results.exists() or len(results.read_text().splitlines()) < 4:
+            assert time.monotonic() < deadline and locust.poll() is None
+            time.sleep(0.2)
+        locust.send_signal(signal.SIGTERM)
+        assert locust.wait(timeout=30) == 1
+    finally:
+        mock.terminate()
+        mock.wait()
+    verdict = json.loads((tmp_path / "slo_verdict.json").read_text())
+    assert not verdict["passed"] and verdict["checks"][0]["metric"] == "p50_ms"
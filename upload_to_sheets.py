@@ -1,86 +1,127 @@
+import argparse
+import json
+import os
+import sys
+
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
-import numpy as np
-
-# Define sweep configurations (same as in locustfile.py)
-sweep_configs = [
-    {"concurrency": 1, "spawn_rate": 1, "run_time": "1m"},
-    {"concurrency": 5, "spawn_rate": 2, "run_time": "1m"},
-    {"concurrency": 10, "spawn_rate": 2, "run_time": "3m"},
-    {"concurrency": 25, "spawn_rate": 4, "run_time": "5m"}
-]
-
-# Authenticate with Google Sheets API
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-try:
-    creds = ServiceAccountCredentials.from_json_keyfile_name("sarvam-api-load-test-98f6c79a21c5.json", scope)
-    client = gspread.authorize(creds)
-except FileNotFoundError:
-    print("Error: 'credentials.json' not found. Ensure it is in the project directory.")
-    exit(1)
-
-# Open Google Sheet
-try:
-    sheet = client.open("Sarvam_API_Load_Test")
-except gspread.exceptions.SpreadsheetNotFound:
-    print("Error: Sheet 'Sarvam_API_Load_Test' not found. Check sheet name or sharing permissions.")
-    exit(1)
-
-# Load and clean data
-print("Loading and cleaning data...")
-try:
-    aggregate_metrics = pd.read_csv("aggregate_metrics.csv").fillna(0)
-    language_metrics = pd.read_csv("language_metrics.csv").fillna(0)
-except FileNotFoundError as e:
-    print(f"Error: {e}. Ensure 'aggregate_metrics.csv' and 'language_metrics.csv' exist.")
-    exit(1)
-
-# Combine aggregate and language-wise metrics
-summary_data = pd.concat([
-    aggregate_metrics,
-    language_metrics[["Language", "p95 Latency (ms)", "p75 Latency (ms)", "p50 Latency (ms)", "Error Rate"]]
-], axis=0, ignore_index=True)
-summary_data = summary_data.fillna(0)  # Ensure no NaN values
-
-# Convert float columns to string to handle any remaining NaN/infinity
-for col in summary_data.columns:
-    if summary_data[col].dtype in [float, int]:
-        summary_data[col] = summary_data[col].apply(lambda x: str(round(x, 2)) if not np.isnan(x) else "0")
-
-# Tab 1: Summary Dashboard
-print("Updating Summary Dashboard...")
-try:
-    worksheet = sheet.worksheet("Summary Dashboard")
-except gspread.exceptions.WorksheetNotFound:
-    worksheet = sheet.add_worksheet(title="Summary Dashboard", rows=100, cols=20)
-worksheet.clear()
-worksheet.update(range_name="A1", values=[summary_data.columns.tolist()] + summary_data.values.tolist())
-
-# Tab 2: Raw Data
-print("Updating Raw Data...")
-try:
-    raw_data = pd.read_csv("locust_results.csv").fillna(0)
-except FileNotFoundError:
-    print("Error: 'locust_results.csv' not found. Ensure Locust test has run.")
-    exit(1)
-try:
-    worksheet = sheet.worksheet("Raw Data")
-except gspread.exceptions.WorksheetNotFound:
-    worksheet = sheet.add_worksheet(title="Raw Data", rows=len(raw_data) + 10, cols=20)
-worksheet.clear()
-worksheet.update(range_name="A1", values=[raw_data.columns.tolist()] + raw_data.values.tolist())
-
-# Tab 3: Sweep Configurations
-print("Updating Configurations...")
-config_data = pd.DataFrame(sweep_configs) if sweep_configs else pd.DataFrame([{"concurrency": 1, "spawn_rate": 1, "run_time": "1m"}])
-try:
-    worksheet = sheet.worksheet("Configurations")
-except gspread.exceptions.WorksheetNotFound:
-    worksheet = sheet.add_worksheet(title="Configurations", rows=len(config_data) + 10, cols=20)
-worksheet.clear()
-worksheet.update(range_name="A1", values=[config_data.columns.tolist()] + config_data.values.tolist())
-
-print("Google Sheet updated successfully.")
-print("Manually add charts in the 'Summary Dashboard' tab for p95/p75/p50 latency and p95 by concurrency.")
-print("Share the sheet publicly with Viewer access for submission.")
\ No newline at end of file
+
+from analysis_engine import count_rows, find_results_file, iter_batches, result_columns
+from sheets_sync import (
+    DEFAULT_BATCH_ROWS, DEFAULT_REQUESTS_PER_MINUTE, SYNC_STATE_FILE, FakeSpreadsheet, SheetWriter, SyncState,
+    open_spreadsheet, sample_rows,
+)
+
+CREDENTIALS_FILE = "sarvam-api-load-test-98f6c79a21c5.json"
+SHEET_NAME = "Sarvam_API_Load_Test"
+RUN_INFO_FILE = "run_info.json"
+RAW_MODES = ("none", "sample", "all")
+
+
+def load_summary():
+    aggregate_metrics = pd.read_csv("aggregate_metrics.csv")
+    language_metrics = pd.read_csv("language_metrics.csv")
+    # Combine aggregate and language-wise metrics
+    return pd.concat([
+        aggregate_metrics,
+        language_metrics[["Language", "p95 Latency (ms)", "p75 Latency (ms)", "p50 Latency (ms)", "Error Rate"]]
+    ], axis=0, ignore_index=True)
+
+
+def load_configurations():
+    try:
+        sweep_data = pd.read_csv("sweep_results.csv")
+        return sweep_data[sweep_data["Language"] == "Aggregated"].drop(columns=["Language"])
+    except FileNotFoundError:
+        print("Warning: 'sweep_results.csv' not found. Uploading a single-run configuration.")
+        return pd.DataFrame([{"Step": 0, "Concurrency": 1}])
+
+
+def latest_run():
+    """(run_id, results file) of the latest locust run, from run_info.json when available."""
+    if os.path.exists(RUN_INFO_FILE):
+        with open(RUN_INFO_FILE) as f:
+            run_info = json.load(f)
+        if os.path.exists(run_info.get("results_file", "")):
+            return run_info["run_id"], run_info["results_file"]
+    results_file = find_results_file()
+    return results_file, results_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload load test summaries and results to Google Sheets.")
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    parser.add_argument("--credentials", default=CREDENTIALS_FILE)
+    parser.add_argument("--raw", choices=RAW_MODES, default="sample",
+                        help="Raw results: skip, upload an evenly spaced sample, or append every new row")
+    parser.add_argument("--sample-rows", type=int, default=5000)
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Rows per write request")
+    parser.add_argument("--requests-per-minute", type=float, default=DEFAULT_REQUESTS_PER_MINUTE)
+    parser.add_argument("--state", default=SYNC_STATE_FILE, help="Where --raw all keeps its sync watermark")
+    parser.add_argument("--fake", metavar="PATH", help="Write to a local JSON fake instead of Google Sheets")
+    args = parser.parse_args()
+
+    # Load data before touching the API, so a missing file costs no requests
+    print("Loading data...")
+    try:
+        summary_data = load_summary()
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Ensure 'aggregate_metrics.csv' and 'language_metrics.csv' exist.")
+        return 1
+    config_data = load_configurations()
+
+    if args.fake:
+        sheet = FakeSpreadsheet(args.fake)
+    else:
+        try:
+            sheet = open_spreadsheet(args.sheet, args.credentials)
+        except FileNotFoundError:
+            print(f"Error: '{args.credentials}' not found. Ensure it is in the project directory.")
+            return 1
+        except gspread.exceptions.SpreadsheetNotFound:
+            print(f"Error: Sheet '{args.sheet}' not found. Check sheet name or sharing permissions.")
+            return 1
+    writer = SheetWriter(sheet, batch_rows=args.batch_rows, requests_per_minute=args.requests_per_minute)
+
+    # Summaries first, so they land even if the raw upload is slow or interrupted
+    print("Updating Summary Dashboard...")
+    writer.replace("Summary Dashboard", summary_data)
+    print("Updating Configurations...")
+    writer.replace("Configurations", config_data)
+    if os.path.exists("endpoint_metrics.csv"):
+        print("Updating Endpoint Metrics...")
+        writer.replace("Endpoint Metrics", pd.read_csv("endpoint_metrics.csv"))
+    if os.path.exists("connection_metrics.csv"):
+        print("Updating Connection Metrics...")
+        writer.replace("Connection Metrics", pd.read_csv("connection_metrics.csv"))
+    if os.path.exists("windowed_metrics.csv"):
+        print("Updating Latency Over Time...")
+        windowed = pd.read_csv("windowed_metrics.csv")
+        writer.replace("Latency Over Time", windowed[windowed["Language"] == "Aggregated"])
+
+    run_id, results_file = latest_run()
+    if args.raw != "none" and results_file is None:
+        print("Warning: no locust_results.csv/.parquet found. Skipping Raw Data.")
+    elif args.raw == "sample":
+        total = count_rows(results_file)
+        raw_sample = sample_rows(iter_batches(results_file, result_columns(results_file)), total, args.sample_rows)
+        print(f"Updating Raw Data with {len(raw_sample)} of {total} rows...")
+        writer.replace("Raw Data", raw_sample, decimals=None)
+    elif args.raw == "all":
+        state = SyncState(args.state)
+        if state.run_id != run_id:
+            print(f"New run {run_id}, restarting Raw Data")
+        appended = writer.sync_rows("Raw Data", iter_batches(results_file, result_columns(results_file)), run_id, state)
+        print(f"Appended {appended} new rows to Raw Data ({state.rows_synced} synced for run {run_id})")
+
+    if args.fake:
+        sheet.save()
+        print(f"Fake spreadsheet saved to {args.fake} ({writer.requests} requests)")
+    else:
+        print(f"Google Sheet updated successfully ({writer.requests} requests).")
+        print("Manually add charts in the 'Summary Dashboard' tab for p95/p75/p50 latency and p95 by concurrency.")
+        print("Share the sheet publicly with Viewer access for submission.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
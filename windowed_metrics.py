@@ -0,0 +1,328 @@
+import numpy as np
+import pandas as pd
+
+from analysis_engine import DEFAULT_BATCH_SIZE, WINDOW_GROUP_COLUMNS, iter_batches, result_columns, row_groups
+from latency_histogram import (
+    DEFAULT_RELATIVE_ACCURACY, THROTTLED_STATUS, LatencyHistogram, LatencyStats, grouped_quantiles,
+)
+
+DEFAULT_WINDOW = 1.0
+WINDOW_COLUMNS = ["language", "status_code", "latency_ms", "start_ts", "end_ts"]
+# Per (window, group): count, latency sum, min, max, first request start, last request end;
+# per (window, group, bucket): sample count
+CELL_DTYPES = [np.int64, np.int64, np.int64, np.float64, np.float64, np.float64, np.float64, np.float64]
+ENTRY_DTYPES = [np.int64, np.int16, np.int32]
+# Past this many bytes of cells and entries, adjacent windows are merged (the window doubles)
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Batches are folded into the compact arrays once they take at least this many bytes
+MIN_PENDING_BYTES = 4 * 1024 * 1024
+SMOOTHING_WINDOWS = 5
+MIN_WINDOWS = 10
+RAMP_RPS_FRACTION = 0.9
+WARM_UP_P50_TOLERANCE = 1.2
+DEGRADATION_FACTOR = 1.5
+DEGRADATION_PERSISTENCE = 0.8
+PHASES = ["ramp-up", "warm-up", "steady", "degraded", "ramp-down"]
+
+
+class WindowedStats:
+    """Latency histograms per window and group, kept as compact bucket-count arrays.
+
+    Windows are aligned to multiples of `window` seconds of request start time.
+    Each batch adds one entry per (window, group, bucket) it touches, so memory
+    grows with the distinct windows, groups and latency buckets rather than with
+    rows, and samples may arrive in any order. Once the arrays take more than
+    max_bytes, adjacent windows are merged and `window` doubles, which keeps a
+    long run's memory bounded at the cost of coarser windows. Any range of
+    windows, such as the steady state, turns back into LatencyStats without
+    rereading the results.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        if window <= 0:
+            raise ValueError("Window length must be positive")
+        self.window = window
+        self.max_bytes = max_bytes
+        self.relative_accuracy = relative_accuracy
+        self.keys = []
+        self._key_ids = {}
+        self._template = LatencyHistogram(relative_accuracy)
+        self._cells = [np.empty(0, dtype=dtype) for dtype in CELL_DTYPES]
+        self._entries = [np.empty(0, dtype=dtype) for dtype in ENTRY_DTYPES]
+        self._pending = []
+        self._pending_bytes = 0
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self._cells + self._entries)
+
+    def _key_id(self, key):
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = self._key_ids[key] = len(self.keys)
+            self.keys.append(key)
+        return key_id
+
+    def add_groups(self, start_ts, end_ts, keys, group_ids, latencies):
+        """Add samples grouped by row_groups(): sample i ran from start_ts[i] to end_ts[i] and belongs to keys[group_ids[i]]."""
+        start_ts = np.asarray(start_ts, dtype=float)
+        end_ts = np.asarray(end_ts, dtype=float)
+        latencies = np.asarray(latencies, dtype=float)
+        valid = ~np.isnan(start_ts) & ~np.isnan(latencies)
+        if not valid.any():
+            return
+        # Keys may carry more GROUP_COLUMNS than windows are split by; those are merged here
+        key_ids = np.array([
+            self._key_id((group[:len(WINDOW_GROUP_COLUMNS)], status)) for group, status in keys
+        ], dtype=np.int64)[np.asarray(group_ids)[valid]]
+        start_ts, end_ts = start_ts[valid], end_ts[valid]
+        windows = np.floor(start_ts / self.window).astype(np.int64)
+        latencies = latencies[valid]
+        n_keys = len(self.keys)
+        cells, cell_ids = np.unique(windows * n_keys + key_ids, return_inverse=True)
+        buckets = self._template.bucket_indices(latencies)
+        low = int(buckets.min())
+        span = int(buckets.max()) - low + 1
+        entries, entry_counts = np.unique(cell_ids * span + buckets - low, return_counts=True)
+        minimums = np.full(cells.size, np.inf)
+        maximums = np.full(cells.size, -np.inf)
+        np.minimum.at(minimums, cell_ids, latencies)
+        np.maximum.at(maximums, cell_ids, latencies)
+        first_starts = np.full(cells.size, np.inf)
+        last_ends = np.full(cells.size, -np.inf)
+        np.minimum.at(first_starts, cell_ids, start_ts)
+        np.fmax.at(last_ends, cell_ids, end_ts)
+        first_cell = sum(chunk[0].size for chunk, _ in self._pending) + self._cells[0].size
+        cells = [cells // n_keys, cells % n_keys, np.bincount(cell_ids, minlength=cells.size),
+                 np.bincount(cell_ids, weights=latencies, minlength=cells.size), minimums, maximums, first_starts, last_ends]
+        entries = [first_cell + entries // span, entries % span + low, entry_counts]
+        self._pending.append((
+            [column.astype(dtype, copy=False) for column, dtype in zip(cells, CELL_DTYPES)],
+            [column.astype(dtype, copy=False) for column, dtype in zip(entries, ENTRY_DTYPES)],
+        ))
+        # Fold batches in as the run goes, so coarsening keeps the total bounded
+        self._pending_bytes += sum(column.nbytes for part in self._pending[-1] for column in part)
+        if self._pending_bytes >= max(MIN_PENDING_BYTES, self.nbytes // 4):
+            self._consolidate()
+
+    def add_batch(self, batch):
+        keys, group_ids, valid = row_groups(batch, WINDOW_GROUP_COLUMNS)
+        self.add_groups(batch["start_ts"].to_numpy()[valid], batch["end_ts"].to_numpy()[valid], keys, group_ids,
+                        batch["latency_ms"].to_numpy()[valid])
+
+    def _consolidate(self):
+        if self._pending:
+            self._cells = [
+                np.concatenate([column] + [cells[index] for cells, _ in self._pending])
+                for index, column in enumerate(self._cells)
+            ]
+            self._entries = [
+                np.concatenate([column] + [entries[index] for _, entries in self._pending])
+                for index, column in enumerate(self._entries)
+            ]
+            self._pending = []
+            self._pending_bytes = 0
+        while self.nbytes > self.max_bytes and np.ptp(self._cells[0]) > 0:
+            self._coarsen()
+
+    def _coarsen(self):
+        """Merge each pair of adjacent windows, doubling the window length."""
+        cell_windows, cell_keys, counts, sums, minimums, maximums, first_starts, last_ends = self._cells
+        entry_cells, entry_buckets, entry_counts = self._entries
+        n_keys = len(self.keys)
+        # floor(start / 2w) == floor(start / w) // 2, so the merged windows stay aligned
+        cells, cell_index = np.unique((cell_windows // 2) * n_keys + cell_keys, return_inverse=True)
+        merged = [np.full(cells.size, fill) for fill in (np.inf, -np.inf, np.inf, -np.inf)]
+        for values, column, reduce in zip(merged, (minimums, maximums, first_starts, last_ends),
+                                          (np.minimum, np.maximum, np.minimum, np.fmax)):
+            reduce.at(values, cell_index, column)
+        self._cells = [
+            column.astype(dtype, copy=False) for column, dtype in zip([
+                cells // n_keys, cells % n_keys, np.bincount(cell_index, weights=counts, minlength=cells.size),
+                np.bincount(cell_index, weights=sums, minlength=cells.size), *merged,
+            ], CELL_DTYPES)
+        ]
+        low = int(entry_buckets.min())
+        span = int(entry_buckets.max()) - low + 1
+        entries, entry_index = np.unique(cell_index[entry_cells] * span + (entry_buckets - low), return_inverse=True)
+        self._entries = [
+            (entries // span).astype(ENTRY_DTYPES[0]), (entries % span + low).astype(ENTRY_DTYPES[1]),
+            np.bincount(entry_index, weights=entry_counts, minlength=entries.size).astype(ENTRY_DTYPES[2]),
+        ]
+        self.window *= 2
+
+    def _stats(self, cells, entries):
+        """LatencyStats keyed like self.keys, from the cells and bucket entries at the given indices."""
+        stats = LatencyStats(self.relative_accuracy)
+        if not cells.size:
+            return stats
+        _, cell_keys, _, sums, minimums, maximums, _, _ = self._cells
+        entry_cells, entry_buckets, entry_counts = self._entries
+        keys, key_index = np.unique(cell_keys[cells], return_inverse=True)
+        totals = np.bincount(key_index, weights=sums[cells], minlength=keys.size)
+        key_minimums = np.full(keys.size, np.inf)
+        key_maximums = np.full(keys.size, -np.inf)
+        np.minimum.at(key_minimums, key_index, minimums[cells])
+        np.maximum.at(key_maximums, key_index, maximums[cells])
+        buckets = entry_buckets[entries].astype(np.int64)
+        low = int(buckets.min())
+        span = int(buckets.max()) - low + 1
+        codes, code_index = np.unique(cell_keys[entry_cells[entries]] * span + buckets - low, return_inverse=True)
+        counts = np.bincount(code_index, weights=entry_counts[entries], minlength=codes.size).astype(np.int64)
+        bounds = np.searchsorted(codes // span, np.append(keys, keys[-1] + 1))
+        for position, key in enumerate(keys):
+            part = slice(bounds[position], bounds[position + 1])
+            stats.histogram(*self.keys[key]).add_bucket_counts(
+                (codes[part] % span + low).tolist(), counts[part].tolist(), float(totals[position]),
+                float(key_minimums[position]), float(key_maximums[position]),
+            )
+        return stats
+
+    def _selected(self, start, end):
+        self._consolidate()
+        cell_windows = self._cells[0]
+        return (cell_windows >= round(start / self.window)) & (cell_windows < round(end / self.window))
+
+    def stats_between(self, start, end):
+        """LatencyStats (keyed like self.keys) of the windows starting in [start, end)."""
+        selected = self._selected(start, end)
+        return self._stats(np.flatnonzero(selected), np.flatnonzero(selected[self._entries[0]]))
+
+    def span_between(self, start, end):
+        """Seconds from the first request start to the last request end in the windows starting in [start, end)."""
+        selected = self._selected(start, end)
+        if not selected.any():
+            return 0.0
+        return float(np.nanmax(self._cells[7][selected]) - self._cells[6][selected].min())
+
+    def finish(self):
+        """Requests, RPS, error rate and p50/p95/p99 per window and language, as a DataFrame.
+
+        Computed straight from the bucket arrays, without a histogram object per window.
+        """
+        self._consolidate()
+        cell_windows, cell_keys, cell_counts, _, minimums, maximums, _, _ = self._cells
+        entry_cells, entry_buckets, entry_counts = self._entries
+        if not cell_windows.size:
+            return pd.DataFrame()
+        languages = sorted({group[0] for group, _ in self.keys})
+        names = languages + ["Aggregated"]
+        language_ids = {language: position for position, language in enumerate(languages)}
+        key_languages = np.array([language_ids[group[0]] for group, _ in self.keys], dtype=np.int64)
+        key_errors = np.array([status not in (200, THROTTLED_STATUS) for _, status in self.keys])
+        windows, window_index = np.unique(cell_windows, return_inverse=True)
+        # Every cell counts towards its language's row and its window's Aggregated row
+        cell_rows = np.concatenate([
+            window_index * len(names) + key_languages[cell_keys], window_index * len(names) + len(languages),
+        ])
+        n_rows = windows.size * len(names)
+        counts = np.bincount(cell_rows, weights=np.tile(cell_counts, 2), minlength=n_rows)
+        errors = np.bincount(cell_rows, weights=np.tile(cell_counts * key_errors[cell_keys], 2), minlength=n_rows)
+        row_minimums = np.full(n_rows, np.inf)
+        row_maximums = np.full(n_rows, -np.inf)
+        np.minimum.at(row_minimums, cell_rows, np.tile(minimums, 2))
+        np.maximum.at(row_maximums, cell_rows, np.tile(maximums, 2))
+        # Merge each window's entries per (language, bucket) first, which also merges endpoints and
+        # statuses, then per window for the Aggregated rows, rather than repeating every entry twice
+        low = int(entry_buckets.min())
+        span = int(entry_buckets.max()) - low + 1
+        language_codes, inverse = np.unique(cell_rows[:cell_keys.size][entry_cells] * span + (entry_buckets - low), return_inverse=True)
+        language_counts = np.bincount(inverse, weights=entry_counts, minlength=language_codes.size)
+        del inverse
+        language_rows, language_buckets = np.divmod(language_codes, span)
+        aggregated_rows = language_rows - language_rows % len(names) + len(languages)
+        p50, p95, p99 = grouped_quantiles(
+            np.concatenate([language_rows, aggregated_rows]), np.tile(language_buckets + low, 2),
+            np.tile(language_counts, 2), row_minimums, row_maximums, (0.50, 0.95, 0.99), self.relative_accuracy,
+        )
+        present = np.flatnonzero(counts)
+        windowed = pd.DataFrame({
+            "Window Start": windows[present // len(names)] * self.window,
+            "Language": np.array(names, dtype=object)[present % len(names)],
+            "Requests": counts[present].astype(np.int64),
+            "RPS": counts[present] / self.window,
+            "Error Rate (%)": errors[present] / counts[present] * 100,
+            "p50 Latency (ms)": p50[present],
+            "p95 Latency (ms)": p95[present],
+            "p99 Latency (ms)": p99[present],
+        })
+        windowed.insert(1, "Elapsed (s)", windowed["Window Start"] - windowed["Window Start"].min())
+        return windowed
+
+
+def windowed_metrics(path, window=DEFAULT_WINDOW, batch_size=DEFAULT_BATCH_SIZE):
+    available = result_columns(path)
+    missing = [column for column in WINDOW_COLUMNS if column not in available]
+    if missing:
+        raise ValueError(f"missing columns: {missing}")
+    stats = WindowedStats(window)
+    columns = WINDOW_COLUMNS + [
+        column for column in WINDOW_GROUP_COLUMNS if column in available and column not in WINDOW_COLUMNS
+    ]
+    for batch in iter_batches(path, columns, batch_size):
+        stats.add_batch(batch)
+    return stats.finish()
+
+
+def detect_phases(windowed, window=DEFAULT_WINDOW):
+    """Split the run into ramp-up, warm-up, steady, degraded and ramp-down windows.
+
+    Ramp-up lasts until smoothed throughput reaches RAMP_RPS_FRACTION of its plateau
+    (and ramp-down starts where it last drops below it); warm-up lasts until smoothed
+    p50 settles within WARM_UP_P50_TOLERANCE of the plateau's median p50. Degradation
+    starts at the first window from which smoothed p95 stays above DEGRADATION_FACTOR
+    times the early steady-state p95 for most of the remaining run.
+
+    Returns (phase per window start, summary with the steady-state time range and
+    p95 drift in ms per minute over the steady and degraded windows).
+    """
+    overall = windowed[windowed["Language"] == "Aggregated"].set_index("Window Start").sort_index()
+    starts = np.arange(overall.index.min(), overall.index.max() + window / 2, window)
+    # Windows without a single request are still part of the timeline
+    overall = overall.reindex(starts, method="nearest", tolerance=window / 2)
+    overall["RPS"] = overall["RPS"].fillna(0)
+    n = len(overall)
+
+    ramp_end, warm_up_end, degradation_start, ramp_down_start = 0, 0, None, n
+    if n >= MIN_WINDOWS:
+        rps = overall["RPS"].rolling(SMOOTHING_WINDOWS, center=True, min_periods=1).median().to_numpy()
+        at_plateau = np.flatnonzero(rps >= RAMP_RPS_FRACTION * np.quantile(rps, 0.75))
+        ramp_end, ramp_down_start = int(at_plateau[0]), int(at_plateau[-1]) + 1
+
+        p50 = overall["p50 Latency (ms)"].rolling(SMOOTHING_WINDOWS, center=True, min_periods=1).median().to_numpy()
+        baseline_p50 = np.nanmedian(p50[ramp_end:ramp_down_start])
+        settled = np.flatnonzero(p50[ramp_end:ramp_down_start] <= WARM_UP_P50_TOLERANCE * baseline_p50)
+        warm_up_end = ramp_end + int(settled[0]) if settled.size else ramp_end
+
+        p95 = overall["p95 Latency (ms)"].rolling(SMOOTHING_WINDOWS, center=True, min_periods=1).median().to_numpy()
+        steady = p95[warm_up_end:ramp_down_start]
+        if steady.size >= MIN_WINDOWS:
+            degraded = steady > DEGRADATION_FACTOR * np.nanmedian(steady[:steady.size // 2])
+            # Share of degraded windows from each window to the end of the steady run
+            remaining = np.cumsum(degraded[::-1])[::-1] / np.arange(steady.size, 0, -1)
+            onsets = np.flatnonzero(degraded & (remaining >= DEGRADATION_PERSISTENCE))
+            if onsets.size and steady.size - onsets[0] >= SMOOTHING_WINDOWS:
+                degradation_start = warm_up_end + int(onsets[0])
+
+    phases = np.array(["steady"] * n, dtype=object)
+    phases[:ramp_end] = "ramp-up"
+    phases[ramp_end:warm_up_end] = "warm-up"
+    if degradation_start is not None:
+        phases[degradation_start:ramp_down_start] = "degraded"
+    phases[ramp_down_start:] = "ramp-down"
+
+    steady_end = degradation_start if degradation_start is not None else ramp_down_start
+    soak = overall.iloc[warm_up_end:ramp_down_start]["p95 Latency (ms)"].dropna()
+    drift = np.polyfit((soak.index - starts[0]) / 60, soak.to_numpy(), 1)[0] if len(soak) >= 2 else 0.0
+    first = starts[0]
+    summary = {
+        "Ramp-up (s)": ramp_end * window,
+        "Warm-up (s)": (warm_up_end - ramp_end) * window,
+        "Steady Start (s)": warm_up_end * window,
+        "Steady End (s)": steady_end * window,
+        "Degradation Start (s)": degradation_start * window if degradation_start is not None else None,
+        "p95 Drift (ms/min)": float(drift),
+        "steady_range": (first + warm_up_end * window, first + steady_end * window),
+    }
+    return pd.Series(phases, index=starts), summary